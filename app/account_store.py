@@ -0,0 +1,425 @@
+# app/account_store.py
+"""
+Account store for no-DB mode (app.storage / app.storage_nodb re-export it).
+
+Reads take no lock: lookups are single dict operations, which are atomic
+under the GIL, and writers publish an account in _by_id before its name
+appears in _id_by_name. Writers serialize on one lock.
+
+With ACCOUNT_STORE_DIR set, the store is durable:
+
+    log.<gen>      append-only records [len u32][crc32 u32][payload]; a torn
+                   or corrupt tail (crash mid-write) is truncated on recovery
+    snapshot.bin   compacted columns, written every ACCOUNT_STORE_COMPACT_EVERY
+                   log records (and on close), then older segments are deleted
+
+The snapshot is columnar (ids as one u64 array, each text field as one
+NUL-joined blob plus a null map) and is read through mmap, so recovery is a
+few bulk decodes instead of one Python object per account; Account objects
+are only built when an account is first read. Compaction rotates to a new
+log segment under the lock and builds the snapshot off-lock; it may include
+writes made after the rotation, which is fine because replaying the log is
+idempotent (create-if-absent, set-contact).
+
+The durable store is single-process: opening it takes an exclusive flock on
+ACCOUNT_STORE_DIR/lock and raises StoreLocked if another process (e.g. a
+second uvicorn worker) already has it, instead of both appending to the same
+log. Run one API process per directory.
+
+Without ACCOUNT_STORE_DIR it is memory-only, like the old dict store.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from array import array
+import fcntl, mmap, os, struct, sys, threading, time, zlib
+
+ACCOUNT_STORE_DIR = os.getenv("ACCOUNT_STORE_DIR", "")  # empty = memory only
+ACCOUNT_STORE_FSYNC = os.getenv("ACCOUNT_STORE_FSYNC", "1") == "1"
+ACCOUNT_STORE_COMPACT_EVERY = int(os.getenv("ACCOUNT_STORE_COMPACT_EVERY", "100000"))
+
+@dataclass
+class Account:
+    id: int
+    name: str
+    password_hash: str  # bcrypt hash
+    contact_number: Optional[str] = None
+    avatar_img: Optional[str] = None
+
+# ---------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------
+_OP_CREATE, _OP_SET_CONTACT = 1, 2
+_FRAME = struct.Struct("<II")       # payload length, crc32(payload)
+_OP = struct.Struct("<BQ")          # op, account id
+_STR = struct.Struct("<i")          # byte length, -1 = None
+_SNAP_MAGIC = b"BSACCT01"
+_SNAP_HEADER = struct.Struct("<QQQ")  # rows, base log generation, next id
+_FIELDS = ("name", "password_hash", "contact_number", "avatar_img")
+
+def _check_text(value: Optional[str], what: str) -> None:
+    # NUL separates values in the snapshot blobs
+    if value is not None and "\0" in value:
+        raise ValueError(f"{what} must not contain NUL characters")
+
+def _pack_str(value: Optional[str]) -> bytes:
+    if value is None:
+        return _STR.pack(-1)
+    b = value.encode("utf-8")
+    return _STR.pack(len(b)) + b
+
+def _unpack_str(buf: bytes, off: int) -> Tuple[Optional[str], int]:
+    (n,) = _STR.unpack_from(buf, off)
+    off += _STR.size
+    if n < 0:
+        return None, off
+    return buf[off:off + n].decode("utf-8"), off + n
+
+class _Snapshot:
+    """Read-only columns loaded from snapshot.bin."""
+    __slots__ = ("ids", "cols", "nulls", "row_by_id")
+
+    def __init__(self, ids: List[int], cols: List[List[str]], nulls: List[bytes]):
+        self.ids = ids
+        self.cols = cols
+        self.nulls = nulls
+        self.row_by_id: Dict[int, int] = dict(zip(ids, range(len(ids))))
+
+    def field(self, col: int, row: int) -> Optional[str]:
+        return None if self.nulls[col][row] else self.cols[col][row]
+
+    def account(self, row: int) -> Account:
+        return Account(self.ids[row], *(self.field(c, row) for c in range(len(_FIELDS))))
+
+_EMPTY = _Snapshot([], [[] for _ in _FIELDS], [b"" for _ in _FIELDS])
+
+class StoreLocked(RuntimeError):
+    """Another process has the account store directory open."""
+
+# ---------------------------------------------------------
+# Store
+# ---------------------------------------------------------
+class AccountStore:
+    def __init__(self, directory: str = ACCOUNT_STORE_DIR, fsync: bool = ACCOUNT_STORE_FSYNC,
+                 compact_every: int = ACCOUNT_STORE_COMPACT_EVERY):
+        self.directory = directory
+        self.fsync = fsync
+        self.compact_every = max(1, compact_every)
+        self._lock = threading.Lock()          # writers only
+        self._by_id: Dict[int, Account] = {}   # materialized + created since the snapshot
+        self._id_by_name: Dict[str, int] = {}
+        self._snap = _EMPTY
+        self._next_id = 1
+        self._gen = 0
+        self._log = None
+        self._lock_file = None
+        self._log_records = 0
+        self._compacting = False
+        self.recovery_s = 0.0
+        self.last_compaction_s: Optional[float] = None
+        if directory:
+            self._recover()
+
+    # --- reads (lock-free) ---
+    def get_by_id(self, user_id: int) -> Optional[Account]:
+        acc = self._by_id.get(user_id)
+        if acc is None:
+            row = self._snap.row_by_id.get(user_id)
+            if row is None:
+                return None
+            # setdefault: concurrent first reads all get the same object
+            acc = self._by_id.setdefault(user_id, self._snap.account(row))
+        return acc
+
+    def get_by_name(self, name: str) -> Optional[Account]:
+        uid = self._id_by_name.get(name)
+        return None if uid is None else self.get_by_id(uid)
+
+    def __len__(self) -> int:
+        return len(self._id_by_name)
+
+    # --- writes ---
+    def create(self, name: str, password_hash: str, contact_number: Optional[str] = None,
+               avatar_img: Optional[str] = None) -> Account:
+        for value, what in ((name, "name"), (password_hash, "password_hash"),
+                            (contact_number, "contact_number"), (avatar_img, "avatar_img")):
+            _check_text(value, what)
+        with self._lock:
+            if name in self._id_by_name:
+                raise ValueError("username already exists")
+            uid = self._next_id
+            self._append(_OP.pack(_OP_CREATE, uid) + b"".join(
+                _pack_str(v) for v in (name, password_hash, contact_number, avatar_img)))
+            self._next_id += 1
+            acc = Account(id=uid, name=name, password_hash=password_hash,
+                          contact_number=contact_number, avatar_img=avatar_img)
+            self._by_id[uid] = acc
+            self._id_by_name[name] = uid
+        self._maybe_compact()
+        return acc
+
+    def set_contact(self, user_id: int, phone: Optional[str]) -> None:
+        _check_text(phone, "contact_number")
+        with self._lock:
+            acc = self.get_by_id(user_id)
+            if not acc:
+                raise ValueError("user not found")
+            self._append(_OP.pack(_OP_SET_CONTACT, user_id) + _pack_str(phone))
+            acc.contact_number = phone
+        self._maybe_compact()
+
+    # --- log ---
+    def _log_path(self, gen: int) -> str:
+        return os.path.join(self.directory, f"log.{gen:08d}")
+
+    def _open_log(self, gen: int) -> None:
+        if self._log is not None:
+            self._log.close()
+        self._gen = gen
+        self._log = open(self._log_path(gen), "ab")
+        self._log_records = 0
+
+    def _append(self, payload: bytes) -> None:
+        # Caller holds self._lock
+        if self._log is None:
+            return
+        self._log.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self._log_records += 1
+
+    def _apply(self, payload: bytes) -> None:
+        op, uid = _OP.unpack_from(payload, 0)
+        off = _OP.size
+        if op == _OP_CREATE:
+            vals = []
+            for _ in _FIELDS:
+                v, off = _unpack_str(payload, off)
+                vals.append(v)
+            if self.get_by_id(uid) is None:
+                self._by_id[uid] = Account(uid, *vals)
+                self._id_by_name[vals[0]] = uid
+            self._next_id = max(self._next_id, uid + 1)
+        elif op == _OP_SET_CONTACT:
+            phone, _ = _unpack_str(payload, off)
+            acc = self.get_by_id(uid)
+            if acc is not None:
+                acc.contact_number = phone
+
+    def _replay(self, path: str) -> int:
+        with open(path, "rb") as f:
+            buf = f.read()
+        off, n = 0, 0
+        while off + _FRAME.size <= len(buf):
+            length, crc = _FRAME.unpack_from(buf, off)
+            payload = buf[off + _FRAME.size: off + _FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            self._apply(payload)
+            off += _FRAME.size + length
+            n += 1
+        if off < len(buf):
+            print(f"[accounts] truncating torn tail of {path} at byte {off} of {len(buf)}")
+            with open(path, "r+b") as f:
+                f.truncate(off)
+        return n
+
+    # --- snapshot ---
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.directory, "snapshot.bin")
+
+    def _load_snapshot(self) -> int:
+        """Returns the first log generation not covered by the snapshot."""
+        path = self._snapshot_path()
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(_SNAP_MAGIC)] != _SNAP_MAGIC:
+                raise RuntimeError(f"{path} is not an account snapshot")
+            off = len(_SNAP_MAGIC)
+            rows, base_gen, next_id = _SNAP_HEADER.unpack_from(mm, off)
+            off += _SNAP_HEADER.size
+            arr = array("Q", mm[off:off + 8 * rows])
+            if sys.byteorder != "little":
+                arr.byteswap()
+            ids = arr.tolist()
+            off += 8 * rows
+            cols, nulls = [], []
+            for _ in _FIELDS:
+                nulls.append(mm[off:off + rows])
+                off += rows
+                (blen,) = struct.unpack_from("<Q", mm, off)
+                off += 8
+                col = mm[off:off + blen].decode("utf-8").split("\0") if rows else []
+                off += blen
+                cols.append(col)
+        self._snap = _Snapshot(ids, cols, nulls)
+        self._id_by_name = dict(zip(cols[0], ids))
+        self._next_id = max(self._next_id, next_id)
+        return base_gen
+
+    def _write_snapshot(self, base_gen: int, by_id: Dict[int, Account], snap: _Snapshot, next_id: int) -> None:
+        ids = list(by_id)
+        ids.extend(i for i in snap.ids if i not in by_id)
+        n_new = len(by_id)
+        objs = list(by_id.values())
+        arr = array("Q", ids)
+        if sys.byteorder != "little":
+            arr.byteswap()
+        parts = [_SNAP_MAGIC, _SNAP_HEADER.pack(len(ids), base_gen, next_id), arr.tobytes()]
+        for c, fname in enumerate(_FIELDS):
+            vals = [getattr(a, fname) for a in objs]
+            vals.extend(snap.field(c, snap.row_by_id[i]) for i in ids[n_new:])
+            parts.append(bytes(v is None for v in vals))
+            blob = "\0".join("" if v is None else v for v in vals).encode("utf-8")
+            parts.append(struct.pack("<Q", len(blob)))
+            parts.append(blob)
+        tmp = self._snapshot_path() + ".tmp"
+        with open(tmp, "wb") as f:
+            for p in parts:
+                f.write(p)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._snapshot_path())
+
+    def _segments(self) -> List[int]:
+        gens = []
+        for fn in os.listdir(self.directory):
+            if fn.startswith("log.") and fn[4:].isdigit():
+                gens.append(int(fn[4:]))
+        return sorted(gens)
+
+    def _acquire_dir_lock(self) -> None:
+        path = os.path.join(self.directory, "lock")
+        f = open(path, "a+b")
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise StoreLocked(f"{self.directory} is in use by another process; "
+                              f"the account store is single-process (one API worker per ACCOUNT_STORE_DIR)") from None
+        self._lock_file = f  # held until close(); the OS drops it if the process dies
+
+    def _recover(self) -> None:
+        t0 = time.perf_counter()
+        os.makedirs(self.directory, exist_ok=True)
+        self._acquire_dir_lock()
+        base_gen = self._load_snapshot()
+        replayed = 0
+        gens = self._segments()
+        for gen in gens:
+            if gen >= base_gen:
+                replayed += self._replay(self._log_path(gen))
+        self._open_log(max(gens + [base_gen - 1]) + 1)
+        self._log_records = replayed
+        self.recovery_s = time.perf_counter() - t0
+        print(f"[accounts] recovered {len(self)} accounts from {self.directory} "
+              f"({replayed} log records) in {self.recovery_s:.2f}s")
+
+    def compact(self) -> None:
+        """Snapshot the current state and drop the log segments it covers."""
+        if not self.directory:
+            return
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+            self._open_log(self._gen + 1)
+            base_gen = self._gen
+            by_id = dict(self._by_id)
+            snap, next_id = self._snap, self._next_id
+        try:
+            t0 = time.perf_counter()
+            self._write_snapshot(base_gen, by_id, snap, next_id)
+            for gen in self._segments():
+                if gen < base_gen:
+                    os.remove(self._log_path(gen))
+            self.last_compaction_s = time.perf_counter() - t0
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def _maybe_compact(self) -> None:
+        if self.directory and self._log_records >= self.compact_every and not self._compacting:
+            threading.Thread(target=self.compact, name="account-compact", daemon=True).start()
+
+    def close(self) -> None:
+        if self.directory and self._log_records:
+            self.compact()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if self._lock_file is not None:
+                self._lock_file.close()  # releases the flock
+                self._lock_file = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "accounts": len(self),
+            "durable": bool(self.directory),
+            "log_generation": self._gen,
+            "log_records_since_snapshot": self._log_records,
+            "recovery_s": round(self.recovery_s, 3),
+            "last_compaction_s": None if self.last_compaction_s is None else round(self.last_compaction_s, 3),
+        }
+
+# Singleton, opened (and recovered) on first use
+_store: Optional[AccountStore] = None
+_store_lock = threading.Lock()
+
+def get_account_store() -> AccountStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = AccountStore()
+    return _store
+
+def close_account_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+# ---------------------------------------------------------
+# Module API used by app.storage / app.storage_nodb
+# ---------------------------------------------------------
+def init_with_admin(name: str = "admin", password_hash: str = "") -> None:
+    """Seed an admin account if not present."""
+    store = get_account_store()
+    if store.get_by_name(name) is not None:
+        return
+    try:
+        store.create(name, password_hash)
+    except ValueError:
+        pass  # created concurrently
+
+def create_account(name: str, password_hash: str) -> Account:
+    return get_account_store().create(name, password_hash)
+
+def get_account_by_name(name: str) -> Optional[Account]:
+    return get_account_store().get_by_name(name)
+
+def get_account_by_id(user_id: int) -> Optional[Account]:
+    return get_account_store().get_by_id(user_id)
+
+# Backwards-compat: if old code used "email", treat it as username
+def get_user_by_email(email_or_name: str) -> Optional[Account]:
+    return get_account_by_name(email_or_name)
+
+def set_emergency_contact(user_id: int, phone: Optional[str]) -> None:
+    get_account_store().set_contact(user_id, phone)
+
+def get_emergency_contact(user_id: int) -> Optional[str]:
+    acc = get_account_store().get_by_id(user_id)
+    return acc.contact_number if acc else None
+
+# Optional aliases if other code imports these names:
+def get_contact(user_id: int) -> Optional[str]:
+    return get_emergency_contact(user_id)
+
+def upsert_contact(user_id: int, phone: Optional[str]) -> None:
+    set_emergency_contact(user_id, phone)
@@ -1,29 +1,57 @@
-import os, bcrypt, jwt, datetime
+import os, bcrypt, jwt, datetime, time
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from .storage import get_account_by_id
+from .principal_cache import get_principal_cache
+from .metrics import BCRYPT_LATENCY, METRICS_ENABLED, record, timed
+from .hashing import BCRYPT_ROUNDS, get_hash_pool, needs_rehash
 
 JWT_SECRET = os.getenv("JWT_SECRET", "change-me")  # set in .env for prod
 JWT_ALG = "HS256"
 bearer = HTTPBearer()
 
+@timed("bcrypt_hash", BCRYPT_LATENCY.labels("hash"))
 def hash_pw(p: str) -> str:
-    return bcrypt.hashpw(p.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(p.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
 
+@timed("bcrypt_verify", BCRYPT_LATENCY.labels("verify"))
 def verify_pw(p: str, h: str) -> bool:
     return bcrypt.checkpw(p.encode(), h.encode())
 
+# Async versions run on the bcrypt process pool (see hashing.py); use these in routes.
+async def _timed_async(op: str, coro):
+    t0 = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        dt = time.perf_counter() - t0
+        if METRICS_ENABLED:
+            BCRYPT_LATENCY.labels(op).observe(dt)
+        record(f"bcrypt_{op}", dt)
+
+async def hash_pw_async(p: str) -> str:
+    return await _timed_async("hash", get_hash_pool().hash(p))
+
+async def verify_pw_async(p: str, h: str) -> bool:
+    return await _timed_async("verify", get_hash_pool().verify(p, h))
+
 def make_token(user_id: int) -> str:
     payload = {"sub": user_id, "exp": datetime.datetime.utcnow() + datetime.timedelta(days=7)}
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALG)
 
+def decode_token(token: str):
+    """Returns (user id, exp as epoch seconds or None); raises on a bad/expired token."""
+    payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+    exp = payload.get("exp")
+    return int(payload["sub"]), float(exp) if exp is not None else None
+
 def require_user(creds: HTTPAuthorizationCredentials = Depends(bearer)):
+    cache = get_principal_cache()
     try:
-        payload = jwt.decode(creds.credentials, JWT_SECRET, algorithms=[JWT_ALG])
-        uid = int(payload["sub"])
+        uid = cache.uid_for_token(creds.credentials, decode_token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = get_account_by_id(uid)
+    user = cache.principal("storage", uid, get_account_by_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     return user
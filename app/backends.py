@@ -0,0 +1,295 @@
+# app/backends.py
+"""
+Detector backend registry.
+
+Every backend is a class whose instances expose the same contract:
+
+    infer(pil_image, return_image=False, orig_size=None)
+        -> (detections, jpeg_bytes | None, elapsed_ms)
+
+where detections are dicts {class_id, class_name, conf, box{x,y,w,h}} in
+`orig_size` (or the image's own) pixel coordinates. SSD-family backends also
+provide `detect_arrays(frame)` (used by the process pool) and may provide
+`infer_batch(images, sizes)` (used by the micro-batching scheduler).
+
+The backend is picked with DETECTOR_BACKEND; heavy frameworks are only
+imported by the factory that is actually used.
+
+The in-process detector can be replaced while serving: reload_detector()
+builds and warms a new instance off to the side, swaps it in atomically,
+waits for calls still leased on the old one (lease_detector) and then drops
+it. Every instance gets a ModelInfo whose `version` responses report.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+import gc, os, threading, time
+
+from .metrics import DETECTOR_LOAD
+
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "ssd")  # ssd | yolo | yolo-onnx | tflite | remote | stub
+SCORE_THRESH = float(os.getenv("SCORE_THRESH", "0.25"))
+MODEL_VERSION = os.getenv("MODEL_VERSION", "")  # label for the boot model; default <backend>-1
+DETECTOR_DRAIN_TIMEOUT_S = float(os.getenv("DETECTOR_DRAIN_TIMEOUT_S", "60"))
+
+_REGISTRY: Dict[str, Callable[[], Any]] = {}
+_SUPPORTS: Dict[str, FrozenSet[str]] = {}
+# Factory keyword -> the field reloads (and POST /admin/detector/reload) call it
+_OVERRIDE_FIELDS = {"model_path": "model_path", "labels": "labels_file"}
+
+class UnsupportedOverride(ValueError):
+    pass
+
+def register_backend(name: str, supports: Iterable[str] = ()):
+    """
+    Decorator for a factory returning a detector instance. Factories take no
+    required args; the optional overrides they accept (`model_path`, `labels`)
+    are listed in `supports` and used by reloads.
+    """
+    def deco(factory: Callable[[], Any]) -> Callable[[], Any]:
+        _REGISTRY[name] = factory
+        _SUPPORTS[name] = frozenset(supports)
+        return factory
+    return deco
+
+def available_backends() -> List[str]:
+    return sorted(_REGISTRY)
+
+def check_overrides(name: Optional[str] = None, **overrides: Any) -> str:
+    """
+    The backend name, after checking it exists and takes every non-None
+    override; raises ValueError / UnsupportedOverride before anything loads.
+    """
+    name = name or DETECTOR_BACKEND
+    if name not in _REGISTRY:
+        raise ValueError(f"Unknown DETECTOR_BACKEND {name!r}; choose one of {available_backends()}")
+    bad = sorted(_OVERRIDE_FIELDS.get(k, k) for k, v in overrides.items() if v is not None and k not in _SUPPORTS[name])
+    if bad:
+        takes = sorted(_OVERRIDE_FIELDS.get(k, k) for k in _SUPPORTS[name])
+        raise UnsupportedOverride(f"backend {name!r} does not support {', '.join(bad)} "
+                                  f"(supported: {', '.join(takes) or 'none'})")
+    return name
+
+def create_detector(name: Optional[str] = None, **overrides: Any) -> Any:
+    name = check_overrides(name, **overrides)
+    factory = _REGISTRY[name]
+    t0 = time.perf_counter()
+    det = factory(**{k: v for k, v in overrides.items() if v is not None})
+    DETECTOR_LOAD.labels(name).observe(time.perf_counter() - t0)
+    return det
+
+# ---------------------------------------------------------
+# Built-in backends
+# ---------------------------------------------------------
+@register_backend("ssd", supports={"model_path", "labels"})
+def _ssd(model_path: Optional[str] = None, labels: Any = None):
+    from .detector_ssd import MODEL_DIR, SSDDetector
+    return SSDDetector(score_thresh=SCORE_THRESH, model_dir=model_path or MODEL_DIR, labels=labels)
+
+@register_backend("yolo", supports={"model_path"})
+def _yolo(model_path: Optional[str] = None):
+    from .detector import Detector
+    return Detector(weights=model_path or os.getenv("YOLO_WEIGHTS", "yolov8n.pt"), conf=SCORE_THRESH, iou=0.45)
+
+@register_backend("yolo-onnx", supports={"model_path"})
+def _yolo_onnx(model_path: Optional[str] = None):
+    # Same YOLO model on ONNX Runtime; no torch/ultralytics at serve time
+    from .detector_onnx import ONNX_MODEL, YoloOnnxDetector
+    return YoloOnnxDetector(model_path=model_path or ONNX_MODEL, conf=SCORE_THRESH, iou=0.45)
+
+@register_backend("tflite", supports={"model_path", "labels"})
+def _tflite(model_path: Optional[str] = None, labels: Any = None):
+    from .detector_tflite import TFLITE_MODEL, TFLiteSSDDetector
+    return TFLiteSSDDetector(score_thresh=SCORE_THRESH, model_path=model_path or TFLITE_MODEL, labels=labels)
+
+@register_backend("remote")
+def _remote():
+    # Model lives in an app.sidecar process; this side never imports TF
+    from .sidecar import RemoteDetector
+    return RemoteDetector()
+
+@register_backend("stub")
+def _stub():
+    # Fixed boxes after a simulated model delay; for load tests (bench/loadgen.py)
+    from .detector_stub import StubDetector
+    return StubDetector()
+
+# ---------------------------------------------------------
+# Runtime thresholds (no reload)
+# ---------------------------------------------------------
+# Attribute names the backends read on every call
+_SCORE_ATTRS = ("score_thresh", "conf")
+_IOU_ATTRS = ("iou",)
+
+def get_thresholds(det: Any) -> Dict[str, float]:
+    out = {}
+    for key, attrs in (("score_thresh", _SCORE_ATTRS), ("iou", _IOU_ATTRS)):
+        for a in attrs:
+            if hasattr(det, a):
+                out[key] = getattr(det, a)
+                break
+    return out
+
+def set_thresholds(det: Any, score_thresh: Optional[float] = None, iou: Optional[float] = None) -> Dict[str, float]:
+    """Sets whichever of the backend's thresholds exist; returns the resulting values."""
+    for value, attrs in ((score_thresh, _SCORE_ATTRS), (iou, _IOU_ATTRS)):
+        if value is None:
+            continue
+        for a in attrs:
+            if hasattr(det, a):
+                setattr(det, a, float(value))
+    return get_thresholds(det)
+
+# ---------------------------------------------------------
+# Singleton with hot swap
+# ---------------------------------------------------------
+@dataclass(frozen=True)
+class ModelInfo:
+    version: str
+    backend: str
+    generation: int
+    model_path: Optional[str]
+    labels_file: Optional[str]
+    loaded_at: float
+    load_s: float
+
+class _Slot:
+    """One detector instance plus the calls currently leased on it."""
+    def __init__(self, det: Any, info: ModelInfo):
+        self.det = det
+        self.info = info
+        self.inflight = 0
+        self.cond = threading.Condition()
+
+    def drain(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while self.inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+        return True
+
+_slot: Optional[_Slot] = None
+_detector_lock = threading.Lock()
+_reload_lock = threading.Lock()      # one reload at a time
+_generation = 0
+_reload_state: Dict[str, Any] = {"state": "idle"}
+_swap_listeners: List[Callable[[Any], None]] = []
+
+class ReloadInProgress(RuntimeError):
+    pass
+
+def _build(backend: str, model_path: Optional[str], labels_file: Optional[str],
+           version: Optional[str]) -> _Slot:
+    global _generation
+    labels = None
+    if labels_file:
+        from .postprocess import load_labels
+        labels = load_labels(labels_file)
+    t0 = time.perf_counter()
+    det = create_detector(backend, model_path=model_path, labels=labels)
+    load_s = time.perf_counter() - t0
+    with _detector_lock:
+        _generation += 1
+        gen = _generation
+    info = ModelInfo(
+        version=version or (MODEL_VERSION if gen == 1 and MODEL_VERSION else f"{backend}-{gen}"),
+        backend=backend, generation=gen, model_path=model_path, labels_file=labels_file,
+        loaded_at=time.time(), load_s=round(load_s, 3),
+    )
+    return _Slot(det, info)
+
+def _current() -> _Slot:
+    global _slot
+    slot = _slot
+    if slot is not None:
+        return slot
+    with _reload_lock:
+        if _slot is None:
+            _slot = _build(DETECTOR_BACKEND, None, None, None)
+    return _slot
+
+def get_detector() -> Any:
+    return _current().det
+
+def model_info() -> ModelInfo:
+    return _current().info
+
+@contextmanager
+def lease_detector() -> Iterator[Tuple[Any, ModelInfo]]:
+    """The current detector and its info; a reload waits for the lease to end before freeing it."""
+    while True:
+        slot = _current()
+        with _detector_lock:
+            if slot is _slot:  # not swapped out between the read and the count
+                with slot.cond:
+                    slot.inflight += 1
+                break
+    try:
+        yield slot.det, slot.info
+    finally:
+        with slot.cond:
+            slot.inflight -= 1
+            if not slot.inflight:
+                slot.cond.notify_all()
+
+def add_swap_listener(fn: Callable[[Any], None]) -> None:
+    """`fn(new_detector)` runs right after each swap (e.g. the batch scheduler retargets)."""
+    _swap_listeners.append(fn)
+
+def reload_detector(backend: Optional[str] = None, model_path: Optional[str] = None,
+                    labels_file: Optional[str] = None, version: Optional[str] = None,
+                    score_thresh: Optional[float] = None, iou: Optional[float] = None,
+                    drain_timeout: float = DETECTOR_DRAIN_TIMEOUT_S) -> Dict[str, Any]:
+    """
+    Loads + warms a new instance while the old one keeps serving, swaps it in,
+    waits up to `drain_timeout` for calls leased on the old one, then frees it.
+    Runtime thresholds carry over unless given. Raises ReloadInProgress if a
+    reload is already running and UnsupportedOverride (a ValueError) if the
+    backend doesn't take model_path / labels_file; load errors leave the old
+    model in place.
+    """
+    global _slot
+    if not _reload_lock.acquire(blocking=False):
+        raise ReloadInProgress("a reload is already in progress")
+    try:
+        old = _current() if _slot is not None else None
+        backend = check_overrides(backend or (old.info.backend if old else DETECTOR_BACKEND),
+                                  model_path=model_path, labels=labels_file)
+        _reload_state.update(state="loading", backend=backend, started_at=time.time(), error=None)
+        try:
+            new = _build(backend, model_path, labels_file, version)
+        except Exception as e:
+            _reload_state.update(state="failed", error=repr(e))
+            raise
+        thresholds = get_thresholds(old.det) if old and old.info.backend == backend else {}
+        thresholds.update({k: v for k, v in (("score_thresh", score_thresh), ("iou", iou)) if v is not None})
+        set_thresholds(new.det, **thresholds)
+
+        with _detector_lock:
+            _slot = new
+        for fn in _swap_listeners:
+            fn(new.det)
+
+        _reload_state.update(state="draining", version=new.info.version)
+        drained = old.drain(drain_timeout) if old else True
+        pending = old.inflight if old else 0
+        if old is not None:
+            close = getattr(old.det, "close", None)
+            if callable(close) and drained:
+                close()
+            old.det = None  # late leases still hold their own reference
+            old = None
+            gc.collect()
+        result = {"version": new.info.version, "model": asdict(new.info), "drained": drained,
+                  "still_inflight_on_old": pending}
+        _reload_state.update(state="idle", last=result)
+        return result
+    finally:
+        _reload_lock.release()
+
+def reload_status() -> Dict[str, Any]:
+    return dict(_reload_state)
@@ -0,0 +1,140 @@
+# app/batching.py
+"""
+Dynamic micro-batching in front of the detector.
+
+Concurrent /detect calls are queued for a short window (max batch size /
+max wait) and then served by a single `SSDDetector.infer_batch` call.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Tuple, Optional
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import os, queue, threading, time
+
+from PIL import Image
+
+from .postprocess import annotate, rescale_detections
+
+BATCH_ENABLED = os.getenv("BATCH_ENABLED", "0") == "1"
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+@dataclass
+class _Pending:
+    image: Image.Image
+    orig_size: Tuple[int, int]
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+def _percentiles(samples, ps=(50, 95, 99)) -> Dict[str, float]:
+    if not samples:
+        return {f"p{p}": 0.0 for p in ps}
+    s = sorted(samples)
+    return {f"p{p}": round(s[min(len(s) - 1, int(len(s) * p / 100))], 3) for p in ps}
+
+class BatchScheduler:
+    """
+    Collects requests on a queue and runs them through `detector.infer_batch`
+    from one worker thread. Same `infer()` contract as the detector itself.
+    """
+    def __init__(self, detector, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self.detector = detector
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000.0
+
+        self._q: "queue.Queue[_Pending]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._size_hist: Dict[int, int] = {}
+        self._wait_ms: deque = deque(maxlen=4096)
+        self._model_ms: deque = deque(maxlen=4096)
+
+        self._worker = threading.Thread(target=self._run, name="batch-scheduler", daemon=True)
+        self._worker.start()
+
+    # --- public API ---
+    def submit(self, pil_image: Image.Image, orig_size: Optional[Tuple[int, int]] = None) -> Future:
+        """Queues one image; the future resolves to (detections, elapsed_ms)."""
+        fut: Future = Future()
+        self._q.put(_Pending(pil_image, orig_size or pil_image.size, fut))
+        return fut
+
+    def infer(
+        self,
+        pil_image: Image.Image,
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        dets, elapsed_ms = self.submit(pil_image, orig_size).result()
+        # Annotate on the caller's thread so the batch worker only runs the model
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, rescale_detections(dets, orig_size or pil_image.size, pil_image.size))
+        return dets, jpeg_bytes, elapsed_ms
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 3) if self._batches else 0.0,
+                "batch_size_hist": dict(sorted(self._size_hist.items())),
+                "queue_wait_ms": _percentiles(self._wait_ms),
+                "model_ms": _percentiles(self._model_ms),
+                "queued": self._q.qsize(),
+            }
+
+    # --- worker ---
+    def _collect(self) -> List[_Pending]:
+        batch = [self._q.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                results, elapsed_ms = self.detector.infer_batch(
+                    [p.image for p in batch], [p.orig_size for p in batch])
+            except Exception as e:
+                for p in batch:
+                    p.future.set_exception(e)
+                continue
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._size_hist[len(batch)] = self._size_hist.get(len(batch), 0) + 1
+                self._model_ms.append(elapsed_ms)
+                for p in batch:
+                    self._wait_ms.append((started - p.enqueued_at) * 1000.0)
+
+            for p, dets in zip(batch, results):
+                p.future.set_result((dets, elapsed_ms))
+
+# Singleton
+_scheduler: Optional[BatchScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def get_batch_scheduler() -> BatchScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            from .backends import add_swap_listener, get_detector
+            _scheduler = BatchScheduler(get_detector())
+            # Hot reload: later batches go to the new instance
+            add_swap_listener(lambda det: setattr(_scheduler, "detector", det))
+    return _scheduler
@@ -0,0 +1,135 @@
+# app/compact.py
+"""
+Compact columnar /detect payload for clients that parse every frame.
+
+Instead of a list of {class_id, class_name, conf, box{x,y,w,h}} objects the
+body holds parallel arrays:
+
+    class_ids  [n] ints
+    conf       [n] ints, confidence * conf_scale (1000 -> 0.001 steps)
+    boxes      [4n] ints, x,y,w,h per detection in original-image pixels
+    labels_version  hash of the backend's label table
+
+The label table itself (`labels`, index = class id) is only included when the
+client didn't send the same labels_version (query param or X-Labels-Version
+header), so a client fetches it once and then caches it by version. It is
+also served by GET /labels.
+
+Negotiated with ?compact=json|msgpack or an Accept header of
+application/vnd.blindspot.detections+json / +msgpack (application/msgpack
+and application/x-msgpack also select MessagePack).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple, Union
+import hashlib, threading
+
+import numpy as np
+
+from .postprocess import LABEL_TABLE, Columns
+
+COMPACT_JSON = "application/vnd.blindspot.detections+json"
+COMPACT_MSGPACK = "application/vnd.blindspot.detections+msgpack"
+_MSGPACK_TYPES = (COMPACT_MSGPACK, "application/msgpack", "application/x-msgpack")
+FORMAT_NAME = "blindspot.compact.v1"
+CONF_SCALE = 1000
+
+def negotiate(query: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """'json', 'msgpack' or None (the regular DetectResponse)."""
+    if query:
+        return query
+    accept = (accept or "").lower()
+    if any(t in accept for t in _MSGPACK_TYPES):
+        return "msgpack"
+    if COMPACT_JSON in accept:
+        return "json"
+    return None
+
+# ---------------------------------------------------------
+# Label tables, versioned by content
+# ---------------------------------------------------------
+_versions: Dict[int, Tuple[Any, str, List[str]]] = {}
+_versions_lock = threading.Lock()
+
+def label_table(labels: np.ndarray = LABEL_TABLE) -> Tuple[str, List[str]]:
+    """(version, names) for a backend's id -> name array; hashed once per table."""
+    key = id(labels)
+    with _versions_lock:
+        hit = _versions.get(key)
+        if hit is not None and hit[0] is labels:
+            return hit[1], hit[2]
+    names = [str(n) for n in labels.tolist()]
+    # Trailing str(id) placeholders (see postprocess._label_table) carry no information
+    while names and names[-1] == str(len(names) - 1):
+        names.pop()
+    version = hashlib.blake2b("\n".join(names).encode("utf-8"), digest_size=6).hexdigest()
+    with _versions_lock:
+        _versions[key] = (labels, version, names)  # keeps `labels` alive, so id() stays unique
+    return version, names
+
+# ---------------------------------------------------------
+# Columns
+# ---------------------------------------------------------
+def columns_from_detections(dets: List[Dict[str, Any]]) -> Columns:
+    """
+    Columns from the API's detection dicts, for backends that only hand back
+    dicts (the worker pool, the batcher, YOLO); SSD-family results arrive as
+    Columns straight from detect_arrays().
+    """
+    n = len(dets)
+    ids = np.fromiter((d["class_id"] for d in dets), dtype=np.int64, count=n)
+    conf = np.fromiter((d["conf"] for d in dets), dtype=np.float64, count=n)
+    xywh = np.fromiter(
+        (v for d in dets for v in (d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"])),
+        dtype=np.float64, count=4 * n,
+    ).reshape(n, 4)
+    return Columns(ids, conf, xywh)
+
+def _names_match(dets: Union[Columns, List[Dict[str, Any]]], ids: np.ndarray, names: List[str]) -> bool:
+    if not len(ids):
+        return True
+    if ids.min() < 0 or ids.max() >= len(names):
+        return False
+    if isinstance(dets, Columns):
+        return True  # named from this very table
+    return all(d["class_name"] == names[i] for d, i in zip(dets, ids.tolist()))
+
+def build(dets: Union[Columns, List[Dict[str, Any]]], labels: np.ndarray, client_version: Optional[str],
+          **meta: Any) -> Tuple[Dict[str, Any], str]:
+    """
+    The compact payload (before JSON/MessagePack encoding) and the label
+    version to advertise. `dets` are Columns from the backend that owns
+    `labels`, or detection dicts; if dicts don't agree with the table (e.g.
+    the model behind a worker pool has its own names), only the names of the
+    ids present are sent, unversioned.
+    """
+    cols = dets if isinstance(dets, Columns) else columns_from_detections(dets)
+    ids = cols.class_ids.astype(np.int32)
+    conf = np.rint(cols.conf * CONF_SCALE).astype(np.int32)
+    xywh = np.rint(cols.xywh).astype(np.int32)
+    version, names = label_table(labels)
+    body: Dict[str, Any] = {
+        "format": FORMAT_NAME,
+        "n": int(len(ids)),
+        "class_ids": ids.tolist(),
+        "conf": conf.tolist(),
+        "conf_scale": CONF_SCALE,
+        "boxes": xywh.reshape(-1).tolist(),
+        **meta,
+    }
+    if _names_match(dets, ids, names):
+        body["labels_version"] = version
+        if client_version != version:
+            body["labels"] = names
+    else:
+        version = ""
+        body["labels_version"] = None
+        if isinstance(dets, Columns):
+            table = labels.tolist()
+            body["labels"] = {str(i): str(table[i]) if 0 <= i < len(table) else str(i) for i in ids.tolist()}
+        else:
+            body["labels"] = {str(d["class_id"]): d["class_name"] for d in dets}
+    return body, version
+
+def encode_msgpack(body: Dict[str, Any]) -> bytes:
+    import msgpack
+    return msgpack.packb(body, use_bin_type=True)
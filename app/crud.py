@@ -1,11 +1,16 @@
+import asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from . import models
 from .auth import hash_pw  # reuse yours
 
-def create_account(db: Session, name: str, password: str, contact_number: str | None):
+def create_account(db: Session, name: str, password: str | None, contact_number: str | None,
+                   password_hash: str | None = None):
+    # Pass password_hash when it was already computed off-thread (auth.hash_pw_async)
     acc = models.Account(
         fld_Name=name,
-        fld_Password=hash_pw(password),
+        fld_Password=password_hash or hash_pw(password),
         fld_ContactNumber=contact_number,
     )
     db.add(acc)
@@ -15,3 +20,58 @@ def create_account(db: Session, name: str, password: str, contact_number: str |
 
 def get_account_by_name(db: Session, name: str):
     return db.query(models.Account).filter(models.Account.fld_Name == name).first()
+
+def get_account_by_id(db: Session, user_id: int):
+    return db.query(models.Account).filter(models.Account.fld_ID == user_id).first()
+
+def update_password_hash(db: Session, acc: models.Account, password_hash: str):
+    acc.fld_Password = password_hash
+    db.add(acc)
+    db.commit()
+    return acc
+
+def save_account(db: Session, acc: models.Account):
+    db.add(acc)
+    db.commit()
+    db.refresh(acc)
+    return acc
+
+# ---------------------------------------------------------
+# Async versions. `db` is an AsyncSession (DB_ASYNC=1) or, on the sync
+# fallback, a plain Session whose calls are pushed to a worker thread.
+# ---------------------------------------------------------
+async def get_account_by_name_async(db, name: str):
+    if not isinstance(db, AsyncSession):
+        return await asyncio.to_thread(get_account_by_name, db, name)
+    res = await db.execute(select(models.Account).where(models.Account.fld_Name == name).limit(1))
+    return res.scalars().first()
+
+async def get_account_by_id_async(db, user_id: int):
+    if not isinstance(db, AsyncSession):
+        return await asyncio.to_thread(get_account_by_id, db, user_id)
+    return await db.get(models.Account, user_id)
+
+async def create_account_async(db, name: str, password_hash: str, contact_number: str | None):
+    if not isinstance(db, AsyncSession):
+        return await asyncio.to_thread(create_account, db, name, None, contact_number, password_hash)
+    acc = models.Account(fld_Name=name, fld_Password=password_hash, fld_ContactNumber=contact_number)
+    db.add(acc)
+    await db.commit()
+    await db.refresh(acc)
+    return acc
+
+async def update_password_hash_async(db, acc: models.Account, password_hash: str):
+    if not isinstance(db, AsyncSession):
+        return await asyncio.to_thread(update_password_hash, db, acc, password_hash)
+    acc.fld_Password = password_hash
+    db.add(acc)
+    await db.commit()
+    return acc
+
+async def save_account_async(db, acc: models.Account):
+    if not isinstance(db, AsyncSession):
+        return await asyncio.to_thread(save_account, db, acc)
+    db.add(acc)
+    await db.commit()
+    await db.refresh(acc)
+    return acc
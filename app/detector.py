@@ -6,22 +6,58 @@ from ultralytics import YOLO
 import torch
 
 class Detector:
+    accepts_img_size = True  # infer(img_size=...) sets the network input (see modes.py)
+
     def __init__(self, weights: str = "yolov8n.pt", conf: float = 0.25, iou: float = 0.45):
         self.model = YOLO(weights)
         device = "cuda" if torch.cuda.is_available() else "cpu"
         self.model.to(device)
         self.names = self.model.model.names if hasattr(self.model.model, "names") else self.model.names
+        # Class-id -> name lookup as one array so labels are resolved with a single take()
+        n = (max(self.names) + 1) if isinstance(self.names, dict) else len(self.names)
+        self.labels = np.array(
+            [self.names.get(i, str(i)) if isinstance(self.names, dict) else self.names[i] for i in range(n)],
+            dtype=object,
+        )
         self.conf = conf
         self.iou = iou
 
     def _pil_to_nd(self, img: Image.Image) -> np.ndarray:
-        return np.array(img.convert("RGB"))
+        return np.asarray(img if img.mode == "RGB" else img.convert("RGB"))
 
     def _nd_to_pil(self, arr: np.ndarray) -> Image.Image:
         return Image.fromarray(arr)
 
-    def infer(self, pil_image: Image.Image, return_image: bool = False, img_size: int = 640) -> Tuple[List[Dict[str, Any]], bytes | None, float]:
-        """Run detection on a PIL image. Returns: detections, jpeg_bytes(optional), elapsed_ms"""
+    def _postprocess(self, results, sx: float = 1.0, sy: float = 1.0) -> List[Dict[str, Any]]:
+        """ultralytics Results -> detection dicts, boxes scaled by (sx, sy)."""
+        dets: List[Dict[str, Any]] = []
+        for r in results:
+            boxes = r.boxes
+            if len(boxes) == 0:
+                continue
+            xyxy = boxes.xyxy.cpu().numpy().astype(np.float64) * np.array([sx, sy, sx, sy])
+            cls = boxes.cls.cpu().numpy().astype(np.int64)
+            confs = np.round(boxes.conf.cpu().numpy().astype(np.float64), 4)
+            in_range = (cls >= 0) & (cls < len(self.labels))
+            names = self.labels[np.where(in_range, cls, 0)]
+            if not in_range.all():
+                names[~in_range] = cls[~in_range].astype(str)
+            x, y = xyxy[:, 0], xyxy[:, 1]
+            w, h = xyxy[:, 2] - x, xyxy[:, 3] - y
+            dets.extend(
+                {"class_id": c, "class_name": n, "conf": cf, "box": {"x": bx, "y": by, "w": bw, "h": bh}}
+                for c, n, cf, bx, by, bw, bh in zip(
+                    cls.tolist(), names.tolist(), confs.tolist(), x.tolist(), y.tolist(), w.tolist(), h.tolist()
+                )
+            )
+        return dets
+
+    def infer(self, pil_image: Image.Image, return_image: bool = False, img_size: int = 640,
+              orig_size: Tuple[int, int] | None = None) -> Tuple[List[Dict[str, Any]], bytes | None, float]:
+        """Run detection on a PIL image. Returns: detections, jpeg_bytes(optional), elapsed_ms
+        orig_size: (W, H) to report boxes in when pil_image is a reduced decode."""
+        W, H = orig_size or pil_image.size
+        sx, sy = W / pil_image.width, H / pil_image.height
         img_nd = self._pil_to_nd(pil_image)
         t0 = time.time()
         results = self.model.predict(
@@ -29,23 +65,7 @@ class Detector:
         )
         elapsed_ms = (time.time() - t0) * 1000
 
-        dets: List[Dict[str, Any]] = []
-        for r in results:
-            boxes = r.boxes
-            for i in range(len(boxes)):
-                xyxy = boxes.xyxy[i].tolist()  # [x1,y1,x2,y2]
-                cls_id = int(boxes.cls[i])
-                conf = float(boxes.conf[i])
-                x1, y1, x2, y2 = xyxy
-                dets.append({
-                    "class_id": cls_id,
-                    "class_name": self.names.get(cls_id, str(cls_id)) if isinstance(self.names, dict) else self.names[cls_id],
-                    "conf": round(conf, 4),
-                    "box": {
-                        "x": float(x1), "y": float(y1),
-                        "w": float(x2 - x1), "h": float(y2 - y1)
-                    }
-                })
+        dets = self._postprocess(results, sx, sy)
 
         jpeg_bytes = None
         if return_image:
@@ -53,7 +73,8 @@ class Detector:
             canvas = pil_image.copy()
             draw = ImageDraw.Draw(canvas, "RGBA")
             for d in dets:
-                x, y, w, h = d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"]
+                x, y = d["box"]["x"] / sx, d["box"]["y"] / sy
+                w, h = d["box"]["w"] / sx, d["box"]["h"] / sy
                 x2, y2 = x + w, y + h
                 draw.rectangle([x, y, x2, y2], outline=(66, 135, 245, 255), width=3)
                 label = f'{d["class_name"]} {d["conf"]:.2f}'
@@ -63,13 +84,3 @@ class Detector:
             jpeg_bytes = buf.getvalue()
 
         return dets, jpeg_bytes, elapsed_ms
-
-# Singleton instance (loaded once at startup)
-detector: Detector | None = None
-
-def get_detector() -> Detector:
-    global detector
-    if detector is None:
-        # you can swap to weights/your_custom.pt later
-        detector = Detector(weights="yolov8n.pt", conf=0.25, iou=0.45)
-    return detector
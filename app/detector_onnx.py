@@ -0,0 +1,176 @@
+# app/detector_onnx.py
+"""
+YOLOv8 on ONNX Runtime (DETECTOR_BACKEND=yolo-onnx): no torch, no ultralytics.
+
+Export the weights once (needs ultralytics, on a dev machine only):
+
+    python scripts/export_yolo_onnx.py --weights yolov8n.pt --imgsz 640
+
+then install just `onnxruntime` on the serving nodes. Pre/post-processing is
+plain NumPy: letterbox to the network size, decode the raw [1, 4+C, N] head
+(cx, cy, w, h + per-class scores), class-aware NMS. Output matches
+detector.Detector.infer(); boxes are in the original image's pixels.
+
+Session threads and graph optimization are set with ONNX_INTRA_THREADS,
+ONNX_INTER_THREADS and ONNX_GRAPH_OPT (disable | basic | extended | all).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+import ast, os, time
+
+import numpy as np
+from PIL import Image
+
+from .postprocess import COCO_LABELS, _label_table, annotate, format_detections
+
+ROOT = Path(__file__).resolve().parent
+ONNX_MODEL = Path(os.getenv("ONNX_MODEL", str(ROOT / "models" / "yolov8n.onnx")))
+ONNX_INTRA_THREADS = int(os.getenv("ONNX_INTRA_THREADS", str(os.cpu_count() or 1)))
+ONNX_INTER_THREADS = int(os.getenv("ONNX_INTER_THREADS", "1"))
+ONNX_GRAPH_OPT = os.getenv("ONNX_GRAPH_OPT", "all")
+YOLO_MAX_DET = int(os.getenv("YOLO_MAX_DET", "300"))
+
+_LETTERBOX_FILL = 114  # ultralytics' pad value
+_MAX_NMS = 30000       # candidates considered by NMS
+_MAX_WH = 7680.0       # per-class box offset for class-aware NMS in one pass
+
+def letterbox(pil_image: Image.Image, size: int) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """
+    Resize keeping aspect ratio and pad to size x size.
+    Returns (float32 [1,3,size,size] in 0..1, scale, (pad_x, pad_y)).
+    """
+    w, h = pil_image.size
+    scale = min(size / w, size / h)
+    nw, nh = max(1, round(w * scale)), max(1, round(h * scale))
+    img = pil_image if pil_image.mode == "RGB" else pil_image.convert("RGB")
+    if (nw, nh) != (w, h):
+        img = img.resize((nw, nh), Image.BILINEAR)
+    pad_x, pad_y = (size - nw) // 2, (size - nh) // 2
+    canvas = np.full((size, size, 3), _LETTERBOX_FILL, dtype=np.uint8)
+    canvas[pad_y:pad_y + nh, pad_x:pad_x + nw] = np.asarray(img)
+    x = canvas.transpose(2, 0, 1)[np.newaxis].astype(np.float32) * (1.0 / 255.0)
+    return np.ascontiguousarray(x), scale, (pad_x, pad_y)
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_thresh: float, max_det: int) -> np.ndarray:
+    """Greedy NMS over xyxy boxes; returns kept indices, best score first."""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep: List[int] = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        ih = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = iw * ih
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thresh]
+    return np.asarray(keep, dtype=np.int64)
+
+class YoloOnnxDetector:
+    def __init__(
+        self,
+        model_path: Path = ONNX_MODEL,
+        conf: float = 0.25,
+        iou: float = 0.45,
+        max_det: int = YOLO_MAX_DET,
+        intra_threads: int = ONNX_INTRA_THREADS,
+        inter_threads: int = ONNX_INTER_THREADS,
+        graph_opt: str = ONNX_GRAPH_OPT,
+    ):
+        import onnxruntime as ort
+
+        if not Path(model_path).exists():
+            raise FileNotFoundError(
+                f"ONNX model not found at: {model_path}\n"
+                "Create it with: python scripts/export_yolo_onnx.py --weights yolov8n.pt"
+            )
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = max(1, intra_threads)
+        opts.inter_op_num_threads = max(1, inter_threads)
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = {
+            "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+            "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+            "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+            "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+        }[graph_opt]
+        self.session = ort.InferenceSession(str(model_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        side = inp.shape[2]
+        # Dynamic-axes exports take any (32-aligned) size; fixed ones only their own
+        self.input_size = side if isinstance(side, int) else 640
+        self.accepts_img_size = not isinstance(side, int)
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.labels = self._labels()
+
+        # Warmup
+        self.session.run(None, {self.input_name: np.zeros((1, 3, self.input_size, self.input_size), np.float32)})
+
+    def _labels(self) -> np.ndarray:
+        # ultralytics stores {id: name} in the ONNX metadata
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        if names:
+            try:
+                d = ast.literal_eval(names)
+                return _label_table([d.get(i, str(i)) for i in range(max(d) + 1)])
+            except (ValueError, SyntaxError):
+                pass
+        return _label_table(COCO_LABELS[1:])  # COCO-80, 0-based
+
+    def _align(self, img_size: Optional[int]) -> int:
+        if not img_size or not self.accepts_img_size:
+            return self.input_size
+        return max(32, int(img_size) // 32 * 32)
+
+    def _decode(self, pred: np.ndarray, scale: float, pad: Tuple[int, int], w: int, h: int):
+        """Raw head [4+C, N] -> normalized (ymin,xmin,ymax,xmax) boxes, scores, class ids."""
+        pred = pred.T                                       # [N, 4+C]
+        cls_scores = pred[:, 4:]
+        classes = cls_scores.argmax(axis=1)
+        scores = cls_scores[np.arange(len(classes)), classes]
+        keep = scores >= self.conf
+        if not keep.any():
+            return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32)
+        pred, scores, classes = pred[keep], scores[keep], classes[keep]
+        if len(scores) > _MAX_NMS:
+            top = np.argpartition(-scores, _MAX_NMS)[:_MAX_NMS]
+            pred, scores, classes = pred[top], scores[top], classes[top]
+
+        cx, cy, bw, bh = pred[:, 0], pred[:, 1], pred[:, 2], pred[:, 3]
+        xyxy = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+        idx = nms(xyxy + (classes * _MAX_WH)[:, None], scores, self.iou, self.max_det)
+        xyxy, scores, classes = xyxy[idx], scores[idx], classes[idx]
+
+        # Undo the letterbox, then normalize to the fed image
+        xyxy = (xyxy - np.array([pad[0], pad[1], pad[0], pad[1]], np.float32)) / scale
+        xyxy = xyxy.clip(0, np.array([w, h, w, h], np.float32))
+        yxyx = xyxy[:, [1, 0, 3, 2]] / np.array([h, w, h, w], np.float32)
+        return yxyx.astype(np.float32), scores.astype(np.float32), classes.astype(np.int32)
+
+    def _run(self, pil_image: Image.Image, img_size: Optional[int] = None):
+        x, scale, pad = letterbox(pil_image, self._align(img_size))
+        t0 = time.time()
+        out = self.session.run(None, {self.input_name: x})[0]
+        elapsed_ms = (time.time() - t0) * 1000.0
+        return self._decode(out[0], scale, pad, *pil_image.size), elapsed_ms
+
+    def detect_arrays(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Compact output for the process pool / sidecar (normalized boxes)."""
+        arrays, _ = self._run(Image.fromarray(frame))
+        return arrays
+
+    def infer(self, pil_image: Image.Image, return_image: bool = False, img_size: int = 640,
+              orig_size: Optional[Tuple[int, int]] = None) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        W, H = orig_size or pil_image.size
+        (boxes, scores, classes), elapsed_ms = self._run(pil_image, img_size)
+        dets = format_detections(boxes, scores, classes, W, H, labels=self.labels)
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, format_detections(boxes, scores, classes, *pil_image.size, labels=self.labels))
+        return dets, jpeg_bytes, elapsed_ms
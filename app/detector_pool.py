@@ -0,0 +1,373 @@
+# app/detector_pool.py
+"""
+Multi-process inference pool.
+
+N spawned worker processes each load the configured backend (DETECTOR_BACKEND,
+which must provide `detect_arrays`: ssd, tflite or yolo-onnx) once. Decoded uint8 frames
+are copied into a per-worker `multiprocessing.shared_memory` ring of slots, so
+only a tiny (req_id, slot, h, w) message crosses the pipe; workers send back the
+compact detection arrays from `detect_arrays`. Class ids are named with the
+label table each worker reports when it is ready (COCO-80 for yolo-onnx,
+LABELS_FILE for the SSD family), not the parent's own.
+
+Selected with DETECTOR_MODE=pool.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Tuple, Optional
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import itertools, multiprocessing as mp, os, threading, time
+
+import numpy as np
+from PIL import Image
+
+from .backends import DETECTOR_BACKEND, create_detector
+from .postprocess import LABEL_TABLE, annotate, format_detections
+from .preprocess import to_uint8_array
+
+DETECTOR_MODE = os.getenv("DETECTOR_MODE", "inproc")  # inproc | pool
+POOL_WORKERS = int(os.getenv("POOL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+POOL_SLOTS = int(os.getenv("POOL_SLOTS", "4"))            # ring slots per worker
+POOL_MAX_SIDE = int(os.getenv("POOL_MAX_SIDE", "1280"))   # frames are shrunk to fit a slot
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT", "30"))     # seconds per request
+POOL_HEALTH_INTERVAL = float(os.getenv("POOL_HEALTH_INTERVAL", "2"))
+POOL_PONG_TIMEOUT = float(os.getenv("POOL_PONG_TIMEOUT", "10"))  # idle worker silent this long -> restart
+
+# ---------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------
+def _worker_main(conn, shm_name: str, slot_bytes: int, backend: str) -> None:
+    # Attach without letting this process's resource tracker unlink the parent's segment.
+    from multiprocessing import resource_tracker
+    shm = shared_memory.SharedMemory(name=shm_name)
+    resource_tracker.unregister(shm._name, "shared_memory")
+
+    det = create_detector(backend)
+    if not hasattr(det, "detect_arrays"):
+        conn.send(("fatal", f"backend {backend!r} has no detect_arrays(); pool needs ssd, tflite or yolo-onnx"))
+        shm.close()
+        return
+    conn.send(("ready", os.getpid(), getattr(det, "labels", LABEL_TABLE).tolist()))
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = msg[0]
+        if kind == "stop":
+            break
+        if kind == "ping":
+            conn.send(("pong",))
+            continue
+
+        _, req_id, slot, h, w = msg
+        try:
+            frame = np.ndarray((h, w, 3), dtype=np.uint8, buffer=shm.buf, offset=slot * slot_bytes)
+            t0 = time.time()
+            boxes, scores, classes = det.detect_arrays(frame)
+            elapsed_ms = (time.time() - t0) * 1000.0
+            del frame
+            conn.send(("result", req_id, boxes, scores, classes, elapsed_ms))
+        except Exception as e:
+            conn.send(("error", req_id, repr(e)))
+    shm.close()
+
+# ---------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------
+class _Worker:
+    """One worker process plus its shared-memory ring and result reader."""
+    def __init__(self, ctx, index: int, slots: int, slot_bytes: int, backend: str):
+        self.index = index
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        self.conn, child_conn = ctx.Pipe(duplex=True)
+        self.proc = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm.name, slot_bytes, backend),
+            name=f"detector-pool-{index}",
+            daemon=True,
+        )
+        self.proc.start()
+        child_conn.close()
+
+        self.ready = threading.Event()
+        self.labels: np.ndarray = LABEL_TABLE  # the worker's own table, set before `ready`
+        self.fatal: Optional[str] = None
+        self.last_pong = time.time()
+        self.last_ping = 0.0
+        self._free = deque(range(slots))
+        self._slots = threading.Semaphore(slots)
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.inflight: Dict[int, Tuple[Future, int, float]] = {}
+
+        self._reader = threading.Thread(target=self._read_loop, name=f"detector-pool-reader-{index}", daemon=True)
+        self._reader.start()
+
+    # --- requests ---
+    def submit(self, req_id: int, frame: np.ndarray) -> Future:
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise TimeoutError("no free shared-memory slot")
+        with self._lock:
+            slot = self._free.popleft()
+        h, w = frame.shape[:2]
+        dst = np.ndarray((h, w, 3), dtype=np.uint8, buffer=self.shm.buf, offset=slot * self.slot_bytes)
+        dst[...] = frame
+        del dst
+
+        fut: Future = Future()
+        with self._lock:
+            self.inflight[req_id] = (fut, slot, time.time())
+        try:
+            with self._send_lock:
+                self.conn.send(("infer", req_id, slot, h, w))
+        except (OSError, ValueError) as e:
+            self._finish(req_id, exc=RuntimeError(f"detector worker unavailable: {e!r}"))
+        return fut
+
+    def ping(self) -> None:
+        if self.last_ping > self.last_pong:
+            return  # previous ping still unanswered; keep its timestamp for pong_overdue()
+        self.last_ping = time.time()
+        try:
+            with self._send_lock:
+                self.conn.send(("ping",))
+        except (OSError, ValueError):
+            pass
+
+    def _finish(self, req_id: int, result=None, exc: Optional[BaseException] = None) -> None:
+        with self._lock:
+            entry = self.inflight.pop(req_id, None)
+            if entry is None:
+                return
+            fut, slot, _ = entry
+            self._free.append(slot)
+        self._slots.release()
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
+
+    def _read_loop(self) -> None:
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            kind = msg[0]
+            if kind == "ready":
+                self.labels = np.array(msg[2], dtype=object)
+                self.ready.set()
+            elif kind == "fatal":
+                self.fatal = msg[1]
+            elif kind == "pong":
+                self.last_pong = time.time()
+            elif kind == "result":
+                _, req_id, boxes, scores, classes, elapsed_ms = msg
+                self._finish(req_id, result=(boxes, scores, classes, elapsed_ms))
+            elif kind == "error":
+                _, req_id, err = msg
+                self._finish(req_id, exc=RuntimeError(f"detector worker error: {err}"))
+
+    # --- health ---
+    def load(self) -> int:
+        with self._lock:
+            return len(self.inflight)
+
+    def pong_overdue(self) -> float:
+        """Seconds the outstanding ping has gone unanswered (0 if none is)."""
+        if self.last_ping <= self.last_pong:
+            return 0.0
+        return time.time() - self.last_ping
+
+    def oldest_age(self) -> float:
+        with self._lock:
+            if not self.inflight:
+                return 0.0
+            return time.time() - min(t for _, _, t in self.inflight.values())
+
+    def close(self, reason: str = "detector worker stopped") -> None:
+        with self._lock:
+            pending = list(self.inflight)
+        for req_id in pending:
+            self._finish(req_id, exc=RuntimeError(reason))
+        try:
+            with self._send_lock:
+                self.conn.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.proc.join(timeout=2)
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join(timeout=2)
+        self.conn.close()
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class DetectorPool:
+    """
+    Same `infer()` contract as the other backends, served by pre-forked processes.
+    A monitor thread respawns workers that died, hung on a request past
+    POOL_TIMEOUT, or left an idle ping unanswered for POOL_PONG_TIMEOUT.
+    """
+    def __init__(
+        self,
+        workers: int = POOL_WORKERS,
+        slots: int = POOL_SLOTS,
+        max_side: int = POOL_MAX_SIDE,
+        backend: str = DETECTOR_BACKEND,
+    ):
+        # spawn, not fork: children must not inherit a half-initialised TF runtime
+        self._ctx = mp.get_context("spawn")
+        self.slots = max(1, slots)
+        self.max_side = max_side
+        self.slot_bytes = max_side * max_side * 3
+        self.backend = backend
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.restarts = 0
+        self._workers: List[_Worker] = [self._spawn(i) for i in range(max(1, workers))]
+
+        self._stop = threading.Event()
+        self._monitor = threading.Thread(target=self._monitor_loop, name="detector-pool-monitor", daemon=True)
+        self._monitor.start()
+
+    def _spawn(self, index: int) -> _Worker:
+        return _Worker(self._ctx, index, self.slots, self.slot_bytes, self.backend)
+
+    def _pick(self) -> _Worker:
+        deadline = time.time() + POOL_TIMEOUT
+        while True:
+            with self._lock:
+                ready = [w for w in self._workers if w.ready.is_set() and w.proc.is_alive()]
+            if ready:
+                return min(ready, key=lambda w: w.load())
+            fatal = next((w.fatal for w in self._workers if w.fatal), None)
+            if fatal:
+                raise RuntimeError(fatal)
+            if time.time() > deadline:
+                raise TimeoutError("no detector worker is ready")
+            time.sleep(0.05)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> None:
+        """Blocks until at least one worker has loaded its model."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._lock:
+                workers = list(self._workers)
+            if any(w.ready.is_set() for w in workers):
+                return
+            fatal = next((w.fatal for w in workers if w.fatal), None)
+            if fatal:
+                raise RuntimeError(fatal)
+            if deadline is not None and time.time() > deadline:
+                raise TimeoutError("no detector worker became ready")
+            time.sleep(0.1)
+
+    @property
+    def labels(self) -> np.ndarray:
+        """id -> name table of the backend the workers run (the parent's until one is ready)."""
+        with self._lock:
+            ready = [w for w in self._workers if w.ready.is_set()]
+        return ready[0].labels if ready else LABEL_TABLE
+
+    def _fit(self, pil_image: Image.Image) -> np.ndarray:
+        # Boxes come back normalized, so shrinking here costs no coordinate accuracy.
+        img = pil_image
+        if max(img.size) > self.max_side:
+            img = img.copy()
+            img.thumbnail((self.max_side, self.max_side), Image.BILINEAR)
+        return to_uint8_array(img)
+
+    def infer(
+        self,
+        pil_image: Image.Image,
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        W, H = orig_size or pil_image.size
+        frame = self._fit(pil_image)
+        worker = self._pick()
+        fut = worker.submit(next(self._ids), frame)
+        boxes, scores, classes, elapsed_ms = fut.result(timeout=POOL_TIMEOUT)
+
+        labels = worker.labels
+        dets = format_detections(boxes, scores, classes, W, H, labels=labels)
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, format_detections(boxes, scores, classes, *pil_image.size, labels=labels))
+        return dets, jpeg_bytes, elapsed_ms
+
+    # --- health ---
+    def _monitor_loop(self) -> None:
+        while not self._stop.wait(POOL_HEALTH_INTERVAL):
+            for i, w in enumerate(list(self._workers)):
+                if w.fatal:
+                    continue  # misconfiguration; respawning would not help
+                dead = not w.proc.is_alive()
+                hung = w.oldest_age() > POOL_TIMEOUT
+                # A request queued behind the ping delays the pong; busy workers are covered by `hung`
+                silent = w.ready.is_set() and w.load() == 0 and w.pong_overdue() > POOL_PONG_TIMEOUT
+                if dead or hung or silent:
+                    reason = ("detector worker crashed" if dead else "detector worker hung" if hung
+                              else "detector worker stopped answering pings")
+                    replacement = self._spawn(i)
+                    with self._lock:
+                        self._workers[i] = replacement
+                        self.restarts += 1
+                    w.close(reason)
+                elif w.ready.is_set() and w.load() == 0:
+                    w.ping()
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            "workers": [
+                {
+                    "index": w.index,
+                    "pid": w.proc.pid,
+                    "alive": w.proc.is_alive(),
+                    "ready": w.ready.is_set(),
+                    "inflight": w.load(),
+                    "last_pong_s": round(time.time() - w.last_pong, 3),
+                }
+                for w in workers
+            ],
+            "backend": self.backend,
+            "slots_per_worker": self.slots,
+            "max_side": self.max_side,
+            "restarts": self.restarts,
+            "pong_timeout_s": POOL_PONG_TIMEOUT,
+        }
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for w in workers:
+            w.close()
+
+# Singleton
+_pool: Optional[DetectorPool] = None
+_pool_lock = threading.Lock()
+
+def get_detector_pool() -> DetectorPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DetectorPool()
+    return _pool
+
+def shutdown_detector_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -2,113 +2,252 @@
 from __future__ import annotations
 from typing import List, Dict, Any, Tuple, Optional
 from pathlib import Path
-import io, time
+import os, time
 import numpy as np
-from PIL import Image, ImageDraw
+from PIL import Image
 import tensorflow as tf
 
+from .preprocess import to_uint8_array
+# Label table and output helpers live in a TF-free module so other backends can share them
+from .postprocess import LABEL_TABLE, annotate, format_detections
+
 ROOT = Path(__file__).resolve().parent
 
 # Adjust this if your folder is named differently after extracting the .tar.gz
 MODEL_DIR = ROOT / "models" / "ssd_mobilenet_v2_fpnlite_640x640_coco17_tpu-8" / "saved_model"
 
-# COCO 2017 labels (id 1..90). Index 0 is a dummy for 1-based class ids from the model.
-COCO_LABELS = [
-    "??","person","bicycle","car","motorcycle","airplane","bus","train","truck","boat",
-    "traffic light","fire hydrant","stop sign","parking meter","bench","bird","cat","dog",
-    "horse","sheep","cow","elephant","bear","zebra","giraffe","backpack","umbrella",
-    "handbag","tie","suitcase","frisbee","skis","snowboard","sports ball","kite",
-    "baseball bat","baseball glove","skateboard","surfboard","tennis racket","bottle",
-    "wine glass","cup","fork","knife","spoon","bowl","banana","apple","sandwich","orange",
-    "broccoli","carrot","hot dog","pizza","donut","cake","chair","couch","potted plant",
-    "bed","dining table","toilet","tv","laptop","mouse","remote","keyboard","cell phone",
-    "microwave","oven","toaster","sink","refrigerator","book","clock","vase","scissors",
-    "teddy bear","hair drier","toothbrush"
-]
+# Common shape used when several images are stacked into one batch (matches the model's resizer)
+BATCH_INPUT_SIZE = 640
+
+# Fixed-shape serving: uploads are letterboxed into the smallest bucket that fits
+# (larger ones are downscaled into the biggest), so the graph only ever sees a few
+# shapes, each traced (and XLA-compiled with SSD_XLA=1) once at warmup.
+# Empty = feed uploads at their own size, as before.
+SSD_BUCKETS = sorted({int(b) for b in os.getenv("SSD_BUCKETS", "").split(",") if b.strip()})
+SSD_XLA = os.getenv("SSD_XLA", "1") == "1"
+
+# TF's own pools; 0 = TF default (all cores). Must be set before the runtime starts.
+TF_INTRA_THREADS = int(os.getenv("TF_INTRA_THREADS", "0"))
+TF_INTER_THREADS = int(os.getenv("TF_INTER_THREADS", "0"))
+try:
+    tf.config.threading.set_intra_op_parallelism_threads(TF_INTRA_THREADS)
+    tf.config.threading.set_inter_op_parallelism_threads(TF_INTER_THREADS)
+except RuntimeError:
+    pass  # TF already initialized by someone else in this process; keep its settings
 
 class SSDDetector:
     """
     Loads the **local** TF2 SavedModel (OD API export) and runs inference.
     """
-    def __init__(self, score_thresh: float = 0.25):
-        if not MODEL_DIR.exists():
+    def __init__(self, score_thresh: float = 0.25, buckets: Optional[List[int]] = None, xla: bool = SSD_XLA,
+                 model_dir: Path = MODEL_DIR, labels: Optional[np.ndarray] = None):
+        model_dir = Path(model_dir)
+        if not model_dir.exists():
             raise FileNotFoundError(
-                f"SavedModel not found at: {MODEL_DIR}\n"
+                f"SavedModel not found at: {model_dir}\n"
                 "Make sure you extracted the tar so that this directory contains saved_model.pb and variables/."
             )
-        self.model = tf.saved_model.load(str(MODEL_DIR))
+        self.model = tf.saved_model.load(str(model_dir))
         # Exported OD API models have a 'serving_default' signature
         self.infer_fn = self.model.signatures.get("serving_default")
         if self.infer_fn is None:
             raise RuntimeError("Model does not expose 'serving_default' signature.")
         self.score_thresh = score_thresh
+        self.labels = LABEL_TABLE if labels is None else labels
+        # Flipped off the first time a batched call is rejected by the signature
+        self._batch_ok = True
+
+        self.buckets = sorted(SSD_BUCKETS if buckets is None else buckets)
+        self.xla = False
+        self._serve_fn = None
+        if self.buckets:
+            self._build_serve_fn(xla)
+        else:
+            # Warmup
+            _ = self.infer_fn(tf.zeros([1, 640, 640, 3], dtype=tf.uint8))
+
+    # ---------------------------------------------------------
+    # Fixed-shape buckets
+    # ---------------------------------------------------------
+    def _serve(self, x: tf.Tensor) -> Dict[str, tf.Tensor]:
+        out = self.infer_fn(x)
+        return {k: out[k] for k in ("detection_boxes", "detection_scores", "detection_classes", "num_detections")
+                if k in out}
+
+    def _build_serve_fn(self, xla: bool) -> None:
+        """Traces one graph per bucket; falls back to plain tracing if XLA can't compile the export."""
+        for jit in ([True, False] if xla else [False]):
+            fn = tf.function(self._serve, jit_compile=jit)
+            try:
+                for size in self.buckets:
+                    fn(tf.zeros([1, size, size, 3], dtype=tf.uint8))
+            except (tf.errors.InvalidArgumentError, tf.errors.UnimplementedError, ValueError) as e:
+                print(f"[ssd] XLA compile failed, serving traced graphs without it: {e.__class__.__name__}")
+                continue
+            self._serve_fn, self.xla = fn, jit
+            return
+
+    def _bucket_for(self, w: int, h: int) -> int:
+        side = max(w, h)
+        for size in self.buckets:
+            if side <= size:
+                return size
+        return self.buckets[-1]
 
-        # Warmup
-        _ = self.infer_fn(tf.zeros([1, 640, 640, 3], dtype=tf.uint8))
+    def _to_bucket(self, img: Image.Image) -> Tuple[tf.Tensor, Tuple[float, float]]:
+        """
+        Letterbox into the bucket (image top-left, zero padding).
+        Returns [1,S,S,3] uint8 and the (y, x) factors that map canvas-normalized
+        boxes back to image-normalized ones.
+        """
+        w, h = img.size
+        size = self._bucket_for(w, h)
+        if max(w, h) > size:
+            s = size / max(w, h)
+            img = img.resize((max(1, round(w * s)), max(1, round(h * s))), Image.BILINEAR)
+        nw, nh = img.size
+        canvas = np.zeros((1, size, size, 3), dtype=np.uint8)
+        canvas[0, :nh, :nw] = to_uint8_array(img)
+        return tf.convert_to_tensor(canvas), (size / nh, size / nw)
+
+    def _prepare(self, img: Image.Image) -> Tuple[tf.Tensor, Optional[Tuple[float, float]]]:
+        if self.buckets:
+            return self._to_bucket(img)
+        return self._pil_to_batched_uint8(img), None
+
+    def _call(self, inputs: tf.Tensor, unpad: Optional[Tuple[float, float]]):
+        """One model call -> (boxes, scores, classes, num) for the single image."""
+        outputs = (self._serve_fn or self.infer_fn)(inputs)
+        boxes   = outputs["detection_boxes"][0].numpy()
+        scores  = outputs["detection_scores"][0].numpy()
+        classes = outputs["detection_classes"][0].numpy()
+        num     = int(outputs["num_detections"][0].numpy()) if "num_detections" in outputs else scores.shape[0]
+        if unpad is not None:
+            fy, fx = unpad
+            boxes = np.clip(boxes * np.array([fy, fx, fy, fx], dtype=boxes.dtype), 0.0, 1.0)
+        return boxes, scores, classes, num
+
+    def describe(self) -> Dict[str, Any]:
+        return {"buckets": self.buckets, "xla": self.xla,
+                "intra_threads": tf.config.threading.get_intra_op_parallelism_threads(),
+                "inter_threads": tf.config.threading.get_inter_op_parallelism_threads()}
 
     @staticmethod
     def _pil_to_batched_uint8(img: Image.Image) -> tf.Tensor:
-        arr = np.array(img.convert("RGB"), dtype=np.uint8)
-        return tf.convert_to_tensor(arr)[tf.newaxis, ...]  # [1,H,W,3]
+        # One contiguous copy out of PIL, then a batch dim on top (no re-convert, no np.array copy)
+        arr = to_uint8_array(img)
+        return tf.convert_to_tensor(arr[np.newaxis, ...])  # [1,H,W,3]
+
+    def _postprocess(
+        self,
+        boxes: np.ndarray,
+        scores: np.ndarray,
+        classes: np.ndarray,
+        num: int,
+        W: int,
+        H: int,
+    ) -> List[Dict[str, Any]]:
+        boxes, scores, classes = boxes[:num], scores[:num], classes[:num]
+        keep = scores >= self.score_thresh
+        return format_detections(boxes[keep], scores[keep], classes[keep], W, H, labels=self.labels)
+
+    def detect_arrays(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Runs the model on one [H,W,3] uint8 frame and returns only the compact
+        arrays above `score_thresh`: boxes [K,4] normalized (ymin,xmin,ymax,xmax)
+        float32, scores [K] float32, classes [K] int32.
+        """
+        if self.buckets:
+            inputs, unpad = self._to_bucket(Image.fromarray(frame))
+        else:
+            inputs, unpad = tf.convert_to_tensor(frame)[tf.newaxis, ...], None
+        boxes, scores, classes, num = self._call(inputs, unpad)
+        scores = scores[:num]
+        keep = scores >= self.score_thresh
+        boxes = boxes[:num][keep].astype(np.float32)
+        classes = classes[:num][keep].astype(np.int32)
+        return boxes, scores[keep].astype(np.float32), classes
 
     def infer(
         self,
         pil_image: Image.Image,
-        return_image: bool = False
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
     ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
-        H, W = pil_image.height, pil_image.width
-        inputs = self._pil_to_batched_uint8(pil_image)
-
-        t0 = time.time()
-        outputs = self.infer_fn(inputs)
-        elapsed_ms = (time.time() - t0) * 1000.0
+        """
+        orig_size: (W, H) to report boxes in when `pil_image` is a reduced
+        decode of the upload (see preprocess.decode_for_model).
+        """
+        W, H = orig_size or pil_image.size
+        inputs, unpad = self._prepare(pil_image)
 
         # Tensors:
         # - detection_boxes: [1,100,4] (ymin,xmin,ymax,xmax) normalized
         # - detection_scores: [1,100]
         # - detection_classes: [1,100] 1-based int ids
-        boxes   = outputs["detection_boxes"][0].numpy()
-        scores  = outputs["detection_scores"][0].numpy()
-        classes = outputs["detection_classes"][0].numpy().astype(int)
-        num     = int(outputs.get("num_detections", tf.shape(scores)[-1]).numpy() if "num_detections" in outputs else scores.shape[0])
+        t0 = time.time()
+        boxes, scores, classes, num = self._call(inputs, unpad)
+        elapsed_ms = (time.time() - t0) * 1000.0
 
-        dets: List[Dict[str, Any]] = []
-        for i in range(num):
-            conf = float(scores[i])
-            if conf < self.score_thresh:
-                continue
-            cls_id = int(classes[i])  # 1..90
-            name = COCO_LABELS[cls_id] if 0 <= cls_id < len(COCO_LABELS) else str(cls_id)
-
-            ymin, xmin, ymax, xmax = boxes[i].tolist()
-            x1, y1 = xmin * W, ymin * H
-            x2, y2 = xmax * W, ymax * H
-            dets.append({
-                "class_id": cls_id,
-                "class_name": name,
-                "conf": round(conf, 4),
-                "box": {"x": float(x1), "y": float(y1), "w": float(x2 - x1), "h": float(y2 - y1)}
-            })
+        dets = self._postprocess(boxes, scores, classes, num, W, H)
 
         jpeg_bytes = None
         if return_image:
-            canvas = pil_image.copy()
-            draw = ImageDraw.Draw(canvas, "RGBA")
-            for d in dets:
-                x, y, w, h = d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"]
-                x2, y2 = x + w, y + h
-                draw.rectangle([x, y, x2, y2], outline=(66, 135, 245, 255), width=3)
-                draw.text((x + 4, max(0, y - 16)), f'{d["class_name"]} {d["conf"]:.2f}', fill=(255,255,255,255))
-            buf = io.BytesIO()
-            canvas.save(buf, "JPEG", quality=85)
-            jpeg_bytes = buf.getvalue()
+            drawn = dets if (W, H) == pil_image.size else \
+                self._postprocess(boxes, scores, classes, num, pil_image.width, pil_image.height)
+            jpeg_bytes = annotate(pil_image, drawn)
 
         return dets, jpeg_bytes, elapsed_ms
 
-# Singleton
-_detector: Optional[SSDDetector] = None
-def get_detector() -> SSDDetector:
-    global _detector
-    if _detector is None:
-        _detector = SSDDetector(score_thresh=0.25)
-    return _detector
+    def infer_batch(
+        self,
+        images: List[Image.Image],
+        sizes: Optional[List[Tuple[int, int]]] = None,
+        size: int = BATCH_INPUT_SIZE,
+    ) -> Tuple[List[List[Dict[str, Any]]], float]:
+        """
+        Runs one `serving_default` call on [N,size,size,3] and splits the
+        outputs back per image, with boxes remapped to each original size
+        (`sizes`, defaulting to each image's own size).
+        Returns: per-image detections, elapsed_ms of the model call.
+        """
+        sizes = sizes or [im.size for im in images]
+        batch = np.empty((len(images), size, size, 3), dtype=np.uint8)
+        for i, im in enumerate(images):
+            batch[i] = to_uint8_array(im.resize((size, size), Image.BILINEAR))
+
+        t0 = time.time()
+        if self._batch_ok and len(images) > 1:
+            try:
+                outputs = self.infer_fn(tf.convert_to_tensor(batch))
+                per_image = [
+                    (outputs["detection_boxes"][i].numpy(),
+                     outputs["detection_scores"][i].numpy(),
+                     outputs["detection_classes"][i].numpy(),
+                     int(outputs["num_detections"][i].numpy()) if "num_detections" in outputs
+                     else outputs["detection_scores"].shape[1])
+                    for i in range(len(images))
+                ]
+            except (ValueError, tf.errors.InvalidArgumentError):
+                # Some OD API exports pin the batch dim to 1; remember and fall back.
+                self._batch_ok = False
+        if not self._batch_ok or len(images) == 1:
+            per_image = []
+            # [1,size,size,3] is one of the traced buckets when size is listed in SSD_BUCKETS
+            single = self._serve_fn if self._serve_fn is not None and size in self.buckets else self.infer_fn
+            for i in range(len(images)):
+                outputs = single(tf.convert_to_tensor(batch[i:i + 1]))
+                per_image.append((
+                    outputs["detection_boxes"][0].numpy(),
+                    outputs["detection_scores"][0].numpy(),
+                    outputs["detection_classes"][0].numpy(),
+                    int(outputs["num_detections"][0].numpy()) if "num_detections" in outputs
+                    else outputs["detection_scores"].shape[1],
+                ))
+        elapsed_ms = (time.time() - t0) * 1000.0
+
+        results = [
+            self._postprocess(boxes, scores, classes, num, W, H)
+            for (boxes, scores, classes, num), (W, H) in zip(per_image, sizes)
+        ]
+        return results, elapsed_ms
@@ -0,0 +1,55 @@
+# app/detector_stub.py
+"""
+Model-free detector (DETECTOR_BACKEND=stub) for load tests and local runs
+without TensorFlow.
+
+Each call holds its thread for STUB_INFER_MS plus STUB_INFER_MS_PER_MP per
+megapixel of the (already reduced) input, like a real CPU model would, then
+returns a fixed set of boxes. Everything around the model (upload parsing,
+decode, executor queueing, annotation, serialization) runs for real, so the
+server's own overhead and queueing show up in bench/loadgen.py results.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import os, time
+
+import numpy as np
+from PIL import Image
+
+from .postprocess import annotate, format_detections
+
+STUB_INFER_MS = float(os.getenv("STUB_INFER_MS", "30"))
+STUB_INFER_MS_PER_MP = float(os.getenv("STUB_INFER_MS_PER_MP", "0"))
+
+# Normalized (ymin, xmin, ymax, xmax), COCO ids 1 (person) and 3 (car)
+_BOXES = np.array([[0.10, 0.15, 0.80, 0.45], [0.50, 0.55, 0.90, 0.95]], dtype=np.float32)
+_SCORES = np.array([0.91, 0.64], dtype=np.float32)
+_CLASSES = np.array([1, 3], dtype=np.int32)
+
+class StubDetector:
+    def __init__(self, latency_ms: float = STUB_INFER_MS, ms_per_mp: float = STUB_INFER_MS_PER_MP):
+        self.latency_ms = latency_ms
+        self.ms_per_mp = ms_per_mp
+
+    def _work(self, w: int, h: int) -> None:
+        time.sleep((self.latency_ms + self.ms_per_mp * w * h / 1e6) / 1000.0)
+
+    def detect_arrays(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self._work(frame.shape[1], frame.shape[0])
+        return _BOXES.copy(), _SCORES.copy(), _CLASSES.copy()
+
+    def infer(
+        self,
+        pil_image: Image.Image,
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        W, H = orig_size or pil_image.size
+        t0 = time.time()
+        self._work(*pil_image.size)
+        elapsed_ms = (time.time() - t0) * 1000.0
+        dets = format_detections(_BOXES, _SCORES, _CLASSES, W, H)
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, format_detections(_BOXES, _SCORES, _CLASSES, *pil_image.size))
+        return dets, jpeg_bytes, elapsed_ms
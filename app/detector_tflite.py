@@ -0,0 +1,153 @@
+# app/detector_tflite.py
+"""
+TFLite build of the bundled SSD MobileNet v2 FPNLite 640x640 model.
+
+Produce the .tflite file once with `python scripts/convert_tflite.py`
+(float16 or int8). Runs on `tflite_runtime` when installed, otherwise on
+`tf.lite`; XNNPACK is the default CPU delegate in both. Interpreters are not
+thread-safe, so a small pool of them is kept (TFLITE_INTERPRETERS), each using
+TFLITE_THREADS intra-op threads.
+
+Two model layouts are understood:
+  * OD API outputs (detection_boxes/classes/scores, num_detections), uint8 pixels in;
+  * an `export_tflite_graph_tf2.py` export ending in TFLite_Detection_PostProcess:
+    outputs output_0..3, 0-based classes, and a float (or quantized) input that
+    wants (pixel - TFLITE_INPUT_MEAN) / TFLITE_INPUT_STD, i.e. [-1, 1] by default.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Tuple, Optional
+from pathlib import Path
+import os, queue, time
+
+import numpy as np
+from PIL import Image
+
+from .postprocess import LABEL_TABLE, annotate, format_detections
+from .preprocess import to_uint8_array
+
+ROOT = Path(__file__).resolve().parent
+TFLITE_MODEL = Path(os.getenv(
+    "TFLITE_MODEL", str(ROOT / "models" / "ssd_mobilenet_v2_fpnlite_640x640_fp16.tflite")
+))
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", str(os.cpu_count() or 1)))
+TFLITE_INTERPRETERS = int(os.getenv("TFLITE_INTERPRETERS", "1"))
+TFLITE_SIGNATURE = "serving_default"
+TFLITE_INPUT_MEAN = float(os.getenv("TFLITE_INPUT_MEAN", "127.5"))  # for float / quantized inputs
+TFLITE_INPUT_STD = float(os.getenv("TFLITE_INPUT_STD", "127.5"))
+
+_OD_API_OUTPUTS = ("detection_boxes", "detection_classes", "detection_scores", "num_detections")
+
+def _interpreter_cls():
+    try:
+        from tflite_runtime.interpreter import Interpreter  # small wheel, no full TF
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+def _output_names(details: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, str], int]:
+    """Signature output name for each of boxes/classes/scores/num, and the class id offset."""
+    if "detection_scores" in details:
+        return {k: k for k in _OD_API_OUTPUTS if k in details}, 0
+    # TFLite_Detection_PostProcess emits boxes [1,N,4], classes [1,N], scores [1,N], num [1];
+    # the signature numbers them in that order or reversed, and its classes are 0-based.
+    names = sorted(details)
+    by_rank: Dict[int, List[str]] = {}
+    for n in names:
+        by_rank.setdefault(len(details[n]["shape"]), []).append(n)
+    if len(names) != 4 or [len(by_rank.get(r, ())) for r in (1, 2, 3)] != [1, 2, 1]:
+        raise ValueError(f"unrecognised TFLite detection outputs: {names}")
+    (boxes,), (num,), pair = by_rank[3], by_rank[1], by_rank[2]
+    classes, scores = pair if names.index(boxes) < names.index(num) else pair[::-1]
+    return {"detection_boxes": boxes, "detection_classes": classes,
+            "detection_scores": scores, "num_detections": num}, 1
+
+class TFLiteSSDDetector:
+    def __init__(
+        self,
+        score_thresh: float = 0.25,
+        model_path: Path = TFLITE_MODEL,
+        num_threads: int = TFLITE_THREADS,
+        interpreters: int = TFLITE_INTERPRETERS,
+        labels: Optional[np.ndarray] = None,
+    ):
+        if not Path(model_path).exists():
+            raise FileNotFoundError(
+                f"TFLite model not found at: {model_path}\n"
+                "Create it with: python scripts/convert_tflite.py --quant fp16 "
+                "--saved-model <export_tflite_graph_tf2.py output>"
+            )
+        Interpreter = _interpreter_cls()
+        self.score_thresh = score_thresh
+        self.labels = LABEL_TABLE if labels is None else labels
+        self._pool: "queue.Queue" = queue.Queue()
+        for _ in range(max(1, interpreters)):
+            interp = Interpreter(model_path=str(model_path), num_threads=max(1, num_threads))
+            interp.allocate_tensors()
+            runner = interp.get_signature_runner(TFLITE_SIGNATURE)
+            self._pool.put((interp, runner))
+
+        interp, runner = self._pool.get()
+        self.input_name = next(iter(runner.get_input_details()))
+        details = runner.get_input_details()[self.input_name]
+        _, self.input_h, self.input_w, _ = [int(d) for d in details["shape"]]
+        self.input_dtype = details["dtype"]
+        self._input_scale, self._input_zero = details["quantization"]
+        self._outputs, self._class_offset = _output_names(runner.get_output_details())
+        self._pool.put((interp, runner))
+
+        # Warmup
+        self.detect_arrays(np.zeros((self.input_h, self.input_w, 3), dtype=np.uint8))
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """uint8 HxWx3 -> the model's input batch."""
+        dtype = np.dtype(self.input_dtype)
+        if dtype.kind in "iu" and not self._input_scale:
+            return frame[np.newaxis, ...].astype(dtype, copy=False)  # raw pixels (OD API export)
+        x = (frame[np.newaxis, ...].astype(np.float32) - TFLITE_INPUT_MEAN) / TFLITE_INPUT_STD
+        if dtype.kind == "f":
+            return x.astype(dtype, copy=False)
+        info = np.iinfo(dtype)
+        q = np.round(x / self._input_scale + self._input_zero)
+        return np.clip(q, info.min, info.max).astype(dtype)
+
+    def _run(self, batch: np.ndarray) -> Dict[str, np.ndarray]:
+        interp, runner = self._pool.get()
+        try:
+            return runner(**{self.input_name: batch})
+        finally:
+            self._pool.put((interp, runner))
+
+    def detect_arrays(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Same compact output as SSDDetector.detect_arrays (normalized boxes)."""
+        if frame.shape[:2] != (self.input_h, self.input_w):
+            frame = to_uint8_array(Image.fromarray(frame).resize((self.input_w, self.input_h), Image.BILINEAR))
+        raw = self._run(self._prepare(frame))
+        outputs = {role: raw[name] for role, name in self._outputs.items()}
+        scores = outputs["detection_scores"][0]
+        num = int(outputs["num_detections"][0]) if "num_detections" in outputs else scores.shape[0]
+        scores = scores[:num]
+        keep = scores >= self.score_thresh
+        boxes = outputs["detection_boxes"][0][:num][keep].astype(np.float32)
+        classes = outputs["detection_classes"][0][:num][keep].astype(np.int32) + self._class_offset
+        return boxes, scores[keep].astype(np.float32), classes
+
+    def infer(
+        self,
+        pil_image: Image.Image,
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        W, H = orig_size or pil_image.size
+        # Fixed-shape graph: resize here (boxes are normalized, so no remap needed)
+        frame = to_uint8_array(pil_image.resize((self.input_w, self.input_h), Image.BILINEAR))
+
+        t0 = time.time()
+        boxes, scores, classes = self.detect_arrays(frame)
+        elapsed_ms = (time.time() - t0) * 1000.0
+
+        dets = format_detections(boxes, scores, classes, W, H, labels=self.labels)
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, format_detections(boxes, scores, classes, *pil_image.size, labels=self.labels))
+        return dets, jpeg_bytes, elapsed_ms
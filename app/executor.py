@@ -0,0 +1,85 @@
+# app/executor.py
+"""
+Bounded executor for CPU-heavy request work (decode, inference, annotation).
+
+Keeps that work off the event loop and sheds load once `max_workers` jobs are
+running and `max_queue` more are waiting, instead of letting requests pile up.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+import asyncio, contextvars, functools, os, threading, time
+
+from .metrics import record
+
+INFER_WORKERS = int(os.getenv("INFER_WORKERS", "2"))
+INFER_QUEUE = int(os.getenv("INFER_QUEUE", "8"))
+INFER_RETRY_AFTER = int(os.getenv("INFER_RETRY_AFTER", "1"))  # seconds
+
+class Overloaded(Exception):
+    """Raised when the executor's queue is full."""
+    def __init__(self, retry_after: int = INFER_RETRY_AFTER):
+        super().__init__("inference queue is full")
+        self.retry_after = retry_after
+
+class InferenceExecutor:
+    def __init__(self, max_workers: int = INFER_WORKERS, max_queue: int = INFER_QUEUE):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="infer")
+        self._lock = threading.Lock()
+        self._pending = 0   # running + waiting
+        self._rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise Overloaded()
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def call():
+            record("queue", time.perf_counter() - submitted)
+            return fn(*args)
+
+        # Carry the request's context so stage timings land in its Server-Timing
+        ctx = contextvars.copy_context()
+        try:
+            fut = self._pool.submit(functools.partial(ctx.run, call))
+        except BaseException:
+            self._done()
+            raise
+        # Released when the thread finishes, not when the awaiting request is
+        # cancelled (client gone): the job still occupies a worker until then.
+        fut.add_done_callback(self._done)
+        return await asyncio.wrap_future(fut)
+
+    def _done(self, _fut: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return max(0, self._pending - self.max_workers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": min(self._pending, self.max_workers),
+                "queued": max(0, self._pending - self.max_workers),
+                "rejected": self._rejected,
+            }
+
+# Singleton
+_executor: Optional[InferenceExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> InferenceExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = InferenceExecutor()
+    return _executor
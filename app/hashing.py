@@ -0,0 +1,126 @@
+# app/hashing.py
+"""
+bcrypt on a small dedicated process pool.
+
+bcrypt is deliberately slow CPU work; run inline in sync routes it ties up
+the shared threadpool that /detect and the DB-backed routes also depend on.
+Here it runs in BCRYPT_WORKERS spawned processes behind async wrappers, with
+at most BCRYPT_QUEUE extra calls waiting before callers get Overloaded.
+BCRYPT_WORKERS=0 runs it on a single thread instead (handy when debugging).
+
+Only bcrypt is imported here so spawned workers start fast.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio, multiprocessing as mp, os, threading
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "2"))
+BCRYPT_QUEUE = int(os.getenv("BCRYPT_QUEUE", "32"))
+
+# --- worker-side functions (module level so they pickle) ---
+def _hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+def _verify(password: bytes, hashed: bytes) -> bool:
+    try:
+        return bcrypt.checkpw(password, hashed)
+    except ValueError:  # malformed/legacy hash string
+        return False
+
+def hash_rounds(hashed: str) -> Optional[int]:
+    """Cost factor of a '$2b$12$...' hash, or None if it isn't bcrypt."""
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+def needs_rehash(hashed: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    cost = hash_rounds(hashed)
+    return cost is not None and cost < rounds
+
+class HashPool:
+    def __init__(self, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_QUEUE,
+                 rounds: int = BCRYPT_ROUNDS):
+        self.workers = max(0, workers)
+        self.max_queue = max(0, max_queue)
+        self.rounds = rounds
+        # spawn, like the detector pool: forking a process that has TF threads is unsafe
+        self._pool: Executor = (
+            ProcessPoolExecutor(max_workers=self.workers, mp_context=mp.get_context("spawn"))
+            if self.workers else ThreadPoolExecutor(max_workers=1, thread_name_prefix="bcrypt")
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._rejected = 0
+        self._done = 0
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Local import: executor -> metrics; keep this module light for the workers
+        from .executor import Overloaded
+        with self._lock:
+            if self._pending >= max(1, self.workers) + self.max_queue:
+                self._rejected += 1
+                raise Overloaded()
+            self._pending += 1
+        try:
+            fut = self._pool.submit(fn, *args)
+        except BaseException:
+            self._finished()
+            raise
+        # Like InferenceExecutor: a cancelled login keeps its slot until bcrypt actually finishes
+        fut.add_done_callback(self._finished)
+        return await asyncio.wrap_future(fut)
+
+    def _finished(self, _fut: Any = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._done += 1
+
+    async def hash(self, password: str) -> str:
+        return (await self._run(_hash, password.encode(), self.rounds)).decode()
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password.encode(), hashed.encode())
+
+    def warmup(self) -> None:
+        """Starts the worker processes now instead of on the first login."""
+        if self.workers:
+            for f in [self._pool.submit(_verify, b"", b"") for _ in range(self.workers)]:
+                f.result()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "running": min(self._pending, max(1, self.workers)),
+                "queued": max(0, self._pending - max(1, self.workers)),
+                "completed": self._done,
+                "rejected": self._rejected,
+            }
+
+# Singleton
+_pool: Optional[HashPool] = None
+_pool_lock = threading.Lock()
+
+def get_hash_pool() -> HashPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HashPool()
+    return _pool
+
+def shutdown_hash_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -1,12 +1,33 @@
 from PIL import Image
 import io, time
 
+from .modes import apply_profile, get_mode, get_mode_detector, observe
+from .preprocess import decode_for_model
+
 def run_detection(image_bytes: bytes, mode: str):
+    """
+    Detection with a mode profile (fast | balanced | accurate, see modes.py).
+    Boxes are normalized xyxy in the original image.
+    """
+    from .backends import DETECTOR_BACKEND, get_detector
+    profile = get_mode(mode)
     t0 = time.time()
-    im = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    im, (W, H) = decode_for_model(image_bytes, profile.input_size)
+    det = get_mode_detector(profile.backend) if profile.backend and profile.backend != DETECTOR_BACKEND else get_detector()
+    kwargs = {"img_size": profile.input_size} if getattr(det, "accepts_img_size", False) else {}
+    dets, _, infer_ms = det.infer(im, return_image=False, orig_size=(W, H), **kwargs)
+    observe(profile.name, infer_ms)
+    boxes = []
+    for d in apply_profile(dets, profile):
+        b = d["box"]
+        boxes.append({
+            "xyxy": [b["x"] / W, b["y"] / H, (b["x"] + b["w"]) / W, (b["y"] + b["h"]) / H],
+            "cls": d["class_name"],
+            "conf": d["conf"],
+        })
     return {
-        "boxes": [{"xyxy":[0.1,0.2,0.6,0.8], "cls":"person", "conf":0.87}],
+        "boxes": boxes,
         "latency_ms": int((time.time()-t0)*1000),
-        "mode": mode,
-        "im_w": im.width, "im_h": im.height
+        "mode": profile.name,
+        "im_w": W, "im_h": H
     }
@@ -1,18 +1,48 @@
 # app/main.py
-import os, base64, io
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Security
+import os, base64, hmac, io, asyncio, threading, time
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import Literal
+import orjson
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Query, Security, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from PIL import Image
 import jwt  # PyJWT
 
-from .detector_ssd import get_detector
+from .backends import (
+    DETECTOR_BACKEND, ReloadInProgress, check_overrides, get_detector, get_thresholds, lease_detector,
+    model_info, reload_detector, reload_status, set_thresholds,
+)
+from .postprocess import (
+    LABEL_TABLE, detection_columns, draw_detections, encode_jpeg, rescale_columns, rescale_detections,
+)
+from . import compact as compact_fmt
+from .batching import BATCH_ENABLED, get_batch_scheduler
+from .executor import Overloaded, get_executor
+from .detector_pool import DETECTOR_MODE, get_detector_pool, shutdown_detector_pool
+from .streaming import StreamSession
+from .result_cache import CACHE_ENABLED, all_cache_stats, clear_result_caches, get_result_cache
+from .modes import (
+    MODE_ORDER, ModeProfile, apply_profile, apply_profile_columns, describe, downgrade, get_mode,
+    get_mode_detector, observe, set_mode_thresh,
+)
+from .preprocess import decode_for_model, decode_for_output, to_uint8_array
+from .metrics import MetricsMiddleware, record, render_latest, stage
+from .readiness import SKIP_CREATE_ALL, readiness
+from .principal_cache import Principal, get_principal_cache
+from .hashing import get_hash_pool, needs_rehash, shutdown_hash_pool
+from .storage import close_account_store
+from starlette.concurrency import run_in_threadpool
 
 # DB + models + auth helpers
-from sqlalchemy.orm import Session
-from .db import Base, engine, get_db
+from sqlalchemy import text
+from .db import (
+    DB_ASYNC, AsyncSessionLocal, Base, SessionLocal, dispose_engines, get_async_engine,
+    get_engine, get_session,
+)
 from . import models, crud, schemas, auth
 from .models import Account
 from .schemas import UpdateMeReq
@@ -34,10 +64,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so route latency and Server-Timing cover everything below it
+app.add_middleware(MetricsMiddleware)
+
+def _warm_detector():
+    # Loads + warms the configured detector (or pre-forks the pool) before traffic needs it
+    if DETECTOR_MODE == "pool":
+        get_detector_pool().wait_ready()
+    else:
+        _detector()
+
+def _init_db():
+    engine = get_engine()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    if not SKIP_CREATE_ALL:
+        Base.metadata.create_all(bind=engine)
 
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    # Returns immediately; /ready flips once both parts finish in the background
+    readiness.start(load_model=_warm_detector, init_db=_init_db)
+    # Spawn the bcrypt workers now rather than on the first login
+    threading.Thread(target=get_hash_pool().warmup, name="startup-bcrypt", daemon=True).start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_detector_pool()
+    shutdown_hash_pool()
+    close_account_store()  # no-op unless no-DB mode opened it; snapshots pending log
+
+@app.on_event("shutdown")
+async def close_db():
+    await dispose_engines()
 
 @app.get("/", include_in_schema=False)
 def home():
@@ -48,18 +107,37 @@ def home():
 def health():
     return {"ok": True}
 
+@app.get("/ready")
+def ready():
+    snap = readiness.snapshot()
+    if not snap["ready"]:
+        return ORJSONResponse(snap, status_code=503)
+    return snap
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_latest()
+    return Response(body, media_type=content_type)
+
 # =========================================================
 # Auth Routes
 # =========================================================
+# bcrypt runs on the hashing process pool and DB calls go through the async
+# engine (or the threadpool with DB_ASYNC=0), so a login burst doesn't occupy
+# threads that /detect and other routes need.
 @app.post("/auth/signup", response_model=schemas.AuthRes)
-def signup(body: schemas.SignupReq, db: Session = Depends(get_db)):
-    if crud.get_account_by_name(db, body.name):
+async def signup(body: schemas.SignupReq, db=Depends(get_session)):
+    if await crud.get_account_by_name_async(db, body.name):
         raise HTTPException(status_code=409, detail="Account already exists")
 
-    acc: Account = crud.create_account(
+    try:
+        password_hash = await auth.hash_pw_async(body.password)
+    except Overloaded as e:
+        raise HTTPException(503, "Busy, retry later", headers={"Retry-After": str(e.retry_after)})
+    acc: Account = await crud.create_account_async(
         db,
         name=body.name,
-        password=body.password,
+        password_hash=password_hash,
         contact_number=body.contact_number,
     )
 
@@ -74,10 +152,18 @@ def signup(body: schemas.SignupReq, db: Session = Depends(get_db)):
     }
 
 @app.post("/auth/login", response_model=schemas.AuthRes)
-def login(body: schemas.LoginReq, db: Session = Depends(get_db)):
-    acc: Account | None = crud.get_account_by_name(db, body.name)
-    if not acc or not auth.verify_pw(body.password, acc.fld_Password):
+async def login(body: schemas.LoginReq, db=Depends(get_session)):
+    acc: Account | None = await crud.get_account_by_name_async(db, body.name)
+    try:
+        ok = bool(acc) and await auth.verify_pw_async(body.password, acc.fld_Password)
+        # Transparently upgrade hashes made with a lower BCRYPT_ROUNDS
+        new_hash = await auth.hash_pw_async(body.password) if ok and needs_rehash(acc.fld_Password) else None
+    except Overloaded as e:
+        raise HTTPException(503, "Busy, retry later", headers={"Retry-After": str(e.retry_after)})
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    if new_hash:
+        await crud.update_password_hash_async(db, acc, new_hash)
 
     token = auth.make_token(acc.fld_ID)
     return {
@@ -93,39 +179,67 @@ def login(body: schemas.LoginReq, db: Session = Depends(get_db)):
 # /me helpers & routes
 # =========================================================
 
-def _current_account(
+def _token_uid(creds: HTTPAuthorizationCredentials) -> int:
+    token = creds.credentials  # Swagger will send only the token; scheme is 'Bearer'
+    try:
+        return get_principal_cache().uid_for_token(token, auth.decode_token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def _load_principal(uid: int) -> Principal | None:
+    # Own short-lived session, so cache hits never check out a DB connection
+    get_engine()
+    with SessionLocal() as db, stage("db_principal"):
+        acc = crud.get_account_by_id(db, uid)
+        return Principal(acc.fld_ID, acc.fld_Name, acc.fld_ContactNumber) if acc else None
+
+async def _load_principal_async(uid: int) -> Principal | None:
+    if not DB_ASYNC:
+        return await run_in_threadpool(_load_principal, uid)
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        with stage("db_principal"):
+            acc = await crud.get_account_by_id_async(db, uid)
+        return Principal(acc.fld_ID, acc.fld_Name, acc.fld_ContactNumber) if acc else None
+
+async def _current_principal(creds: HTTPAuthorizationCredentials = Security(bearer_scheme)) -> Principal:
+    """
+    Read-only identity for the bearer token, served from the principal cache
+    when hot (no JWT decode, no MySQL round trip).
+    """
+    p = await get_principal_cache().principal_async("db", _token_uid(creds), _load_principal_async)
+    if p is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return p
+
+async def _current_account(
     creds: HTTPAuthorizationCredentials = Security(bearer_scheme),
-    db: Session = Depends(get_db),
+    db=Depends(get_session),
 ) -> Account:
     """
     Reads the Authorization header via HTTP Bearer security,
     decodes the JWT, and loads the Account from MySQL.
+    For routes that modify the account; read-only routes use _current_principal.
     """
-    token = creds.credentials  # Swagger will send only the token; scheme is 'Bearer'
-    try:
-        payload = jwt.decode(token, auth.JWT_SECRET, algorithms=[auth.JWT_ALG])
-        uid = int(payload["sub"])
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    acc = db.query(Account).filter(Account.fld_ID == uid).first()
+    uid = _token_uid(creds)
+    acc = await crud.get_account_by_id_async(db, uid)
     if not acc:
         raise HTTPException(status_code=404, detail="User not found")
     return acc
 
 @app.get("/me", response_model=schemas.AccountOut)
-def me(acc: Account = Depends(_current_account)):
+async def me(p: Principal = Depends(_current_principal)):
     return {
-        "id": acc.fld_ID,
-        "name": acc.fld_Name,
-        "contact_number": acc.fld_ContactNumber,
+        "id": p.id,
+        "name": p.name,
+        "contact_number": p.contact_number,
     }
 
 @app.put("/me", response_model=schemas.AccountOut)
-def update_me(body: UpdateMeReq, acc: Account = Depends(_current_account), db: Session = Depends(get_db)):
+async def update_me(body: UpdateMeReq, acc: Account = Depends(_current_account), db=Depends(get_session)):
     # Update name (ensure unique if changed)
     if body.name is not None and body.name != acc.fld_Name:
-        if db.query(Account).filter(Account.fld_Name == body.name).first():
+        if await crud.get_account_by_name_async(db, body.name):
             raise HTTPException(status_code=409, detail="Username already taken")
         acc.fld_Name = body.name
 
@@ -133,9 +247,10 @@ def update_me(body: UpdateMeReq, acc: Account = Depends(_current_account), db: S
     if body.contact_number is not None:
         acc.fld_ContactNumber = body.contact_number
 
-    db.add(acc)
-    db.commit()
-    db.refresh(acc)
+    acc = await crud.save_account_async(db, acc)
+    # The ORM hook already dropped it at flush; again after commit so a
+    # concurrent /me can't have re-cached the pre-commit row in between.
+    get_principal_cache().invalidate_user(acc.fld_ID)
 
     return {
         "id": acc.fld_ID,
@@ -147,6 +262,11 @@ def update_me(body: UpdateMeReq, acc: Account = Depends(_current_account), db: S
 # Detection Routes
 # =========================================================
 MAX_UPLOAD_BYTES = 5 * 1024 * 1024  # 5 MB
+# Annotated image output: long-side cap (0 = original size) and JPEG quality
+ANNOTATE_MAX_SIDE = int(os.getenv("ANNOTATE_MAX_SIDE", "0"))
+ANNOTATE_QUALITY = int(os.getenv("ANNOTATE_QUALITY", "85"))
+# Detections go in this header for response_format=jpeg if they fit (proxies cap header size)
+MAX_DETECTIONS_HEADER = 7 * 1024
 
 class Box(BaseModel):
     x: float; y: float; w: float; h: float
@@ -161,21 +281,622 @@ class DetectResponse(BaseModel):
     time_ms: float
     detections: list[Detection]
     image_b64: str | None = None
+    mode: str | None = None
+    requested_mode: str | None = None
+    downgraded: bool = False
+    mode_cost: dict | None = None   # the profile used + its expected model time
+    model_version: str | None = None
+
+def _serving_backend() -> str:
+    """Backend behind the main slot right now (the pool never reloads; see /admin/detector/reload)."""
+    return get_detector_pool().backend if DETECTOR_MODE == "pool" else model_info().backend
+
+def _own_backend(profile: ModeProfile | None, serving: str | None = None) -> str | None:
+    """The profile's backend when it isn't the one serving the main slot, else None."""
+    if profile is None or not profile.backend:
+        return None
+    return profile.backend if profile.backend != (serving or _serving_backend()) else None
+
+def _detector(profile: ModeProfile | None = None):
+    """The worker pool, the micro-batching scheduler, or the in-process detector."""
+    if _own_backend(profile):
+        # Mode with its own (lighter) backend: in-process, loaded on first use
+        return get_mode_detector(profile.backend)
+    if DETECTOR_MODE == "pool":
+        return get_detector_pool()
+    det = get_detector()
+    # Micro-batching needs a backend with infer_batch (the TF SavedModel SSD)
+    if BATCH_ENABLED and hasattr(det, "infer_batch"):
+        return get_batch_scheduler()
+    return det
+
+@contextmanager
+def _serving(profile: ModeProfile | None = None):
+    """
+    (detector, model version) for one call. The in-process model is leased, so
+    a hot reload waits for this call before freeing the instance it runs on.
+    """
+    if DETECTOR_MODE == "pool":
+        pool = get_detector_pool()
+        own = _own_backend(profile, pool.backend)
+        if own:
+            yield get_mode_detector(own), own
+        else:
+            yield pool, f"pool:{pool.backend}"
+        return
+    with lease_detector() as (det, info):
+        # Decided against the leased instance, so a concurrent reload can't split the check from the call
+        own = _own_backend(profile, info.backend)
+        if own:
+            det, version = get_mode_detector(own), own
+        else:
+            version = info.version
+            if BATCH_ENABLED and hasattr(det, "infer_batch"):
+                det = get_batch_scheduler()
+        yield det, version
+
+def _peek_detector(profile: ModeProfile | None = None):
+    """
+    (detector, own backend) serving `profile`, for metadata lookups; the detector
+    is None while the main model is still loading.
+    """
+    det = None
+    if DETECTOR_MODE == "pool":
+        own = _own_backend(profile, get_detector_pool().backend)
+        det = get_mode_detector(own) if own else get_detector_pool()
+    elif readiness.ready("model"):
+        own = _own_backend(profile)
+        det = get_mode_detector(own) if own else get_detector()
+    else:
+        # Main model still loading (and not reloadable yet): don't block on it here
+        own = _own_backend(profile, DETECTOR_BACKEND)
+        if own:
+            det = get_mode_detector(own)
+    return det, own
+
+def _labels(profile: ModeProfile | None = None):
+    """id -> name table of the backend serving `profile`; LABEL_TABLE while it is still loading."""
+    return getattr(_peek_detector(profile)[0], "labels", LABEL_TABLE)
+
+def _mode_cost(profile: ModeProfile) -> dict:
+    """
+    describe(profile), with expected_ms only when the mode's cost is its own: a
+    backend of its own, or one whose network input follows input_size. The SSD
+    SavedModel resizes every input to 640 itself, so its modes all cost the same.
+    """
+    det, own = _peek_detector(profile)
+    return describe(profile, per_mode_cost=bool(own) or getattr(det, "accepts_img_size", False))
+
+def _run_detect(raw: bytes, image_mode: str | None = None, max_side: int = ANNOTATE_MAX_SIDE,
+                quality: int = ANNOTATE_QUALITY, profile: ModeProfile | None = None, columns: bool = False):
+    # Runs on the inference executor: decode, inference, annotation and encoding.
+    # image_mode: None (no image), "b64" (data URL string) or "jpeg" (raw bytes).
+    # columns: compact responses; detections come back as postprocess.Columns
+    # straight from detect_arrays() when the serving backend has it (no dicts).
+    profile = profile or get_mode(None)
+    decoded: list = []
+    def decode():
+        # Reduced-size decode (JPEG draft mode); boxes stay in original coordinates
+        if not decoded:
+            with stage("decode"):
+                decoded.append(decode_for_model(raw, profile.input_size))
+        return decoded[0]
+
+    with _serving(profile) as (det, version):
+        # detect_arrays() has no img_size, so backends that take one stay on infer()
+        arrays = columns and not image_mode and hasattr(det, "detect_arrays") \
+            and not getattr(det, "accepts_img_size", False)
+
+        def compute(pil: Image.Image):
+            if arrays:
+                W, H = decode()[1]
+                with stage("infer"):
+                    t0 = time.perf_counter()
+                    boxes, scores, classes = det.detect_arrays(to_uint8_array(pil))
+                    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+                record("infer_fn", elapsed_ms / 1000.0)
+                observe(profile.name, elapsed_ms)
+                return apply_profile_columns(detection_columns(boxes, scores, classes, W, H), profile), elapsed_ms
+            kwargs = {"img_size": profile.input_size} if getattr(det, "accepts_img_size", False) else {}
+            with stage("infer"):
+                dets, _, elapsed_ms = det.infer(pil, return_image=False, orig_size=decode()[1], **kwargs)
+            record("infer_fn", elapsed_ms / 1000.0)
+            observe(profile.name, elapsed_ms)
+            return apply_profile(dets, profile), elapsed_ms
+
+        if CACHE_ENABLED:
+            # Per model version, so a reload never serves the previous model's results
+            if arrays:
+                cache = get_result_cache(f"{profile.name}@{version}:columns", rescale=rescale_columns)
+            else:
+                cache = get_result_cache(f"{profile.name}@{version}")
+            dets, elapsed_ms, _ = cache.get_or_compute(raw, decode, compute)
+        else:
+            dets, elapsed_ms = compute(decode()[0])
+
+    image = None
+    if image_mode:
+        with stage("annotate"):
+            out, orig_size = decode_for_output(raw, max_side)
+            canvas = draw_detections(out, rescale_detections(dets, orig_size, out.size))
+        with stage("encode"):
+            image = encode_jpeg(canvas, quality)
+            if image_mode == "b64":
+                image = "data:image/jpeg;base64," + base64.b64encode(image).decode("utf-8")
+    return dets, image, elapsed_ms, version
 
-@app.post("/detect", response_model=DetectResponse)
-async def detect(file: UploadFile = File(...), return_image: bool = False):
+def _multipart_mixed(meta: bytes, jpeg: bytes) -> Response:
+    boundary = "blindspot-" + os.urandom(8).hex()
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode(), meta,
+        f"\r\n--{boundary}\r\nContent-Type: image/jpeg\r\n\r\n".encode(), jpeg,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return Response(body, media_type=f"multipart/mixed; boundary={boundary}")
+
+@app.post(
+    "/detect",
+    response_model=DetectResponse,
+    responses={200: {"content": {"image/jpeg": {}, "multipart/mixed": {},
+                                 "application/vnd.blindspot.detections+json": {},
+                                 "application/vnd.blindspot.detections+msgpack": {}}}},
+)
+async def detect(
+    file: UploadFile = File(...),
+    return_image: bool = False,
+    response_format: Literal["json", "jpeg", "multipart"] = "json",
+    max_side: int = Query(ANNOTATE_MAX_SIDE, ge=0, le=8192),
+    quality: int = Query(ANNOTATE_QUALITY, ge=10, le=95),
+    mode: Literal[MODE_ORDER] | None = None,
+    allow_downgrade: bool = True,
+    compact: Literal["json", "msgpack"] | None = None,
+    labels_version: str | None = None,
+    accept: str | None = Header(None),
+    x_labels_version: str | None = Header(None),
+):
+    """
+    mode: fast | balanced | accurate (default DETECT_DEFAULT_MODE). Under load
+    the server may step down a tier unless allow_downgrade=false; the response
+    says which mode ran (mode, downgraded) and its expected model time.
+
+    response_format:
+    - json: DetectResponse; image_b64 holds the annotated image when return_image=true
+    - jpeg: annotated image/jpeg body; detections JSON in the X-Detections header
+    - multipart: multipart/mixed with a JSON part and an image/jpeg part
+    max_side / quality control the annotated image's size and JPEG quality.
+
+    compact=json|msgpack (or Accept: application/vnd.blindspot.detections+json
+    / +msgpack) replaces the json body with parallel class_ids / conf / boxes
+    integer arrays; see app/compact.py. Send labels_version (or
+    X-Labels-Version) from a previous response to skip the label table.
+    """
     if file.content_type not in {"image/jpeg", "image/png", "image/webp"}:
         raise HTTPException(415, "Send JPEG/PNG/WEBP image")
     raw = await file.read()
     if len(raw) > MAX_UPLOAD_BYTES:
         raise HTTPException(413, "Image too large (max 5 MB)")
-    pil = Image.open(io.BytesIO(raw)).convert("RGB")
-    dets, jpeg_bytes, elapsed_ms = get_detector().infer(pil, return_image=return_image)
+    if not readiness.ready("model"):
+        raise HTTPException(503, "Model is still loading", headers={"Retry-After": "2"})
+    packed = compact_fmt.negotiate(compact, accept) if response_format == "json" else None
+    if response_format == "json":
+        # MessagePack carries the JPEG as raw bytes, no base64
+        image_mode = ("jpeg" if packed == "msgpack" else "b64") if return_image else None
+    else:
+        image_mode = "jpeg"
+    executor = get_executor()
+    requested = get_mode(mode)
+    profile = requested
+    if allow_downgrade:
+        profile = downgrade(requested, executor.queue_depth() / max(1, executor.max_queue))
+    try:
+        dets, image, elapsed_ms, version = await executor.run(
+            _run_detect, raw, image_mode, max_side, quality, profile, packed is not None)
+    except Overloaded as e:
+        raise HTTPException(503, "Detector busy, retry later", headers={"Retry-After": str(e.retry_after)})
+    mode_meta = {
+        "mode": profile.name,
+        "requested_mode": requested.name,
+        "downgraded": profile is not requested,
+        "mode_cost": _mode_cost(profile),
+        "model_version": version,
+    }
+
+    if packed:
+        body, labels_ver = compact_fmt.build(
+            dets, _labels(profile), labels_version or x_labels_version,
+            time_ms=round(elapsed_ms, 2), mode=profile.name, downgraded=mode_meta["downgraded"], model_version=version,
+            **({"image": image} if packed == "msgpack" else {"image_b64": image}),
+        )
+        headers = {"X-Labels-Version": labels_ver, "X-Model-Version": version, "Vary": "Accept"}
+        if packed == "msgpack":
+            return Response(compact_fmt.encode_msgpack(body), media_type=compact_fmt.COMPACT_MSGPACK, headers=headers)
+        return Response(orjson.dumps(body), media_type=compact_fmt.COMPACT_JSON, headers=headers)
+
+    if response_format == "json":
+        # Detector output already matches DetectResponse; serialize it directly with
+        # orjson instead of re-validating every Detection/Box through pydantic.
+        return ORJSONResponse({"time_ms": elapsed_ms, "detections": dets, "image_b64": image, **mode_meta},
+                              headers={"X-Model-Version": version})
+
+    meta = orjson.dumps({"time_ms": elapsed_ms, "detections": dets, **mode_meta})
+    if response_format == "multipart":
+        return _multipart_mixed(meta, image)
+    headers = {
+        "X-Time-Ms": f"{elapsed_ms:.2f}",
+        "X-Detect-Mode": profile.name,
+        "X-Detect-Downgraded": "1" if mode_meta["downgraded"] else "0",
+        "X-Model-Version": version,
+    }
+    if mode_meta["mode_cost"]["expected_ms"] is not None:
+        headers["X-Detect-Expected-Ms"] = str(mode_meta["mode_cost"]["expected_ms"])
+    if len(meta) <= MAX_DETECTIONS_HEADER:
+        headers["X-Detections"] = meta.decode("utf-8")
+    else:
+        headers["X-Detections-Omitted"] = "too-large; use response_format=multipart"
+    return Response(image, media_type="image/jpeg", headers=headers)
+
+# =========================================================
+# Batch detection (NDJSON)
+# =========================================================
+DETECT_BATCH_MAX_ITEMS = int(os.getenv("DETECT_BATCH_MAX_ITEMS", "64"))
+DETECT_BATCH_MAX_BYTES = int(os.getenv("DETECT_BATCH_MAX_BYTES", str(64 * 1024 * 1024)))
+# Items in flight per batch; more than the executor's workers just queues
+DETECT_BATCH_WINDOW = int(os.getenv("DETECT_BATCH_WINDOW", os.getenv("INFER_WORKERS", "2")))
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp")
+
+def _archive_items(data: bytes, filename: str):
+    """
+    Lazily yields (name, bytes | None, error | None) for image members of a zip
+    or tar archive. Sizes are checked from the member headers before reading,
+    so an oversized (or zip-bomb) member never gets decompressed.
+    """
+    import tarfile, zipfile
+    buf = io.BytesIO(data)
+    if zipfile.is_zipfile(buf):
+        zf = zipfile.ZipFile(buf)
+        members = [m for m in zf.infolist() if not m.is_dir() and m.filename.lower().endswith(_IMAGE_EXTS)]
+        sizes = [(m.filename, m.file_size) for m in members]
+        read = lambda i: zf.read(members[i])
+    else:
+        buf.seek(0)
+        try:
+            tf = tarfile.open(fileobj=buf, mode="r:*")
+        except tarfile.TarError:
+            raise HTTPException(415, f"{filename or 'archive'} is not a zip or tar archive")
+        members = [m for m in tf.getmembers() if m.isfile() and m.name.lower().endswith(_IMAGE_EXTS)]
+        sizes = [(m.name, m.size) for m in members]
+        read = lambda i: tf.extractfile(members[i]).read()
+    if len(members) > DETECT_BATCH_MAX_ITEMS:
+        raise HTTPException(413, f"Too many images in archive (max {DETECT_BATCH_MAX_ITEMS})")
+    if sum(size for _, size in sizes) > DETECT_BATCH_MAX_BYTES:
+        raise HTTPException(413, f"Archive contents too large (max {DETECT_BATCH_MAX_BYTES} bytes)")
+
+    def gen():
+        for i, (name, size) in enumerate(sizes):
+            if size > MAX_UPLOAD_BYTES:
+                yield name, None, (413, "Image too large (max 5 MB)")
+            else:
+                yield name, read(i), None
+    return gen()
+
+async def _detect_one(raw: bytes):
+    # Give a busy executor a few chances before failing this item only
+    for attempt in range(3):
+        try:
+            return await get_executor().run(_run_detect, raw)
+        except Overloaded as e:
+            if attempt == 2:
+                raise
+            await asyncio.sleep(min(e.retry_after, 0.05 * 2 ** attempt))
+
+async def _batch_results(items):
+    """Runs up to DETECT_BATCH_WINDOW items at once; one NDJSON line per item as it finishes."""
+    t0 = asyncio.get_running_loop().time()
+    pending: dict = {}
+    it = enumerate(items)
+    exhausted = False
+    count = errors = 0
+
+    def item_error(index, name, status, message):
+        return {"index": index, "name": name, "status": status, "error": message}
+
+    try:
+        while True:
+            while not exhausted and len(pending) < max(1, DETECT_BATCH_WINDOW):
+                try:
+                    index, (name, raw, err) = next(it)
+                except StopIteration:
+                    exhausted = True
+                    break
+                if err is not None:
+                    count += 1
+                    errors += 1
+                    yield orjson.dumps(item_error(index, name, *err)) + b"\n"
+                    continue
+                pending[asyncio.ensure_future(_detect_one(raw))] = (index, name)
+            if not pending:
+                break
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, name = pending.pop(task)
+                count += 1
+                try:
+                    dets, _, elapsed_ms, version = task.result()
+                    line = {"index": index, "name": name, "time_ms": elapsed_ms, "detections": dets,
+                            "model_version": version}
+                except Overloaded:
+                    errors += 1
+                    line = item_error(index, name, 503, "Detector busy")
+                except Exception as e:  # undecodable image etc.; only this item fails
+                    errors += 1
+                    line = item_error(index, name, 422, f"{type(e).__name__}: {e}")
+                yield orjson.dumps(line) + b"\n"
+    finally:
+        # Client went away: let in-flight items finish (the executor still
+        # accounts for them) and swallow their results.
+        for task in pending:
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    yield orjson.dumps({
+        "done": True, "count": count, "errors": errors,
+        "elapsed_ms": round((asyncio.get_running_loop().time() - t0) * 1000.0, 2),
+    }) + b"\n"
+
+@app.post("/detect/batch", responses={200: {"content": {"application/x-ndjson": {}}}})
+async def detect_batch(
+    files: list[UploadFile] = File(None),  # not `| None`: FastAPI then reads only the last part
+    archive: UploadFile | None = File(None),
+):
+    """
+    Many images in one request: repeated `files` parts, or one zip/tar `archive`.
+    Streams application/x-ndjson, one line per image in completion order:
+    {"index", "name", "time_ms", "detections"} or {"index", "name", "status", "error"},
+    then a final {"done": true, "count", "errors", "elapsed_ms"}.
+    A bad image only fails its own line.
+    """
+    if not files and archive is None:
+        raise HTTPException(422, "Send images as 'files' parts or one 'archive'")
+    if not readiness.ready("model"):
+        raise HTTPException(503, "Model is still loading", headers={"Retry-After": "2"})
+
+    # Uploads are read here, while the request's spooled files are still open;
+    # decode + inference happen as the response streams.
+    if archive is not None:
+        data = await archive.read(DETECT_BATCH_MAX_BYTES + 1)
+        if len(data) > DETECT_BATCH_MAX_BYTES:
+            raise HTTPException(413, f"Archive too large (max {DETECT_BATCH_MAX_BYTES} bytes)")
+        items = _archive_items(data, archive.filename)
+    else:
+        if len(files) > DETECT_BATCH_MAX_ITEMS:
+            raise HTTPException(413, f"Too many images (max {DETECT_BATCH_MAX_ITEMS})")
+        total = 0
+        items = []
+        for f in files:
+            if f.content_type not in {"image/jpeg", "image/png", "image/webp"}:
+                items.append((f.filename, None, (415, "Send JPEG/PNG/WEBP image")))
+                continue
+            raw = await f.read(MAX_UPLOAD_BYTES + 1)
+            if len(raw) > MAX_UPLOAD_BYTES:
+                items.append((f.filename, None, (413, "Image too large (max 5 MB)")))
+                continue
+            total += len(raw)
+            if total > DETECT_BATCH_MAX_BYTES:
+                raise HTTPException(413, f"Batch too large (max {DETECT_BATCH_MAX_BYTES} bytes)")
+            items.append((f.filename, raw, None))
+
+    return StreamingResponse(_batch_results(items), media_type="application/x-ndjson")
+
+# =========================================================
+# Streaming detection (WebSocket)
+# =========================================================
+@app.websocket("/ws/detect")
+async def ws_detect(ws: WebSocket, track: bool = False):
+    """
+    Client sends binary JPEG frames; server replies with one JSON message per
+    processed frame: {seq, time_ms, detections, reused, dropped, skipped}.
+    Frames that arrive while inference is busy replace each other (newest wins).
+
+    With ?track=true the detector only runs on keyframes and detections carry a
+    stable `track_id`. Sending the text message "stats" returns session stats,
+    including CPU per frame for detect vs. tracked frames (process CPU time,
+    so other requests running at the same moment are counted too).
+    """
+    await ws.accept()
+    if not readiness.ready("model"):
+        await ws.close(code=1013)  # try again later
+        return
+    session = StreamSession(_serving, track=track)
+
+    async def receive():
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
+            if msg.get("text") == "stats":
+                await ws.send_json({"stats": session.stats()})
+                continue
+            frame = msg.get("bytes")
+            if not frame:
+                continue
+            if len(frame) > MAX_UPLOAD_BYTES:
+                await ws.send_json({"error": "Image too large (max 5 MB)"})
+                continue
+            session.offer(frame)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            next_frame = asyncio.create_task(session.next_frame())
+            done, _ = await asyncio.wait({receiver, next_frame}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver in done:
+                next_frame.cancel()
+                receiver.result()  # re-raises WebSocketDisconnect
+            seq, frame = next_frame.result()
+            try:
+                result = await get_executor().run(session.process, seq, frame)
+            except Overloaded:
+                session.dropped += 1
+                continue
+            except Exception:
+                await ws.send_json({"seq": seq, "error": "Could not process frame"})
+                continue
+            await ws.send_json({"seq": seq, **result, "dropped": session.dropped, "skipped": session.skipped,
+                                "model_version": session.model_version})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+@app.get("/modes")
+def modes():
+    """Detection modes with their engine profile and current expected model time (null if not per mode)."""
+    return {"default": get_mode(None).name, "modes": [_mode_cost(get_mode(m)) for m in MODE_ORDER]}
+
+@app.get("/labels")
+def labels(mode: Literal[MODE_ORDER] | None = None):
+    """Label table used by compact /detect responses (index = class id), with its version."""
+    version, names = compact_fmt.label_table(_labels(get_mode(mode)))
+    return {"version": version, "labels": names}
+
+# =========================================================
+# Admin: detector hot reload and runtime thresholds
+# =========================================================
+# Empty = admin routes disabled; otherwise send it as X-Admin-Token
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def _require_admin(x_admin_token: str | None = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(403, "Admin API disabled (set ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(401, "Invalid admin token")
+
+class ReloadReq(BaseModel):
+    backend: str | None = None        # default: the backend currently serving
+    model_path: str | None = None     # SavedModel dir / .tflite / .onnx / YOLO weights
+    labels_file: str | None = None    # one name per line, 1-based ids (ssd / tflite only)
+    version: str | None = None        # reported as model_version; default <backend>-<generation>
+    score_thresh: float | None = None
+    iou: float | None = None
+    wait: bool = False                # block until swapped and drained instead of 202
+
+class ThresholdsReq(BaseModel):
+    score_thresh: float | None = None       # the backend's own cut-off
+    iou: float | None = None                # NMS IoU (YOLO backends)
+    modes: dict[str, float] | None = None   # per-mode score_thresh, e.g. {"fast": 0.5}
+
+def _check_thresh(name: str, value: float | None):
+    if value is not None and not 0.0 <= value <= 1.0:
+        raise HTTPException(422, f"{name} must be within 0..1")
+
+def _reload_in_background(kwargs: dict):
+    try:
+        reload_detector(**kwargs)
+    except Exception:
+        return  # recorded in reload_status(); the old model keeps serving
+    clear_result_caches()
+
+@app.get("/admin/detector", dependencies=[Depends(_require_admin)])
+def admin_detector():
+    """Serving model, its runtime thresholds, mode thresholds and the last reload."""
+    out = {"detector_mode": DETECTOR_MODE, "reload": reload_status(),
+           "modes": {m: get_mode(m).score_thresh for m in MODE_ORDER}}
+    if DETECTOR_MODE != "pool" and readiness.ready("model"):
+        out["model"] = asdict(model_info())
+        out["thresholds"] = get_thresholds(get_detector())
+    return out
+
+@app.post("/admin/detector/reload", dependencies=[Depends(_require_admin)], status_code=202)
+async def admin_reload(body: ReloadReq):
+    """
+    Loads and warms a new detector in the background while the current one
+    keeps serving, swaps it in, drains calls on the old one and frees it.
+    Poll GET /admin/detector for progress, or pass wait=true.
+    """
+    if DETECTOR_MODE == "pool":
+        raise HTTPException(409, "Hot reload covers the in-process detector; restart the pool workers instead")
+    if not readiness.ready("model"):
+        raise HTTPException(503, "Model is still loading", headers={"Retry-After": "2"})
+    _check_thresh("score_thresh", body.score_thresh)
+    _check_thresh("iou", body.iou)
+    try:
+        # Before anything loads, so a 422 here never means a half-done reload
+        check_overrides(body.backend or model_info().backend, model_path=body.model_path, labels=body.labels_file)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    kwargs = {k: v for k, v in body.model_dump().items() if k != "wait"}
+    if body.wait:
+        try:
+            result = await run_in_threadpool(reload_detector, **kwargs)
+        except ReloadInProgress as e:
+            raise HTTPException(409, str(e))
+        except Exception as e:
+            raise HTTPException(422, f"Reload failed, previous model still serving: {e!r}")
+        clear_result_caches()
+        return ORJSONResponse(result)
+    if reload_status()["state"] in ("loading", "draining"):
+        raise HTTPException(409, "a reload is already in progress")
+    threading.Thread(target=_reload_in_background, args=(kwargs,), name="detector-reload", daemon=True).start()
+    return {"accepted": True, "status": "/admin/detector"}
+
+@app.patch("/admin/detector/thresholds", dependencies=[Depends(_require_admin)])
+def admin_thresholds(body: ThresholdsReq):
+    """Changes thresholds on the live model and the mode profiles; no weights are reloaded."""
+    _check_thresh("score_thresh", body.score_thresh)
+    _check_thresh("iou", body.iou)
+    for name, value in (body.modes or {}).items():
+        if name not in MODE_ORDER:
+            raise HTTPException(422, f"Unknown mode {name!r}")
+        _check_thresh(f"modes.{name}", value)
+
+    out: dict = {}
+    if body.score_thresh is not None or body.iou is not None:
+        if DETECTOR_MODE == "pool":
+            raise HTTPException(409, "Pool workers keep their own thresholds; use per-mode thresholds")
+        if not readiness.ready("model"):
+            raise HTTPException(503, "Model is still loading", headers={"Retry-After": "2"})
+        out["thresholds"] = set_thresholds(get_detector(), body.score_thresh, body.iou)
+    for name, value in (body.modes or {}).items():
+        set_mode_thresh(name, value)
+    out["modes"] = {m: get_mode(m).score_thresh for m in MODE_ORDER}
+    clear_result_caches()  # cached results were filtered with the old values
+    return out
+
+@app.get("/stats/executor")
+def executor_stats():
+    return get_executor().stats()
+
+@app.get("/stats/cache")
+def cache_stats():
+    if not CACHE_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, "modes": all_cache_stats()}
+
+@app.get("/stats/pool")
+def pool_stats():
+    if DETECTOR_MODE != "pool":
+        return {"enabled": False}
+    return {"enabled": True, **get_detector_pool().health()}
+
+@app.get("/stats/bcrypt")
+def bcrypt_stats():
+    return get_hash_pool().stats()
+
+@app.get("/stats/principal")
+def principal_stats():
+    return get_principal_cache().stats()
+
+@app.get("/stats/sidecar")
+def sidecar_stats():
+    if not readiness.ready("model"):
+        return {"enabled": DETECTOR_BACKEND == "remote", "ready": False}
+    if DETECTOR_MODE == "pool" or _serving_backend() != "remote":
+        return {"enabled": False, "ready": True}
+    return {"enabled": True, "ready": True, **get_detector().health()}
 
-    b64 = None
-    if return_image and jpeg_bytes:
-        b64 = "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes).decode("utf-8")
-    return DetectResponse(time_ms=elapsed_ms, detections=dets, image_b64=b64)
+@app.get("/stats/batching")
+def batching_stats():
+    if not BATCH_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **get_batch_scheduler().stats()}
 
 
 
@@ -0,0 +1,160 @@
+# app/metrics.py
+"""
+Prometheus metrics and per-request Server-Timing.
+
+`stage("decode")` times a block, feeds the stage histogram and, when called
+inside a request, adds an entry to that request's Server-Timing header. The
+request's timing list lives in a ContextVar, so code running on executor
+threads sees it as long as it was submitted with the request's context
+(see executor.InferenceExecutor.run).
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR so /metrics
+aggregates all processes.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import functools, os, time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# ms-oriented buckets (in seconds) from 1 ms to 10 s
+_BUCKETS = (.001, .0025, .005, .01, .025, .05, .075, .1, .15, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ["method", "route", "status"], buckets=_BUCKETS,
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds", "Latency of internal pipeline stages",
+    ["stage"], buckets=_BUCKETS,
+)
+DETECTOR_LOAD = Histogram(
+    "detector_load_seconds", "Detector construction including model load and warmup",
+    ["backend"], buckets=(.5, 1, 2.5, 5, 10, 20, 40, 80),
+)
+DB_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the SQLAlchemy pool",
+    buckets=_BUCKETS,
+)
+DB_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections currently checked out of the pool",
+    multiprocess_mode="livesum",
+)
+BCRYPT_LATENCY = Histogram(
+    "bcrypt_duration_seconds", "bcrypt hash/verify time", ["op"],
+    buckets=(.01, .025, .05, .1, .2, .3, .5, 1.0, 2.0),
+)
+
+PRINCIPAL_CACHE_LOOKUPS = Counter(
+    "principal_cache_lookups_total", "Auth principal cache lookups", ["layer", "result"],
+)
+
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timing", default=None)
+
+# ---------------------------------------------------------
+# Stage timing
+# ---------------------------------------------------------
+def record(name: str, seconds: float) -> None:
+    if not METRICS_ENABLED:
+        return
+    STAGE_LATENCY.labels(name).observe(seconds)
+    t = _timings.get()
+    if t is not None:
+        t.append((name, seconds))
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - t0)
+
+def timed(name: str, histogram: Optional[Histogram] = None) -> Callable:
+    """Decorator form of stage(); optionally also observes a dedicated histogram."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                dt = time.perf_counter() - t0
+                if histogram is not None and METRICS_ENABLED:
+                    histogram.observe(dt)
+                record(name, dt)
+        return wrapper
+    return deco
+
+# ---------------------------------------------------------
+# SQLAlchemy pool
+# ---------------------------------------------------------
+def instrument_engine(engine) -> None:
+    """Tracks in-use connections from pool checkout/checkin events."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_conn, conn_record, conn_proxy):
+        DB_IN_USE.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _checkin(dbapi_conn, conn_record):
+        DB_IN_USE.dec()
+
+# ---------------------------------------------------------
+# ASGI middleware: route histogram + Server-Timing header
+# ---------------------------------------------------------
+def _route_label(scope: Dict[str, Any]) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path:
+        return path
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", "unmatched")
+
+class MetricsMiddleware:
+    """Plain ASGI (no BaseHTTPMiddleware) so the per-request cost stays tiny."""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        t0 = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                total = time.perf_counter() - t0
+                parts = [f"{name};dur={dt * 1000.0:.2f}" for name, dt in timings]
+                parts.append(f"app;dur={total * 1000.0:.2f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(parts).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_LATENCY.labels(scope["method"], _route_label(scope), str(status["code"])).observe(
+                time.perf_counter() - t0
+            )
+            _timings.reset(token)
+
+def render_latest() -> Tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, func
+from sqlalchemy import Column, Integer, String, DateTime, event, func
 from .db import Base
+from .principal_cache import get_principal_cache
 
 # Matches what you told me earlier (username-only, no email)
 class Account(Base):
@@ -10,3 +11,9 @@ class Account(Base):
     fld_ContactNumber = Column(String(30), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
+
+# Any ORM update/delete of an account drops its cached principal
+@event.listens_for(Account, "after_update")
+@event.listens_for(Account, "after_delete")
+def _invalidate_principal(mapper, connection, target):
+    get_principal_cache().invalidate_user(target.fld_ID)
@@ -0,0 +1,125 @@
+# app/modes.py
+"""
+Speed/accuracy tiers for /detect.
+
+Each mode is an engine profile: decode/input resolution, score threshold,
+top-K limit and optionally a lighter backend (e.g. DETECT_FAST_BACKEND=tflite).
+Input size shrinks the JPEG draft decode for every backend and the network
+input for backends that take one (YOLO's imgsz); the bundled SSD SavedModel
+always resizes to 640 internally, so on it the smaller modes mostly save
+decode time unless paired with a lighter backend (and report no expected_ms).
+
+Under load the server can step a request down a tier: at half the executor
+queue one step, at DETECT_DOWNGRADE_HIGH two. Observed model time per mode
+is tracked so responses can report the expected cost.
+"""
+from __future__ import annotations
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, List, Optional, Tuple
+import os, threading
+
+import numpy as np
+
+from .postprocess import Columns
+
+DETECT_DEFAULT_MODE = os.getenv("DETECT_DEFAULT_MODE", "accurate")
+DETECT_AUTO_DOWNGRADE = os.getenv("DETECT_AUTO_DOWNGRADE", "1") == "1"
+DETECT_DOWNGRADE_LOW = float(os.getenv("DETECT_DOWNGRADE_LOW", "0.5"))    # queue fill -> one step
+DETECT_DOWNGRADE_HIGH = float(os.getenv("DETECT_DOWNGRADE_HIGH", "0.8"))  # queue fill -> two steps
+
+@dataclass(frozen=True)
+class ModeProfile:
+    name: str
+    input_size: int
+    max_det: int
+    score_thresh: float
+    backend: Optional[str] = None   # None = the server's DETECTOR_BACKEND
+    cost_hint_ms: float = 0.0       # expected model time until we have measurements
+
+def _profile(name: str, size: int, max_det: int, thresh: float, hint: float) -> ModeProfile:
+    p = name.upper()
+    return ModeProfile(
+        name=name,
+        input_size=int(os.getenv(f"DETECT_{p}_SIZE", str(size))),
+        max_det=int(os.getenv(f"DETECT_{p}_MAX_DET", str(max_det))),
+        score_thresh=float(os.getenv(f"DETECT_{p}_THRESH", str(thresh))),
+        backend=os.getenv(f"DETECT_{p}_BACKEND") or None,
+        cost_hint_ms=hint,
+    )
+
+# Cheapest first; "accurate" is the previous fixed behavior
+MODE_ORDER: Tuple[str, ...] = ("fast", "balanced", "accurate")
+MODES: Dict[str, ModeProfile] = {
+    "fast": _profile("fast", 320, 20, 0.40, 40.0),
+    "balanced": _profile("balanced", 480, 50, 0.30, 70.0),
+    "accurate": _profile("accurate", 640, 100, 0.25, 110.0),
+}
+
+def set_mode_thresh(name: str, score_thresh: float) -> ModeProfile:
+    """Runtime threshold change for one mode (profiles are frozen, so swap in a copy)."""
+    MODES[name] = replace(MODES[name], score_thresh=float(score_thresh))
+    return MODES[name]
+
+def get_mode(name: Optional[str]) -> ModeProfile:
+    return MODES[name or DETECT_DEFAULT_MODE]
+
+def downgrade(profile: ModeProfile, queue_fill: float) -> ModeProfile:
+    """Steps down MODE_ORDER according to how full the inference queue is (0..1)."""
+    if not DETECT_AUTO_DOWNGRADE:
+        return profile
+    steps = 2 if queue_fill >= DETECT_DOWNGRADE_HIGH else 1 if queue_fill >= DETECT_DOWNGRADE_LOW else 0
+    i = max(0, MODE_ORDER.index(profile.name) - steps)
+    return MODES[MODE_ORDER[i]]
+
+def apply_profile(dets: List[Dict[str, Any]], profile: ModeProfile) -> List[Dict[str, Any]]:
+    """Score threshold + top-K on top of whatever the backend already filtered."""
+    keep = [d for d in dets if d["conf"] >= profile.score_thresh]
+    if len(keep) > profile.max_det:
+        keep.sort(key=lambda d: d["conf"], reverse=True)
+        keep = keep[:profile.max_det]
+    return keep
+
+def apply_profile_columns(cols: Columns, profile: ModeProfile) -> Columns:
+    """apply_profile on Columns (compact responses); same order as the dict version."""
+    keep = np.flatnonzero(cols.conf >= profile.score_thresh)
+    if len(keep) > profile.max_det:
+        # stable, so ties keep backend order like list.sort
+        keep = keep[np.argsort(-cols.conf[keep], kind="stable")[:profile.max_det]]
+    return Columns(cols.class_ids[keep], cols.conf[keep], cols.xywh[keep])
+
+# ---------------------------------------------------------
+# Per-mode cost (EWMA of model time)
+# ---------------------------------------------------------
+_cost_lock = threading.Lock()
+_cost_ms: Dict[str, float] = {}
+_ALPHA = 0.1
+
+def observe(name: str, elapsed_ms: float) -> None:
+    with _cost_lock:
+        prev = _cost_ms.get(name)
+        _cost_ms[name] = elapsed_ms if prev is None else prev + _ALPHA * (elapsed_ms - prev)
+
+def expected_ms(profile: ModeProfile) -> float:
+    with _cost_lock:
+        return round(_cost_ms.get(profile.name, profile.cost_hint_ms), 2)
+
+def describe(profile: ModeProfile, per_mode_cost: bool = True) -> Dict[str, Any]:
+    """per_mode_cost=False: the serving model ignores input_size, so expected_ms is None."""
+    d = asdict(profile)
+    d.pop("cost_hint_ms")
+    d["expected_ms"] = expected_ms(profile) if per_mode_cost else None
+    return d
+
+# ---------------------------------------------------------
+# Lighter backends for modes that name one
+# ---------------------------------------------------------
+_mode_detectors: Dict[str, Any] = {}
+_mode_detectors_lock = threading.Lock()
+
+def get_mode_detector(backend: str) -> Any:
+    from .backends import create_detector
+    with _mode_detectors_lock:
+        det = _mode_detectors.get(backend)
+        if det is None:
+            det = _mode_detectors[backend] = create_detector(backend)
+    return det
@@ -0,0 +1,133 @@
+# app/postprocess.py
+"""
+Detector-agnostic output helpers: COCO label table, conversion of model
+arrays into the API's detection dicts, rescaling and annotation.
+Kept free of TensorFlow so lightweight backends can import it.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, NamedTuple, Tuple
+import io, os
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# COCO 2017 labels (id 1..90). Index 0 is a dummy for 1-based class ids from the model.
+COCO_LABELS = [
+    "??","person","bicycle","car","motorcycle","airplane","bus","train","truck","boat",
+    "traffic light","fire hydrant","stop sign","parking meter","bench","bird","cat","dog",
+    "horse","sheep","cow","elephant","bear","zebra","giraffe","backpack","umbrella",
+    "handbag","tie","suitcase","frisbee","skis","snowboard","sports ball","kite",
+    "baseball bat","baseball glove","skateboard","surfboard","tennis racket","bottle",
+    "wine glass","cup","fork","knife","spoon","bowl","banana","apple","sandwich","orange",
+    "broccoli","carrot","hot dog","pizza","donut","cake","chair","couch","potted plant",
+    "bed","dining table","toilet","tv","laptop","mouse","remote","keyboard","cell phone",
+    "microwave","oven","toaster","sink","refrigerator","book","clock","vase","scissors",
+    "teddy bear","hair drier","toothbrush"
+]
+
+def _label_table(labels: List[str], size: int = 256) -> np.ndarray:
+    """Object array indexed by class id; ids without a name map to their str(id)."""
+    return np.array(list(labels) + [str(i) for i in range(len(labels), size)], dtype=object)
+
+def load_labels(path: str) -> np.ndarray:
+    """
+    Label file with one name per line for 1-based ids (line 1 = id 1), e.g.
+    models/coco_labels.txt, which has the full 90-id COCO map of the OD API.
+    """
+    with open(path, encoding="utf-8") as f:
+        names = [line.strip() for line in f]
+    while names and not names[-1]:
+        names.pop()
+    return _label_table(["??"] + names)
+
+# LABELS_FILE replaces the built-in COCO names for the SSD-family backends
+LABELS_FILE = os.getenv("LABELS_FILE", "")
+LABEL_TABLE = load_labels(LABELS_FILE) if LABELS_FILE else _label_table(COCO_LABELS)
+
+class Columns(NamedTuple):
+    """Detections as parallel arrays, for callers that never need the dicts."""
+    class_ids: np.ndarray  # [n] int64
+    conf: np.ndarray       # [n] float64, rounded like the dicts' conf
+    xywh: np.ndarray       # [n,4] float64, pixels of the (W, H) they were made for
+
+def detection_columns(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, W: int, H: int) -> Columns:
+    """
+    Already-filtered model arrays in pixel xywh. boxes are normalized
+    (ymin,xmin,ymax,xmax), so scaling by the caller's W/H maps them back to
+    the original image whatever size was fed in.
+    """
+    px = np.asarray(boxes, dtype=np.float64).reshape(-1, 4) * np.array([H, W, H, W], dtype=np.float64)
+    xywh = np.empty_like(px)
+    xywh[:, 0], xywh[:, 1] = px[:, 1], px[:, 0]
+    xywh[:, 2], xywh[:, 3] = px[:, 3] - px[:, 1], px[:, 2] - px[:, 0]
+    cls = np.asarray(classes).astype(np.int64).reshape(-1)
+    confs = np.round(np.asarray(scores, dtype=np.float64).reshape(-1), 4)
+    return Columns(cls, confs, xywh)
+
+def rescale_columns(cols: Columns, src: Tuple[int, int], dst: Tuple[int, int]) -> Columns:
+    """rescale_detections for Columns."""
+    if src == dst:
+        return cols
+    sx, sy = dst[0] / src[0], dst[1] / src[1]
+    return cols._replace(xywh=cols.xywh * np.array([sx, sy, sx, sy]))
+
+def columns_to_detections(cols: Columns, labels: np.ndarray = LABEL_TABLE) -> List[Dict[str, Any]]:
+    """The API's detection dicts; all math is done, Python only zips the columns."""
+    if len(cols.class_ids) == 0:
+        return []
+    cls = cols.class_ids
+    in_range = (cls >= 0) & (cls < len(labels))
+    names = labels[np.where(in_range, cls, 0)]
+    if not in_range.all():
+        names[~in_range] = cls[~in_range].astype(str)
+    x, y, w, h = cols.xywh.T
+    return [
+        {"class_id": c, "class_name": n, "conf": s, "box": {"x": bx, "y": by, "w": bw, "h": bh}}
+        for c, n, s, bx, by, bw, bh in zip(
+            cls.tolist(), names.tolist(), cols.conf.tolist(), x.tolist(), y.tolist(), w.tolist(), h.tolist()
+        )
+    ]
+
+def format_detections(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    classes: np.ndarray,
+    W: int,
+    H: int,
+    labels: np.ndarray = LABEL_TABLE,
+) -> List[Dict[str, Any]]:
+    """Turns already-filtered model arrays into the API's detection dicts."""
+    if len(scores) == 0:
+        return []
+    return columns_to_detections(detection_columns(boxes, scores, classes, W, H), labels)
+
+def rescale_detections(dets: List[Dict[str, Any]], src: Tuple[int, int], dst: Tuple[int, int]) -> List[Dict[str, Any]]:
+    """Maps detection boxes from an image of size src (W, H) to one of size dst."""
+    if src == dst:
+        return dets
+    sx, sy = dst[0] / src[0], dst[1] / src[1]
+    return [
+        {**d, "box": {"x": d["box"]["x"] * sx, "y": d["box"]["y"] * sy,
+                      "w": d["box"]["w"] * sx, "h": d["box"]["h"] * sy}}
+        for d in dets
+    ]
+
+def draw_detections(pil_image: Image.Image, dets: List[Dict[str, Any]]) -> Image.Image:
+    """Returns a copy of the image with boxes and labels drawn on it."""
+    canvas = pil_image.copy()
+    draw = ImageDraw.Draw(canvas, "RGBA")
+    for d in dets:
+        x, y, w, h = d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"]
+        x2, y2 = x + w, y + h
+        draw.rectangle([x, y, x2, y2], outline=(66, 135, 245, 255), width=3)
+        draw.text((x + 4, max(0, y - 16)), f'{d["class_name"]} {d["conf"]:.2f}', fill=(255,255,255,255))
+    return canvas
+
+def encode_jpeg(img: Image.Image, quality: int = 85) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+def annotate(pil_image: Image.Image, dets: List[Dict[str, Any]]) -> bytes:
+    """Draws detections on a copy of the image and returns it as JPEG bytes."""
+    return encode_jpeg(draw_detections(pil_image, dets))
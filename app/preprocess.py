@@ -0,0 +1,60 @@
+# app/preprocess.py
+"""
+Upload decoding close to the model's input resolution.
+
+The SSD graph resizes everything to 640x640, so fully decoding a 12 MP phone
+photo is wasted work and memory. For JPEGs, PIL's draft mode lets libjpeg
+scale by 1/2, 1/4 or 1/8 in the DCT domain while decoding, keeping the result
+at least `target` pixels on each side. Detectors get the original size
+alongside so boxes are still reported in the uploaded image's coordinates.
+"""
+from __future__ import annotations
+from typing import Tuple
+import io
+
+import numpy as np
+from PIL import Image
+
+MODEL_INPUT_SIZE = 640
+
+def decode_for_model(raw: bytes, target: int = MODEL_INPUT_SIZE) -> Tuple[Image.Image, Tuple[int, int]]:
+    """Returns (RGB image at reduced size, (W, H) of the original upload)."""
+    im = Image.open(io.BytesIO(raw))
+    orig_size = im.size
+    if im.format == "JPEG":
+        # Must run before the first load(); picks the largest 1/2^k scale still >= target.
+        im.draft("RGB", (target, target))
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    else:
+        im.load()
+    return im, orig_size
+
+def decode_for_output(raw: bytes, max_side: int = 0) -> Tuple[Image.Image, Tuple[int, int]]:
+    """
+    Decode for drawing the annotated response: at most `max_side` pixels on
+    the long side (0 = original size). Returns (image, original (W, H)).
+    """
+    if max_side <= 0:
+        im = decode_full(raw)
+        return im, im.size
+    im = Image.open(io.BytesIO(raw))
+    orig_size = im.size
+    if im.format == "JPEG":
+        im.draft("RGB", (max_side, max_side))
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    if max(im.size) > max_side:
+        im.thumbnail((max_side, max_side), Image.BILINEAR)
+    return im, orig_size
+
+def decode_full(raw: bytes) -> Image.Image:
+    """Full-resolution RGB decode, only for outputs drawn at original size."""
+    im = Image.open(io.BytesIO(raw))
+    return im if im.mode == "RGB" else im.convert("RGB")
+
+def to_uint8_array(im: Image.Image) -> np.ndarray:
+    """[H,W,3] uint8 view over one contiguous copy of the pixels (no extra convert/copy)."""
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    return np.frombuffer(im.tobytes(), dtype=np.uint8).reshape(im.height, im.width, 3)
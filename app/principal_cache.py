@@ -0,0 +1,172 @@
+# app/principal_cache.py
+"""
+Cache of authenticated principals so hot authenticated routes skip the JWT
+decode and the account lookup.
+
+Two LRU maps share one lock:
+  token -> user id   until min(token exp, now + TTL)
+  (realm, user id) -> principal snapshot   for TTL
+
+`realm` separates account sources that number users independently (the SQL
+accounts table vs. app.storage). Writers call invalidate_user() after
+changing or deleting an account; models.py also hooks the ORM so any
+update/delete of an Account drops it. Invalidation is per process, so with
+several workers the TTL bounds how stale another worker can be.
+"""
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import os, threading, time
+
+from .metrics import METRICS_ENABLED, PRINCIPAL_CACHE_LOOKUPS
+
+PRINCIPAL_CACHE = os.getenv("PRINCIPAL_CACHE", "1") == "1"
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", "10000"))
+PRINCIPAL_CACHE_TTL_S = float(os.getenv("PRINCIPAL_CACHE_TTL_S", "60"))
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached, read-only view of an account; safe to share across requests."""
+    id: int
+    name: str
+    contact_number: Optional[str] = None
+
+class PrincipalCache:
+    def __init__(self, max_entries: int = PRINCIPAL_CACHE_MAX, ttl_s: float = PRINCIPAL_CACHE_TTL_S,
+                 enabled: bool = PRINCIPAL_CACHE):
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._tokens: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._users: "OrderedDict[Tuple[str, int], Tuple[Any, float]]" = OrderedDict()
+        self._realms: set = set()
+        # Bumped on invalidation so a load that raced with a write isn't cached
+        self._generation: Dict[int, int] = {}
+
+        self.counts = {"token": {"hit": 0, "miss": 0}, "user": {"hit": 0, "miss": 0}}
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _count(self, layer: str, result: str) -> None:
+        self.counts[layer][result] += 1
+        if METRICS_ENABLED:
+            PRINCIPAL_CACHE_LOOKUPS.labels(layer, result).inc()
+
+    def _put(self, od: OrderedDict, key: Any, value: Any) -> None:
+        od[key] = value
+        od.move_to_end(key)
+        while len(od) > self.max_entries:
+            od.popitem(last=False)
+            self.evictions += 1
+
+    # --- lookups ---
+    def uid_for_token(self, token: str, decode: Callable[[str], Tuple[int, Optional[float]]]) -> int:
+        """`decode(token)` returns (user id, exp epoch seconds or None) and raises if invalid."""
+        if not self.enabled:
+            return decode(token)[0]
+        now = time.time()
+        with self._lock:
+            hit = self._tokens.get(token)
+            if hit is not None and hit[1] > now:
+                self._tokens.move_to_end(token)
+                self._count("token", "hit")
+                return hit[0]
+            if hit is not None:
+                del self._tokens[token]
+            self._count("token", "miss")
+        uid, exp = decode(token)
+        expires = now + self.ttl_s if exp is None else min(exp, now + self.ttl_s)
+        with self._lock:
+            self._put(self._tokens, token, (uid, expires))
+        return uid
+
+    def _lookup_user(self, key: Tuple[str, int]) -> Tuple[bool, Any, int]:
+        """(hit, value, generation to pass to _store_user on a miss)"""
+        now = time.time()
+        with self._lock:
+            hit = self._users.get(key)
+            if hit is not None and hit[1] > now:
+                self._users.move_to_end(key)
+                self._count("user", "hit")
+                return True, hit[0], 0
+            if hit is not None:
+                del self._users[key]
+            self._count("user", "miss")
+            return False, None, self._generation.get(key[1], 0)
+
+    def _store_user(self, key: Tuple[str, int], value: Any, gen: int) -> None:
+        if value is None:
+            return
+        with self._lock:
+            if self._generation.get(key[1], 0) == gen:
+                self._realms.add(key[0])
+                self._put(self._users, key, (value, time.time() + self.ttl_s))
+
+    def principal(self, realm: str, uid: int, load: Callable[[int], Optional[Any]]) -> Optional[Any]:
+        """Cached `load(uid)`; a None result (unknown user) is not cached."""
+        if not self.enabled:
+            return load(uid)
+        hit, value, gen = self._lookup_user((realm, uid))
+        if not hit:
+            value = load(uid)
+            self._store_user((realm, uid), value, gen)
+        return value
+
+    async def principal_async(self, realm: str, uid: int,
+                              load: Callable[[int], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """principal() with an async loader."""
+        if not self.enabled:
+            return await load(uid)
+        hit, value, gen = self._lookup_user((realm, uid))
+        if not hit:
+            value = await load(uid)
+            self._store_user((realm, uid), value, gen)
+        return value
+
+    # --- invalidation ---
+    def invalidate_user(self, uid: int) -> None:
+        with self._lock:
+            self._generation[uid] = self._generation.get(uid, 0) + 1
+            for realm in self._realms:
+                self._users.pop((realm, uid), None)
+            self.invalidations += 1
+
+    def invalidate_token(self, token: str) -> None:
+        with self._lock:
+            self._tokens.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "enabled": self.enabled,
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "tokens": len(self._tokens),
+                "users": len(self._users),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+            for layer, c in self.counts.items():
+                total = c["hit"] + c["miss"]
+                out[f"{layer}_hits"] = c["hit"]
+                out[f"{layer}_misses"] = c["miss"]
+                out[f"{layer}_hit_ratio"] = round(c["hit"] / total, 4) if total else 0.0
+            return out
+
+# Singleton
+_cache: Optional[PrincipalCache] = None
+_cache_lock = threading.Lock()
+
+def get_principal_cache() -> PrincipalCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PrincipalCache()
+    return _cache
@@ -0,0 +1,79 @@
+# app/readiness.py
+"""
+Background startup: model load/warmup and DB setup run on their own threads
+so the process serves /health immediately, and /ready reports when each part
+is usable.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional
+import os, threading, time
+
+SKIP_CREATE_ALL = os.getenv("SKIP_CREATE_ALL", "0") == "1"
+DB_RETRY_MAX_S = float(os.getenv("DB_RETRY_MAX_S", "30"))
+
+PENDING, LOADING, READY, ERROR = "pending", "loading", "ready", "error"
+
+class Readiness:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state: Dict[str, str] = {"model": PENDING, "db": PENDING}
+        self._errors: Dict[str, str] = {}
+        self._seconds: Dict[str, float] = {}
+        self._started = time.time()
+
+    def _set(self, part: str, state: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._state[part] = state
+            if error:
+                self._errors[part] = error
+            elif state == READY:
+                self._errors.pop(part, None)
+                self._seconds[part] = round(time.time() - self._started, 3)
+
+    def ready(self, part: str) -> bool:
+        with self._lock:
+            return self._state.get(part) == READY
+
+    def all_ready(self) -> bool:
+        with self._lock:
+            return all(s == READY for s in self._state.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ready": all(s == READY for s in self._state.values()),
+                **self._state,
+                "errors": dict(self._errors),
+                "ready_after_s": dict(self._seconds),
+            }
+
+    # --- startup ---
+    def _load_model(self, load: Callable[[], None]) -> None:
+        self._set("model", LOADING)
+        try:
+            load()
+        except Exception as e:
+            self._set("model", ERROR, repr(e))
+            return
+        self._set("model", READY)
+
+    def _init_db(self, init: Callable[[], None]) -> None:
+        # Keep retrying: the DB may come up after us, and /ready should recover on its own.
+        delay = 1.0
+        while True:
+            self._set("db", LOADING)
+            try:
+                init()
+            except Exception as e:
+                self._set("db", ERROR, repr(e))
+                time.sleep(delay)
+                delay = min(delay * 2, DB_RETRY_MAX_S)
+                continue
+            self._set("db", READY)
+            return
+
+    def start(self, load_model: Callable[[], None], init_db: Callable[[], None]) -> None:
+        threading.Thread(target=self._load_model, args=(load_model,), name="startup-model", daemon=True).start()
+        threading.Thread(target=self._init_db, args=(init_db,), name="startup-db", daemon=True).start()
+
+readiness = Readiness()
@@ -0,0 +1,212 @@
+# app/result_cache.py
+"""
+Detection result cache for /detect.
+
+Entries are keyed on an exact content hash of the upload and also carry a
+64-bit dHash of a small grayscale thumbnail, so near-identical resubmissions
+(phone held still, retries with a re-encoded image) can reuse a result when
+the Hamming distance is within CACHE_MAX_HAMMING. Memory is bounded by LRU
+size and a TTL. Identical uploads that arrive while one is being computed
+wait for that single inference instead of running their own.
+
+Entries hold whatever `compute` returned: detection dicts, or postprocess.Columns
+for a cache created with rescale=rescale_columns (compact responses).
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+import hashlib, os, threading, time
+
+from PIL import Image
+
+from .postprocess import rescale_detections
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1") == "1"
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+CACHE_TTL_S = float(os.getenv("CACHE_TTL_S", "30"))
+CACHE_MAX_HAMMING = int(os.getenv("CACHE_MAX_HAMMING", "4"))  # of 64 bits; 0 disables near hits
+
+def dhash(pil_image: Image.Image, size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair of a (size+1)xsize thumbnail."""
+    small = pil_image.convert("L").resize((size + 1, size), Image.BILINEAR)
+    px = small.tobytes()
+    bits = 0
+    for row in range(size):
+        base = row * (size + 1)
+        for col in range(size):
+            bits = (bits << 1) | (px[base + col] > px[base + col + 1])
+    return bits
+
+def content_key(raw: bytes) -> str:
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+@dataclass
+class _Entry:
+    dets: Any               # detection dicts or Columns
+    elapsed_ms: float
+    size: Tuple[int, int]   # (W, H) the boxes are expressed in
+    phash: int
+    expires: float
+
+class ResultCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl_s: float = CACHE_TTL_S, max_hamming: int = CACHE_MAX_HAMMING,
+                 rescale: Callable[[Any, Tuple[int, int], Tuple[int, int]], Any] = rescale_detections):
+        self.max_entries = max(1, max_entries)
+        self.rescale = rescale  # maps a near hit's boxes to the new upload's size
+        self.ttl_s = ttl_s
+        self.max_hamming = max_hamming
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, Future] = {}
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.expired = 0
+        # Best Hamming distance seen per lookup that reached the near-match stage
+        self._distance_hist: Dict[int, int] = {}
+
+    # --- lookups (caller holds self._lock) ---
+    def _get_exact(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires < now:
+            del self._entries[key]
+            self.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _get_near(self, phash: int, now: float) -> Optional[_Entry]:
+        best_key, best_dist = None, 65
+        for key, entry in list(self._entries.items()):
+            if entry.expires < now:
+                del self._entries[key]
+                self.expired += 1
+                continue
+            dist = (entry.phash ^ phash).bit_count()
+            if dist < best_dist:
+                best_key, best_dist = key, dist
+        if best_key is not None:
+            self._distance_hist[best_dist] = self._distance_hist.get(best_dist, 0) + 1
+        if best_key is None or best_dist > self.max_hamming:
+            return None
+        self._entries.move_to_end(best_key)
+        return self._entries[best_key]
+
+    def _put(self, key: str, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    # --- public ---
+    def get_or_compute(
+        self,
+        raw: bytes,
+        decode: Callable[[], Tuple[Image.Image, Tuple[int, int]]],
+        compute: Callable[[Image.Image], Tuple[List[Dict[str, Any]], float]],
+    ) -> Tuple[List[Dict[str, Any]], float, str]:
+        """
+        Returns (detections, elapsed_ms, status) where status is one of
+        "hit", "near", "shared" or "miss". `decode()` is only called when the
+        exact hash misses and returns (pil, (W, H) boxes are reported in);
+        `compute(pil)` must return (detections, elapsed_ms) in that space.
+        """
+        key = content_key(raw)
+        now = time.time()
+
+        with self._lock:
+            entry = self._get_exact(key, now)
+            if entry is not None:
+                self.hits += 1
+                return entry.dets, entry.elapsed_ms, "hit"
+            fut = self._inflight.get(key)
+            owner = fut is None
+            if owner:
+                fut = Future()
+                self._inflight[key] = fut
+            else:
+                self.shared += 1
+        if not owner:
+            # Same bytes, so same image size: boxes need no rescaling.
+            dets, elapsed_ms = fut.result()
+            return dets, elapsed_ms, "shared"
+
+        try:
+            pil_image, size = decode()
+            phash = dhash(pil_image)
+            with self._lock:
+                entry = self._get_near(phash, now) if self.max_hamming > 0 else None
+                if entry is not None:
+                    self.near_hits += 1
+                    dets = self.rescale(entry.dets, entry.size, size)
+                    self._put(key, _Entry(dets, entry.elapsed_ms, size, phash, now + self.ttl_s))
+            if entry is not None:
+                fut.set_result((dets, entry.elapsed_ms))
+                return dets, entry.elapsed_ms, "near"
+
+            dets, elapsed_ms = compute(pil_image)
+            with self._lock:
+                self.misses += 1
+                self._put(key, _Entry(dets, elapsed_ms, size, phash, time.time() + self.ttl_s))
+            fut.set_result((dets, elapsed_ms))
+            return dets, elapsed_ms, "miss"
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses + self.shared
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "max_hamming": self.max_hamming,
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "shared": self.shared,
+                "misses": self.misses,
+                "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "best_distance_hist": dict(sorted(self._distance_hist.items())),
+            }
+
+# One cache per detection mode (results differ by input size/threshold/backend)
+_caches: Dict[str, ResultCache] = {}
+_cache_lock = threading.Lock()
+
+def get_result_cache(namespace: str = "default", rescale: Callable = rescale_detections) -> ResultCache:
+    with _cache_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            cache = _caches[namespace] = ResultCache(rescale=rescale)
+    return cache
+
+def clear_result_caches() -> None:
+    """Drops every namespace (e.g. after a threshold change or a model reload)."""
+    with _cache_lock:
+        caches = list(_caches.values())
+        _caches.clear()
+    for c in caches:
+        c.clear()
+
+def all_cache_stats() -> Dict[str, Any]:
+    with _cache_lock:
+        caches = dict(_caches)
+    return {name: c.stats() for name, c in caches.items()}
@@ -0,0 +1,312 @@
+# app/sidecar.py
+"""
+Inference sidecar: one process owns the model, API workers talk to it over
+a Unix domain socket.
+
+With `uvicorn --workers N` every worker would otherwise import TensorFlow
+and load its own SavedModel. Instead run one or two of these:
+
+    python -m app.sidecar --socket /tmp/blindspot-infer.sock --backend ssd
+
+and start the API with DETECTOR_BACKEND=remote and
+SIDECAR_SOCKETS=/tmp/blindspot-infer.sock (comma-separate several sidecars).
+The API workers then never import TF.
+
+Wire format (little-endian), one request/response at a time per connection:
+
+    request   magic "BSI1" | u8 op | u32 req_id | u16 h | u16 w | u32 len | len bytes
+              op 1 = detect (payload: h*w*3 RGB uint8), op 2 = ping (no payload)
+    response  magic "BSI1" | u8 status | u32 req_id | u32 n | f32 elapsed_ms | u32 len | len bytes
+              status 0: payload = boxes f32[n,4] (normalized ymin,xmin,ymax,xmax),
+                        scores f32[n], classes f32[n]
+                        ping: payload = the model's label table, n utf-8 names
+                        joined by "\n" (line i = class id i)
+              status 1: payload = utf-8 error message
+
+Frames are shrunk to SIDECAR_MAX_SIDE before sending; boxes come back
+normalized, so that costs no coordinate accuracy.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import argparse, itertools, os, queue, socket, socketserver, struct, threading, time
+
+import numpy as np
+from PIL import Image
+
+from .postprocess import LABEL_TABLE, _label_table, annotate, format_detections
+from .preprocess import to_uint8_array
+
+SIDECAR_SOCKETS = [s for s in os.getenv("SIDECAR_SOCKETS", "/tmp/blindspot-infer.sock").split(",") if s]
+SIDECAR_POOL_SIZE = int(os.getenv("SIDECAR_POOL_SIZE", "4"))        # connections per sidecar
+SIDECAR_TIMEOUT = float(os.getenv("SIDECAR_TIMEOUT", "10"))         # seconds per request
+SIDECAR_CONNECT_WAIT = float(os.getenv("SIDECAR_CONNECT_WAIT", "120"))  # wait for a sidecar at startup
+SIDECAR_MAX_SIDE = int(os.getenv("SIDECAR_MAX_SIDE", "640"))
+SIDECAR_CONCURRENCY = int(os.getenv("SIDECAR_CONCURRENCY", "2"))    # server: model calls at once
+
+MAGIC = b"BSI1"
+OP_DETECT, OP_PING = 1, 2
+STATUS_OK, STATUS_ERROR = 0, 1
+_REQ = struct.Struct("<4sBIHHI")
+_RESP = struct.Struct("<4sBIIfI")
+MAX_PAYLOAD = 4096 * 4096 * 3
+
+class SidecarError(RuntimeError):
+    """The sidecar answered with an error (the connection itself is fine)."""
+
+# Failures where the sidecar never got (or dropped) the request, so another
+# connection may retry it. A read timeout is not one: the sidecar may still be
+# working on the frame, and resending it would only add load to a busy one.
+_RETRYABLE = (ConnectionRefusedError, ConnectionResetError, ConnectionAbortedError, BrokenPipeError,
+              FileNotFoundError)
+
+def encode_labels(labels: np.ndarray) -> Tuple[int, bytes]:
+    names = [str(n) for n in labels.tolist()]
+    while names and names[-1] == str(len(names) - 1):
+        names.pop()  # unnamed placeholder ids, rebuilt by decode_labels
+    return len(names), "\n".join(names).encode("utf-8")
+
+def decode_labels(n: int, body: bytes) -> Optional[np.ndarray]:
+    """The id -> name table from a ping response; None from a sidecar that sends none."""
+    if not n:
+        return None
+    names = body.decode("utf-8").split("\n")
+    if len(names) != n:
+        raise ConnectionError("malformed label table in sidecar ping")
+    return _label_table(names, size=max(256, n))
+
+def _recv_exact(sock: socket.socket, n: int) -> bytearray:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionResetError("sidecar connection closed")
+        got += k
+    return buf
+
+# ---------------------------------------------------------
+# Server
+# ---------------------------------------------------------
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        det = self.server.detector
+        sock: socket.socket = self.request
+        while True:
+            try:
+                magic, op, req_id, h, w, length = _REQ.unpack(_recv_exact(sock, _REQ.size))
+            except (ConnectionError, OSError):
+                return
+            if magic != MAGIC or length > MAX_PAYLOAD:
+                return  # not our protocol; drop the connection
+            payload = _recv_exact(sock, length) if length else b""
+            if op == OP_PING:
+                n, body = self.server.labels
+                sock.sendall(_RESP.pack(MAGIC, STATUS_OK, req_id, n, 0.0, len(body)) + body)
+                continue
+            try:
+                if length != h * w * 3:
+                    raise ValueError(f"payload is {length} bytes, expected {h}x{w}x3")
+                frame = np.frombuffer(payload, dtype=np.uint8).reshape(h, w, 3)
+                with self.server.gate:
+                    t0 = time.time()
+                    boxes, scores, classes = det.detect_arrays(frame)
+                    elapsed_ms = (time.time() - t0) * 1000.0
+                body = b"".join([
+                    np.ascontiguousarray(boxes, dtype=np.float32).tobytes(),
+                    np.ascontiguousarray(scores, dtype=np.float32).tobytes(),
+                    np.ascontiguousarray(classes, dtype=np.float32).tobytes(),
+                ])
+                sock.sendall(_RESP.pack(MAGIC, STATUS_OK, req_id, len(scores), elapsed_ms, len(body)) + body)
+            except Exception as e:
+                msg = repr(e).encode("utf-8")
+                sock.sendall(_RESP.pack(MAGIC, STATUS_ERROR, req_id, 0, 0.0, len(msg)) + msg)
+
+class SidecarServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, detector: Any, concurrency: int = SIDECAR_CONCURRENCY):
+        if os.path.exists(path):
+            os.unlink(path)  # stale socket from a previous run
+        self.detector = detector
+        self.labels = encode_labels(getattr(detector, "labels", LABEL_TABLE))
+        self.gate = threading.BoundedSemaphore(max(1, concurrency))
+        super().__init__(path, _Handler)
+        os.chmod(path, 0o660)
+
+def serve(path: str, backend: str, concurrency: int = SIDECAR_CONCURRENCY) -> None:
+    from .backends import create_detector
+    det = create_detector(backend)
+    if not hasattr(det, "detect_arrays"):
+        raise SystemExit(f"backend {backend!r} has no detect_arrays(); the sidecar needs ssd or tflite")
+    with SidecarServer(path, det, concurrency) as server:
+        print(f"[sidecar] {backend} serving on {path} (concurrency {concurrency})")
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+# ---------------------------------------------------------
+# Client (DETECTOR_BACKEND=remote)
+# ---------------------------------------------------------
+class _Endpoint:
+    """Pooled connections to one sidecar socket."""
+    def __init__(self, path: str, pool_size: int, timeout: float):
+        self.path = path
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[socket.socket]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, pool_size))
+        self._count_lock = threading.Lock()  # callers run on many executor threads
+        self.inflight = 0
+        self.errors = 0
+
+    def _count(self, inflight: int = 0, errors: int = 0) -> None:
+        with self._count_lock:
+            self.inflight += inflight
+            self.errors += errors
+
+    def _connect(self) -> socket.socket:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        s.connect(self.path)
+        return s
+
+    def call(self, op: int, req_id: int, frame: Optional[np.ndarray]) -> Tuple[int, float, bytes]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"no free connection to {self.path}")
+        req_id &= 0xFFFFFFFF
+        self._count(inflight=1)
+        sock = None
+        try:
+            try:
+                sock = self._idle.get_nowait()
+            except queue.Empty:
+                sock = self._connect()
+            h, w = frame.shape[:2] if frame is not None else (0, 0)
+            payload = frame.tobytes() if frame is not None else b""
+            sock.sendall(_REQ.pack(MAGIC, op, req_id, h, w, len(payload)) + payload)
+            magic, status, rid, n, elapsed_ms, length = _RESP.unpack(_recv_exact(sock, _RESP.size))
+            if magic != MAGIC or rid != req_id:
+                raise ConnectionError("out-of-sync sidecar response")
+            body = bytes(_recv_exact(sock, length)) if length else b""
+            self._idle.put(sock)
+            sock = None
+            if status != STATUS_OK:
+                raise SidecarError(body.decode("utf-8", "replace"))
+            return n, elapsed_ms, body
+        except (OSError, ConnectionError):
+            self._count(errors=1)
+            raise
+        finally:
+            if sock is not None:
+                sock.close()  # broken or timed out mid-request: never reuse
+            self._count(inflight=-1)
+            self._slots.release()
+
+class RemoteDetector:
+    """
+    Same `infer()` / `detect_arrays()` contract as the local backends, served
+    by one or more sidecars. Picks the least-busy sidecar and retries once on
+    another connection if the connection is refused or reset (not on timeouts). Class names come from the
+    sidecar's own label table (sent in ping responses), not the local one.
+    """
+    def __init__(self, sockets: List[str] = SIDECAR_SOCKETS, pool_size: int = SIDECAR_POOL_SIZE,
+                 timeout: float = SIDECAR_TIMEOUT, max_side: int = SIDECAR_MAX_SIDE,
+                 connect_wait: float = SIDECAR_CONNECT_WAIT):
+        if not sockets:
+            raise ValueError("SIDECAR_SOCKETS is empty")
+        self.endpoints = [_Endpoint(p, pool_size, timeout) for p in sockets]
+        self.max_side = max_side
+        self.labels = LABEL_TABLE  # replaced by the sidecar's table on the first ping
+        self._ids = itertools.count(1)
+        self._wait_ready(connect_wait)
+
+    def _wait_ready(self, wait: float) -> None:
+        # The sidecar may still be loading its model when the API starts
+        deadline = time.time() + wait
+        while True:
+            try:
+                self.ping()
+                return
+            except (OSError, ConnectionError) as e:
+                if time.time() > deadline:
+                    raise RuntimeError(f"no inference sidecar reachable at {[e.path for e in self.endpoints]}") from e
+                time.sleep(0.5)
+
+    def _call(self, op: int, frame: Optional[np.ndarray]) -> Tuple[int, float, bytes]:
+        order = sorted(self.endpoints, key=lambda e: e.inflight)
+        last: Optional[BaseException] = None
+        for ep in (order + order)[:2]:
+            try:
+                return ep.call(op, next(self._ids), frame)
+            except _RETRYABLE as e:
+                last = e
+        raise last
+
+    def ping(self) -> None:
+        """Raises unless at least one sidecar answers; picks up its label table."""
+        last: Optional[BaseException] = None
+        tables = []
+        for ep in self.endpoints:
+            try:
+                n, _, body = ep.call(OP_PING, next(self._ids), None)
+                tables.append(decode_labels(n, body))
+            except (OSError, ConnectionError) as e:
+                last = e
+        if not tables:
+            raise last
+        table = tables[0]
+        if table is not None:
+            if any(t is None or t.tolist() != table.tolist() for t in tables[1:]):
+                print("[sidecar] sidecars report different label tables; using the first one")
+            self.labels = table
+
+    def detect_arrays(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n, _, body = self._call(OP_DETECT, np.ascontiguousarray(frame, dtype=np.uint8))
+        arr = np.frombuffer(body, dtype=np.float32)
+        return arr[:4 * n].reshape(n, 4), arr[4 * n:5 * n], arr[5 * n:6 * n]
+
+    def _fit(self, pil_image: Image.Image) -> np.ndarray:
+        img = pil_image
+        if max(img.size) > self.max_side:
+            img = img.copy()
+            img.thumbnail((self.max_side, self.max_side), Image.BILINEAR)
+        return to_uint8_array(img)
+
+    def infer(
+        self,
+        pil_image: Image.Image,
+        return_image: bool = False,
+        orig_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[bytes], float]:
+        W, H = orig_size or pil_image.size
+        n, elapsed_ms, body = self._call(OP_DETECT, self._fit(pil_image))
+        arr = np.frombuffer(body, dtype=np.float32)
+        boxes, scores, classes = arr[:4 * n].reshape(n, 4), arr[4 * n:5 * n], arr[5 * n:6 * n]
+        dets = format_detections(boxes, scores, classes, W, H, labels=self.labels)
+        jpeg_bytes = None
+        if return_image:
+            jpeg_bytes = annotate(pil_image, format_detections(boxes, scores, classes, *pil_image.size, labels=self.labels))
+        return dets, jpeg_bytes, elapsed_ms
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "sidecars": [
+                {"socket": ep.path, "inflight": ep.inflight, "idle_connections": ep._idle.qsize(), "errors": ep.errors}
+                for ep in self.endpoints
+            ],
+        }
+
+def main():
+    ap = argparse.ArgumentParser(description="BlindSpot inference sidecar")
+    ap.add_argument("--socket", default=SIDECAR_SOCKETS[0] if SIDECAR_SOCKETS else "/tmp/blindspot-infer.sock")
+    ap.add_argument("--backend", default=os.getenv("SIDECAR_BACKEND", "ssd"))
+    ap.add_argument("--concurrency", type=int, default=SIDECAR_CONCURRENCY)
+    args = ap.parse_args()
+    if args.backend == "remote":
+        raise SystemExit("the sidecar needs a local backend (ssd or tflite)")
+    serve(args.socket, args.backend, args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# app/streaming.py
+"""
+Per-connection state for the /ws/detect streaming endpoint.
+
+Frames arrive as binary JPEG messages. Only the newest unprocessed frame is
+kept (latest-frame-wins), and frames that barely differ from the last
+processed one reuse its result instead of running the detector again.
+
+With tracking on, the detector only runs on keyframes; other frames are not
+even decoded and get boxes propagated by `tracker.IoUTracker`.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Callable, ContextManager, Optional, Tuple
+import asyncio, os, time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from .preprocess import decode_for_model
+from .tracker import IoUTracker, KeyframePolicy
+
+WS_MOTION_THRESH = float(os.getenv("WS_MOTION_THRESH", "3.0"))  # mean abs diff, 0..255 gray
+WS_MOTION_SIZE = 32  # side of the downsampled grayscale signature
+
+def motion_signature(pil_image: Image.Image, size: int = WS_MOTION_SIZE) -> np.ndarray:
+    small = pil_image.convert("L").resize((size, size), Image.BILINEAR)
+    return np.asarray(small, dtype=np.int16)
+
+class StreamSession:
+    """
+    `serving()` is a context manager yielding (detector, model version) for one
+    call, e.g. main._serving, so a hot reload drains streamed frames too.
+    """
+    def __init__(self, serving: Callable[[], ContextManager[Tuple[Any, str]]],
+                 motion_thresh: float = WS_MOTION_THRESH, track: bool = False):
+        self._serving = serving
+        self.model_version: Optional[str] = None  # of the model that produced the last detections
+        self.motion_thresh = motion_thresh
+        self.tracker: Optional[IoUTracker] = IoUTracker() if track else None
+        self.policy = KeyframePolicy()
+        self._last_seq = 0
+
+        self._latest: Optional[bytes] = None
+        self._latest_seq = 0
+        self._frame_ready = asyncio.Event()
+
+        self._last_sig: Optional[np.ndarray] = None
+        self._last_result: Optional[Dict[str, Any]] = None
+
+        self.received = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.processed = 0
+        self.tracked = 0
+        # Process CPU time per frame (includes TF's own op threads), split by how it was served
+        self._cpu_ms: Dict[str, deque] = {"detect": deque(maxlen=1024), "track": deque(maxlen=1024)}
+
+    # --- receive side (event loop) ---
+    def offer(self, frame: bytes) -> None:
+        """Stores the newest frame; an unprocessed older one is dropped."""
+        self.received += 1
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = frame
+        self._latest_seq = self.received
+        self._frame_ready.set()
+
+    async def next_frame(self):
+        await self._frame_ready.wait()
+        self._frame_ready.clear()
+        frame, seq = self._latest, self._latest_seq
+        self._latest = None
+        return seq, frame
+
+    # --- processing side (inference executor) ---
+    def process(self, seq: int, frame: bytes) -> Dict[str, Any]:
+        t0 = time.process_time()
+        steps, self._last_seq = seq - self._last_seq, seq
+        if self.tracker is not None and not self.policy.is_keyframe(seq, self.tracker):
+            dets = self.tracker.predict(steps)
+            self.tracked += 1
+            cpu_ms = (time.process_time() - t0) * 1000.0
+            self._cpu_ms["track"].append(cpu_ms)
+            return {"time_ms": 0.0, "detections": dets, "reused": False, "keyframe": False, "cpu_ms": round(cpu_ms, 3)}
+
+        result = self._detect(frame)
+        if self.tracker is not None:
+            if not result["reused"]:
+                result["detections"] = self.tracker.update(result["detections"], steps)
+                self._last_result["detections"] = result["detections"]
+            else:
+                result["detections"] = self.tracker.predict(steps)
+            self.policy.mark(seq)
+            result["keyframe"] = True
+        cpu_ms = (time.process_time() - t0) * 1000.0
+        self._cpu_ms["detect"].append(cpu_ms)
+        result["cpu_ms"] = round(cpu_ms, 3)
+        return result
+
+    def _detect(self, frame: bytes) -> Dict[str, Any]:
+        pil, orig_size = decode_for_model(frame)
+        sig = motion_signature(pil)
+        if self._last_result is not None and self._last_sig is not None and sig.shape == self._last_sig.shape:
+            diff = float(np.abs(sig - self._last_sig).mean())
+            if diff < self.motion_thresh:
+                self.skipped += 1
+                return {**self._last_result, "reused": True, "motion": round(diff, 3)}
+
+        with self._serving() as (det, version):
+            dets, _, elapsed_ms = det.infer(pil, return_image=False, orig_size=orig_size)
+        self.model_version = version
+        self.processed += 1
+        self._last_sig = sig
+        self._last_result = {"time_ms": elapsed_ms, "detections": dets}
+        return {**self._last_result, "reused": False}
+
+    def stats(self) -> Dict[str, Any]:
+        detect = list(self._cpu_ms["detect"])
+        track = list(self._cpu_ms["track"])
+        avg_detect = sum(detect) / len(detect) if detect else 0.0
+        avg_all = (sum(detect) + sum(track)) / (len(detect) + len(track)) if detect or track else 0.0
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "skipped": self.skipped,
+            "processed": self.processed,
+            "tracked": self.tracked,
+            "cpu_ms_per_frame": round(avg_all, 3),
+            "cpu_ms_per_detect_frame": round(avg_detect, 3),
+            "cpu_ms_per_track_frame": round(sum(track) / len(track), 3) if track else 0.0,
+            # vs. running the detector on every served frame
+            "cpu_saved_ratio": round(1.0 - avg_all / avg_detect, 3) if avg_detect else 0.0,
+        }
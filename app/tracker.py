@@ -0,0 +1,148 @@
+# app/tracker.py
+"""
+Cheap NumPy tracker used between detector keyframes.
+
+Keyframes associate fresh detections to existing tracks by greedy IoU (same
+class only) and update a constant-velocity estimate. Frames in between just
+move every track by its velocity and decay its confidence, so the session can
+ask for a new keyframe once the tracker stops being trustworthy.
+"""
+from __future__ import annotations
+from typing import List, Dict, Any, Optional
+import itertools, os
+
+import numpy as np
+
+TRACK_KEYFRAME_EVERY = int(os.getenv("TRACK_KEYFRAME_EVERY", "5"))
+TRACK_MIN_CONF = float(os.getenv("TRACK_MIN_CONF", "0.5"))   # force a keyframe below this
+TRACK_DECAY = float(os.getenv("TRACK_DECAY", "0.9"))         # per predicted frame
+TRACK_IOU = float(os.getenv("TRACK_IOU", "0.3"))
+TRACK_MAX_MISSED = int(os.getenv("TRACK_MAX_MISSED", "1"))   # keyframes a track may go unmatched
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU between [N,4] and [M,4] boxes in (x,y,w,h)."""
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    ax1, ay1, ax2, ay2 = a[:, 0:1], a[:, 1:2], a[:, 0:1] + a[:, 2:3], a[:, 1:2] + a[:, 3:4]
+    bx1, by1, bx2, by2 = b[:, 0], b[:, 1], b[:, 0] + b[:, 2], b[:, 1] + b[:, 3]
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = iw * ih
+    union = (a[:, 2:3] * a[:, 3:4]) + (b[:, 2] * b[:, 3]) - inter
+    return (inter / np.maximum(union, 1e-6)).astype(np.float32)
+
+class IoUTracker:
+    def __init__(self, iou_thresh: float = TRACK_IOU, decay: float = TRACK_DECAY, max_missed: int = TRACK_MAX_MISSED):
+        self.iou_thresh = iou_thresh
+        self.decay = decay
+        self.max_missed = max_missed
+        self._ids = itertools.count(1)
+
+        # Parallel arrays, one row per live track
+        self.ids = np.zeros((0,), dtype=np.int64)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)      # x, y, w, h
+        self.velocity = np.zeros((0, 4), dtype=np.float32)   # per frame
+        self.classes = np.zeros((0,), dtype=np.int64)
+        self.confs = np.zeros((0,), dtype=np.float32)        # last detector confidence
+        self.trust = np.zeros((0,), dtype=np.float32)        # decays while predicting
+        self.missed = np.zeros((0,), dtype=np.int64)
+        self.names: List[str] = []
+        self._since_key = 0
+
+    def confidence(self) -> float:
+        """Tracker trust in [0,1]; 1.0 right after a keyframe."""
+        live = self.trust[self.missed == 0]
+        return float(live.min()) if len(live) else 1.0
+
+    def update(self, dets: List[Dict[str, Any]], steps: int = 1) -> List[Dict[str, Any]]:
+        """Keyframe `steps` frames after the previous processed frame: associate detector
+        output to tracks and return it with track ids."""
+        predicted, self._since_key = self._since_key, 0
+        gap = predicted + max(1, steps)   # frames since the tracks were last observed
+
+        boxes = np.array([[d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"]] for d in dets],
+                         dtype=np.float32).reshape(-1, 4)
+        classes = np.array([d["class_id"] for d in dets], dtype=np.int64)
+
+        # Compare against where the tracks were last observed, not where prediction drifted.
+        observed = self.boxes - self.velocity * predicted
+        iou = iou_matrix(observed, boxes)
+        iou[self.classes[:, None] != classes[None, :]] = 0.0
+
+        track_for_det = np.full(len(dets), -1, dtype=np.int64)
+        if iou.size:
+            order = np.dstack(np.unravel_index(np.argsort(-iou, axis=None), iou.shape))[0]
+            used_t, used_d = set(), set()
+            for t, d in order:
+                if iou[t, d] < self.iou_thresh:
+                    break
+                if t in used_t or d in used_d:
+                    continue
+                used_t.add(t); used_d.add(d)
+                track_for_det[d] = t
+
+        matched = track_for_det >= 0
+        new_ids = np.empty(len(dets), dtype=np.int64)
+        new_vel = np.zeros((len(dets), 4), dtype=np.float32)
+        if matched.any():
+            t_idx = track_for_det[matched]
+            new_ids[matched] = self.ids[t_idx]
+            measured = (boxes[matched] - observed[t_idx]) / gap
+            new_vel[matched] = 0.5 * self.velocity[t_idx] + 0.5 * measured
+        for i in np.flatnonzero(~matched):
+            new_ids[i] = next(self._ids)
+
+        # Unmatched tracks survive a few keyframes in case the detector blinked.
+        keep_old = np.ones(len(self.ids), dtype=bool)
+        keep_old[track_for_det[matched]] = False
+        self.missed = self.missed + 1
+        keep_old &= self.missed <= self.max_missed
+
+        self.ids = np.concatenate([new_ids, self.ids[keep_old]])
+        self.boxes = np.concatenate([boxes, self.boxes[keep_old]])
+        self.velocity = np.concatenate([new_vel, self.velocity[keep_old]])
+        self.classes = np.concatenate([classes, self.classes[keep_old]])
+        self.confs = np.concatenate([np.array([d["conf"] for d in dets], dtype=np.float32), self.confs[keep_old]])
+        self.trust = np.concatenate([np.ones(len(dets), dtype=np.float32), self.trust[keep_old] * self.decay])
+        self.missed = np.concatenate([np.zeros(len(dets), dtype=np.int64), self.missed[keep_old]])
+        self.names = [d["class_name"] for d in dets] + [n for n, k in zip(self.names, keep_old) if k]
+
+        return [{**d, "track_id": int(tid)} for d, tid in zip(dets, new_ids)]
+
+    def predict(self, steps: int = 1) -> List[Dict[str, Any]]:
+        """In-between frame: move tracks by their velocity and return propagated boxes."""
+        steps = max(1, steps)
+        self._since_key += steps
+        self.boxes = self.boxes + self.velocity * steps
+        self.boxes[:, 2:] = np.clip(self.boxes[:, 2:], 1.0, None)
+        self.trust = self.trust * (self.decay ** steps)
+        return self.detections()
+
+    def detections(self) -> List[Dict[str, Any]]:
+        live = np.flatnonzero(self.missed == 0)
+        return [
+            {
+                "class_id": int(self.classes[i]),
+                "class_name": self.names[i],
+                "conf": round(float(self.confs[i] * self.trust[i]), 4),
+                "box": {"x": float(self.boxes[i, 0]), "y": float(self.boxes[i, 1]),
+                        "w": float(self.boxes[i, 2]), "h": float(self.boxes[i, 3])},
+                "track_id": int(self.ids[i]),
+            }
+            for i in live
+        ]
+
+class KeyframePolicy:
+    """Decides per frame whether to run the detector or let the tracker propagate."""
+    def __init__(self, every: int = TRACK_KEYFRAME_EVERY, min_conf: float = TRACK_MIN_CONF):
+        self.every = max(1, every)
+        self.min_conf = min_conf
+        self._last_key_seq: Optional[int] = None
+
+    def is_keyframe(self, seq: int, tracker: IoUTracker) -> bool:
+        if self._last_key_seq is None or seq - self._last_key_seq >= self.every:
+            return True
+        return tracker.confidence() < self.min_conf
+
+    def mark(self, seq: int) -> None:
+        self._last_key_seq = seq
@@ -0,0 +1,172 @@
+# bench/bench_login.py
+"""
+Login throughput / tail latency against a running server, with a bystander
+probe showing how much a login burst slows an unrelated route.
+
+    uvicorn app.main:app --port 8000 &
+    python -m bench.bench_login --url http://127.0.0.1:8000 -c 32 -n 400
+    python -m bench.bench_login --probe-path /health --json out.json
+
+--local skips HTTP and times the bcrypt process pool directly, e.g. to pick
+BCRYPT_ROUNDS / BCRYPT_WORKERS for a machine:
+
+    python -m bench.bench_login --local --rounds 10 12 --workers 1 2 4
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import argparse, asyncio, json, sys, threading, time, urllib.error, urllib.request
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+def _summary(ms: List[float], wall_s: float) -> Dict[str, Any]:
+    a = np.asarray(ms, dtype=np.float64)
+    if not a.size:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(a, [50, 95, 99])
+    return {
+        "n": int(a.size),
+        "throughput_rps": round(a.size / wall_s, 2) if wall_s > 0 else None,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(a.max()), 2),
+    }
+
+# ---------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------
+def _post_json(url: str, body: Dict[str, Any], timeout: float) -> int:
+    req = urllib.request.Request(
+        url, data=json.dumps(body).encode(), headers={"Content-Type": "application/json"}, method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def _get(url: str, timeout: float) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def bench_http(url: str, name: str, password: str, concurrency: int, n: int,
+               probe_path: Optional[str], timeout: float) -> Dict[str, Any]:
+    status = _post_json(f"{url}/auth/signup", {"name": name, "password": password}, timeout)
+    if status not in (200, 409):
+        raise SystemExit(f"signup failed with HTTP {status}")
+
+    def probe_loop(out: List[float], stop: threading.Event):
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            _get(f"{url}{probe_path}", timeout)
+            out.append((time.perf_counter() - t0) * 1000.0)
+            time.sleep(0.02)
+
+    # Probe alone first, then during the login burst
+    idle: List[float] = []
+    busy: List[float] = []
+    if probe_path:
+        stop = threading.Event()
+        t = threading.Thread(target=probe_loop, args=(idle, stop), daemon=True)
+        t.start()
+        time.sleep(1.0)
+        stop.set()
+        t.join()
+
+    def one(_):
+        t0 = time.perf_counter()
+        code = _post_json(f"{url}/auth/login", {"name": name, "password": password}, timeout)
+        return code, (time.perf_counter() - t0) * 1000.0
+
+    stop = threading.Event()
+    prober = None
+    if probe_path:
+        prober = threading.Thread(target=probe_loop, args=(busy, stop), daemon=True)
+        prober.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n)))
+    wall = time.perf_counter() - t0
+    stop.set()
+    if prober:
+        prober.join()
+
+    codes: Dict[str, int] = {}
+    for code, _ in results:
+        codes[str(code)] = codes.get(str(code), 0) + 1
+    report = {
+        "concurrency": concurrency,
+        "login": _summary([ms for code, ms in results if code == 200], wall),
+        "status_codes": codes,
+    }
+    if probe_path:
+        report["probe"] = {"path": probe_path, "idle": _summary(idle, 1.0), "during_logins": _summary(busy, wall)}
+    return report
+
+# ---------------------------------------------------------
+# Local: the hash pool on its own
+# ---------------------------------------------------------
+def bench_local(rounds: List[int], workers: List[int], n: int) -> List[Dict[str, Any]]:
+    from app.hashing import HashPool
+
+    out = []
+    for r in rounds:
+        for w in workers:
+            pool = HashPool(workers=w, max_queue=n, rounds=r)
+            pool.warmup()
+
+            async def run():
+                h = await pool.hash("benchmark-password")
+                lat: List[float] = []
+
+                async def one():
+                    t0 = time.perf_counter()
+                    await pool.verify("benchmark-password", h)
+                    lat.append((time.perf_counter() - t0) * 1000.0)
+
+                t0 = time.perf_counter()
+                await asyncio.gather(*(one() for _ in range(n)))
+                return lat, time.perf_counter() - t0
+
+            lat, wall = asyncio.run(run())
+            pool.shutdown()
+            out.append({"rounds": r, "workers": w, "verify": _summary(lat, wall)})
+            print(f"rounds={r} workers={w}: {out[-1]['verify']}", file=sys.stderr)
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://127.0.0.1:8000")
+    ap.add_argument("--name", default="bench-login")
+    ap.add_argument("--password", default="bench-login-password")
+    ap.add_argument("-c", "--concurrency", type=int, default=16)
+    ap.add_argument("-n", "--requests", type=int, default=200)
+    ap.add_argument("--probe-path", default="/health", help="route timed alongside the logins ('' to skip)")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--local", action="store_true", help="time the bcrypt pool directly, no server")
+    ap.add_argument("--rounds", type=int, nargs="+", default=[12])
+    ap.add_argument("--workers", type=int, nargs="+", default=[2])
+    ap.add_argument("--json", type=Path, help="write the report here")
+    args = ap.parse_args()
+
+    if args.local:
+        report: Any = bench_local(args.rounds, args.workers, args.requests)
+    else:
+        report = bench_http(args.url.rstrip("/"), args.name, args.password, args.concurrency,
+                            args.requests, args.probe_path or None, args.timeout)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        args.json.write_text(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# bench/bench_pipeline.py
+"""
+Offline, stage-level benchmark of the /detect pipeline.
+
+Times each stage on its own for synthetic images of several sizes/formats
+(plus any sample images given with --samples):
+
+    upload_parse  multipart body -> file bytes (python-multipart, as FastAPI does)
+    decode        bytes -> RGB image (reduced JPEG draft decode, as /detect does)
+    preprocess    image -> model input
+    infer_fn      the model call only
+    postprocess   raw outputs -> detection dicts
+    annotate      drawing boxes on the full-resolution image
+    jpeg_encode   annotated image -> JPEG
+    base64        JPEG -> data URL
+
+Reports p50/p95/p99 per stage and end-to-end throughput as JSON, and compares
+against a stored baseline so regressions show up before deployment:
+
+    python -m bench.bench_pipeline --backends ssd yolo --out bench/results.json
+    python -m bench.bench_pipeline --save-baseline          # refresh bench/baseline.json
+    python -m bench.bench_pipeline --tolerance 0.15         # exit 1 if any p50 regresses >15%
+    python -m bench.bench_pipeline --backends ssd ssd-bucketed   # as-is shapes vs fixed buckets + XLA
+
+`infer_fn_spread` in the report is max/min infer_fn p50 across the inputs,
+i.e. how much model time depends on the uploaded resolution.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Tuple
+import argparse, base64, io, json, sys, time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.backends import create_detector                         # noqa: E402
+from app.postprocess import draw_detections, encode_jpeg, format_detections  # noqa: E402
+from app.preprocess import decode_for_model, decode_full, to_uint8_array      # noqa: E402
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE = BENCH_DIR / "baseline.json"
+
+SIZES = [(640, 480), (1280, 720), (1920, 1080), (4032, 3024)]
+FORMATS = ["JPEG", "PNG", "WEBP"]
+CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+# ---------------------------------------------------------
+# Inputs
+# ---------------------------------------------------------
+def synthetic_image(size: Tuple[int, int], seed: int = 0) -> Image.Image:
+    """Smooth gradient + noise + a few filled shapes: compresses like a photo, not like flat color."""
+    rng = np.random.default_rng(seed)
+    W, H = size
+    gx = np.linspace(0, 255, W, dtype=np.float32)[None, :, None]
+    gy = np.linspace(0, 255, H, dtype=np.float32)[:, None, None]
+    base = (gx * np.array([0.6, 0.3, 0.1]) + gy * np.array([0.1, 0.4, 0.6])).astype(np.float32)
+    noise = rng.normal(0, 12, size=(H, W, 3)).astype(np.float32)
+    img = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, W - 40)), int(rng.integers(0, H - 40))
+        x1, y1 = x0 + int(rng.integers(20, max(21, W // 4))), y0 + int(rng.integers(20, max(21, H // 4)))
+        draw.rectangle([x0, y0, x1, y1], fill=tuple(int(c) for c in rng.integers(0, 255, 3)))
+    return img
+
+def encode(img: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, fmt, **({"quality": 90} if fmt in ("JPEG", "WEBP") else {}))
+    return buf.getvalue()
+
+def build_inputs(samples: Path | None) -> List[Tuple[str, str, bytes]]:
+    """[(label, content_type, raw_bytes)]"""
+    inputs = []
+    for size in SIZES:
+        img = synthetic_image(size, seed=size[0])
+        for fmt in FORMATS:
+            inputs.append((f"synthetic_{size[0]}x{size[1]}_{fmt.lower()}", CONTENT_TYPES[fmt], encode(img, fmt)))
+    if samples:
+        for p in sorted(samples.iterdir()):
+            ext = p.suffix.lower()
+            ctype = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png", ".webp": "image/webp"}.get(ext)
+            if ctype:
+                inputs.append((f"sample_{p.name}", ctype, p.read_bytes()))
+    return inputs
+
+def multipart_body(raw: bytes, content_type: str, boundary: str = "benchboundary") -> bytes:
+    return (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="upload"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + raw + f"\r\n--{boundary}--\r\n".encode()
+
+def parse_multipart(body: bytes, boundary: str = "benchboundary") -> bytes:
+    from multipart.multipart import MultipartParser
+    chunks: List[bytes] = []
+    parser = MultipartParser(boundary, {"on_part_data": lambda data, start, end: chunks.append(data[start:end])})
+    parser.write(body)
+    parser.finalize()
+    return b"".join(chunks)
+
+# ---------------------------------------------------------
+# Per-backend stage adapters: preprocess / infer_fn / postprocess
+# ---------------------------------------------------------
+def ssd_stages(det) -> Dict[str, Callable]:
+    # _call() includes pulling the outputs back to NumPy, which is where TF blocks anyway
+    return {
+        "preprocess": lambda pil: det._prepare(pil),
+        "infer_fn": lambda x: det._call(*x),
+        "postprocess": lambda out, pil, orig_size: det._postprocess(*out, *orig_size),
+    }
+
+def _ssd_bucketed():
+    # Same model, letterboxed into fixed buckets and XLA-compiled (SSD_BUCKETS / SSD_XLA)
+    from app.detector_ssd import SSDDetector, SSD_BUCKETS
+    from app.backends import SCORE_THRESH
+    return SSDDetector(score_thresh=SCORE_THRESH, buckets=SSD_BUCKETS or [320, 480, 640], xla=True)
+
+def tflite_stages(det) -> Dict[str, Callable]:
+    def pre(pil):
+        return to_uint8_array(pil.resize((det.input_w, det.input_h), Image.BILINEAR))
+    return {
+        "preprocess": pre,
+        "infer_fn": lambda x: det.detect_arrays(x),
+        "postprocess": lambda out, pil, orig_size: format_detections(*out, *orig_size, labels=det.labels),
+    }
+
+def yolo_stages(det) -> Dict[str, Callable]:
+    def post(results, pil, orig_size):
+        return det._postprocess(results, orig_size[0] / pil.width, orig_size[1] / pil.height)
+    return {
+        "preprocess": lambda pil: det._pil_to_nd(pil),
+        "infer_fn": lambda x: det.model.predict(x, conf=det.conf, iou=det.iou, imgsz=640, verbose=False),
+        "postprocess": post,
+    }
+
+def yolo_onnx_stages(det) -> Dict[str, Callable]:
+    from app.detector_onnx import letterbox
+
+    def pre(pil):
+        x, scale, pad = letterbox(pil, det.input_size)
+        return x, scale, pad, pil.size
+
+    def post(out, pil, orig_size):
+        head, (_, scale, pad, size) = out
+        return format_detections(*det._decode(head, scale, pad, *size), *orig_size, labels=det.labels)
+    return {
+        "preprocess": pre,
+        "infer_fn": lambda p: (det.session.run(None, {det.input_name: p[0]})[0][0], p),
+        "postprocess": post,
+    }
+
+STAGE_ADAPTERS = {"ssd": ssd_stages, "ssd-bucketed": ssd_stages, "tflite": tflite_stages, "yolo": yolo_stages,
+                  "yolo-onnx": yolo_onnx_stages}
+# Bench-only variants that aren't DETECTOR_BACKEND names
+BENCH_DETECTORS: Dict[str, Callable] = {"ssd-bucketed": _ssd_bucketed}
+
+# ---------------------------------------------------------
+# Timing
+# ---------------------------------------------------------
+def _pct(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    pick = lambda p: s[min(len(s) - 1, int(len(s) * p / 100))]  # noqa: E731
+    return {"p50": round(pick(50), 3), "p95": round(pick(95), 3), "p99": round(pick(99), 3),
+            "mean": round(sum(s) / len(s), 3)}
+
+def run_one(stages: Dict[str, Callable], ctype: str, raw: bytes, iters: int, warmup: int) -> Dict[str, Any]:
+    body = multipart_body(raw, ctype)
+    times: Dict[str, List[float]] = {k: [] for k in
+        ["upload_parse", "decode", "preprocess", "infer_fn", "postprocess", "annotate", "jpeg_encode", "base64", "total"]}
+
+    for i in range(warmup + iters):
+        t = {}
+        c0 = time.perf_counter()
+        data = parse_multipart(body)
+        c1 = time.perf_counter(); t["upload_parse"] = c1 - c0
+        pil, orig_size = decode_for_model(data)
+        c2 = time.perf_counter(); t["decode"] = c2 - c1
+        x = stages["preprocess"](pil)
+        c3 = time.perf_counter(); t["preprocess"] = c3 - c2
+        out = stages["infer_fn"](x)
+        c4 = time.perf_counter(); t["infer_fn"] = c4 - c3
+        dets = stages["postprocess"](out, pil, orig_size)
+        c5 = time.perf_counter(); t["postprocess"] = c5 - c4
+        canvas = draw_detections(decode_full(data), dets)
+        c6 = time.perf_counter(); t["annotate"] = c6 - c5
+        jpeg = encode_jpeg(canvas)
+        c7 = time.perf_counter(); t["jpeg_encode"] = c7 - c6
+        "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("utf-8")
+        c8 = time.perf_counter(); t["base64"] = c8 - c7
+        t["total"] = c8 - c0
+        if i >= warmup:
+            for k, v in t.items():
+                times[k].append(v * 1000.0)
+
+    result = {k: _pct(v) for k, v in times.items()}
+    result["throughput_rps"] = round(1000.0 / result["total"]["mean"], 3) if result["total"]["mean"] else 0.0
+    result["upload_bytes"] = len(raw)
+    return result
+
+def spread(images: Dict[str, Any], stage: str = "infer_fn") -> Dict[str, float]:
+    """How much a stage's p50 moves across input resolutions (1.0 = perfectly stable)."""
+    p50 = [r[stage]["p50"] for r in images.values()]
+    lo, hi = min(p50), max(p50)
+    return {"min_p50": lo, "max_p50": hi, "spread": round(hi / lo, 3) if lo else 0.0}
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """p50 regressions beyond tolerance, as readable lines."""
+    problems = []
+    for backend, images in current.get("results", {}).items():
+        for label, stages in images.items():
+            base = baseline.get("results", {}).get(backend, {}).get(label)
+            if not base:
+                continue
+            for stage, stats in stages.items():
+                if not isinstance(stats, dict) or stage not in base:
+                    continue
+                old, new = base[stage]["p50"], stats["p50"]
+                if old > 0.05 and new > old * (1 + tolerance):
+                    problems.append(f"{backend}/{label}/{stage}: p50 {old:.3f} -> {new:.3f} ms (+{(new / old - 1) * 100:.0f}%)")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backends", nargs="+", default=["ssd"], choices=sorted(STAGE_ADAPTERS))
+    ap.add_argument("--samples", type=Path, help="directory of extra sample images")
+    ap.add_argument("--iters", type=int, default=20)
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--out", type=Path, help="write the JSON report here")
+    ap.add_argument("--baseline", type=Path, default=BASELINE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.10)
+    args = ap.parse_args()
+
+    inputs = build_inputs(args.samples)
+    report: Dict[str, Any] = {"iters": args.iters, "results": {}}
+    for backend in args.backends:
+        det = BENCH_DETECTORS[backend]() if backend in BENCH_DETECTORS else create_detector(backend)
+        stages = STAGE_ADAPTERS[backend](det)
+        report["results"][backend] = {}
+        for label, ctype, raw in inputs:
+            report["results"][backend][label] = run_one(stages, ctype, raw, args.iters, args.warmup)
+            print(f"{backend:7s} {label:32s} total p50 {report['results'][backend][label]['total']['p50']:9.2f} ms",
+                  file=sys.stderr)
+        report.setdefault("infer_fn_spread", {})[backend] = spread(report["results"][backend])
+        if hasattr(det, "describe"):
+            report.setdefault("config", {})[backend] = det.describe()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    else:
+        print(text)
+
+    if args.save_baseline:
+        args.baseline.write_text(text + "\n")
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+        return
+    if args.baseline.exists():
+        problems = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for line in problems:
+            print("REGRESSION " + line, file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench/bench_tracking.py
+"""
+Compares detect-every-frame against keyframe detection + tracking on a frame
+sequence (a directory of JPEGs, sorted by name, e.g. extracted with
+`ffmpeg -i clip.mp4 frames/%05d.jpg`).
+
+Reports CPU ms per frame for both modes and how closely the tracked output
+matches the every-frame detections (same-class IoU >= 0.5 recall/precision).
+
+    python -m bench.bench_tracking frames/ --every 5 --json out.json
+"""
+from __future__ import annotations
+import argparse, json, os, sys, time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.backends import get_detector, lease_detector  # noqa: E402
+from app.streaming import StreamSession          # noqa: E402
+from app.tracker import KeyframePolicy, iou_matrix  # noqa: E402
+
+def _boxes(dets):
+    return np.array([[d["box"]["x"], d["box"]["y"], d["box"]["w"], d["box"]["h"]] for d in dets],
+                    dtype=np.float32).reshape(-1, 4)
+
+def _agreement(ref, out, thresh=0.5):
+    """Greedy same-class matching; returns (matched, len(ref), len(out))."""
+    if not ref or not out:
+        return 0, len(ref), len(out)
+    iou = iou_matrix(_boxes(ref), _boxes(out))
+    rc = np.array([d["class_id"] for d in ref])
+    oc = np.array([d["class_id"] for d in out])
+    iou[rc[:, None] != oc[None, :]] = 0.0
+    matched = 0
+    while iou.size and iou.max() >= thresh:
+        r, o = np.unravel_index(iou.argmax(), iou.shape)
+        iou[r, :] = 0.0
+        iou[:, o] = 0.0
+        matched += 1
+    return matched, len(ref), len(out)
+
+@contextmanager
+def _serving():
+    with lease_detector() as (det, info):
+        yield det, info.version
+
+def _run(frames, track: bool, every: int):
+    session = StreamSession(_serving, motion_thresh=0.0, track=track)
+    if track:
+        session.policy = KeyframePolicy(every=every)
+    outputs = []
+    t0 = time.process_time()
+    for seq, frame in enumerate(frames, start=1):
+        outputs.append(session.process(seq, frame)["detections"])
+    cpu_ms = (time.process_time() - t0) * 1000.0
+    return outputs, cpu_ms, session.stats()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("frames", help="directory of .jpg frames")
+    ap.add_argument("--every", type=int, default=5, help="keyframe interval")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--json", help="write the report here as well")
+    args = ap.parse_args()
+
+    paths = sorted(p for p in Path(args.frames).iterdir() if p.suffix.lower() in {".jpg", ".jpeg"})
+    if args.limit:
+        paths = paths[: args.limit]
+    if not paths:
+        sys.exit(f"no JPEG frames in {args.frames}")
+    frames = [p.read_bytes() for p in paths]
+
+    get_detector()  # load + warm up outside the timed loops
+    ref, ref_cpu, _ = _run(frames, track=False, every=1)
+    out, trk_cpu, trk_stats = _run(frames, track=True, every=args.every)
+
+    m = r = o = 0
+    for a, b in zip(ref, out):
+        dm, dr, do = _agreement(a, b)
+        m, r, o = m + dm, r + dr, o + do
+
+    n = len(frames)
+    report = {
+        "frames": n,
+        "keyframe_every": args.every,
+        "every_frame_cpu_ms_per_frame": round(ref_cpu / n, 3),
+        "tracking_cpu_ms_per_frame": round(trk_cpu / n, 3),
+        "cpu_saved_ratio": round(1.0 - trk_cpu / ref_cpu, 3) if ref_cpu else 0.0,
+        "recall_vs_every_frame": round(m / r, 4) if r else 1.0,
+        "precision_vs_every_frame": round(m / o, 4) if o else 1.0,
+        "session": trk_stats,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text + os.linesep)
+
+if __name__ == "__main__":
+    main()
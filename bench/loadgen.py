@@ -0,0 +1,465 @@
+# bench/loadgen.py
+"""
+End-to-end load generator and capacity report for the API.
+
+Starts the real `app.main:app` under uvicorn (own process, SQLite database
+in a temp dir, stub detector unless --detector says otherwise), replays a
+weighted mix of /auth/signup, /auth/login, /me and /detect, and steps the
+open-loop arrival rate up until routes saturate:
+
+    python -m bench.loadgen --rates 10 20 40 80 160 --duration 20 --mix mixed
+    python -m bench.loadgen --mix detect --image-sizes 640x480 1920x1080 --detector ssd
+    python -m bench.loadgen --url http://127.0.0.1:8000 --rates 50   # an already running server
+    python -m bench.loadgen --concurrency 32 --duration 30            # closed loop instead
+
+Arrivals are Poisson at the step's rate and never wait for earlier requests
+(open loop), so queueing shows up as latency rather than as a slower client;
+--max-inflight bounds outstanding requests and anything beyond it is counted
+as `dropped`. A route is saturated at the first rate where its p99 exceeds
+--slo-p99-ms, its error rate exceeds --max-error-rate, or it completes less
+than 90% of what was offered to it.
+
+The report (JSON with --out, Markdown with --markdown) has per-step, per-route
+throughput, p50/p99 and error rates plus each route's saturation point, so a
+server change can be judged against the same capacity curve.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import argparse, asyncio, itertools, json, os, random, subprocess, sys, tempfile, time, urllib.error, urllib.request
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bench.bench_pipeline import encode, multipart_body, synthetic_image  # noqa: E402
+
+ROUTES = ("signup", "login", "me", "detect")
+MIXES: Dict[str, Dict[str, float]] = {
+    "mixed": {"signup": 2, "login": 8, "me": 60, "detect": 30},
+    "auth": {"signup": 10, "login": 60, "me": 30, "detect": 0},
+    "detect": {"signup": 0, "login": 0, "me": 10, "detect": 90},
+    "read": {"signup": 0, "login": 0, "me": 100, "detect": 0},
+}
+PASSWORD = "loadgen-password"
+BOUNDARY = "benchboundary"
+
+# ---------------------------------------------------------
+# Minimal keep-alive HTTP/1.1 client (stdlib only)
+# ---------------------------------------------------------
+class _Conn:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader, self.writer = reader, writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+class HttpClient:
+    def __init__(self, url: str, timeout: float):
+        rest = url.split("://", 1)[-1].rstrip("/")
+        host, _, port = rest.partition(":")
+        self.host, self.port = host, int(port or 80)
+        self.timeout = timeout
+        self._idle: List[_Conn] = []
+
+    async def _read_response(self, conn: _Conn) -> Tuple[int, bytes, bool]:
+        r = conn.reader
+        status_line = await r.readline()
+        if not status_line:
+            raise ConnectionError("server closed the connection")
+        status = int(status_line.split()[1])
+        headers: Dict[str, str] = {}
+        while True:
+            line = await r.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            k, _, v = line.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            body = await r.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            parts = []
+            while True:
+                size = int((await r.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await r.readline()
+                    break
+                parts.append(await r.readexactly(size))
+                await r.readline()
+            body = b"".join(parts)
+        else:
+            body, keep_alive = await r.read(), False
+        return status, body, keep_alive
+
+    async def request(self, method: str, path: str, body: bytes = b"",
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes]:
+        conn = self._idle.pop() if self._idle else _Conn(*await asyncio.open_connection(self.host, self.port))
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        try:
+            conn.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await conn.writer.drain()
+            status, data, keep_alive = await asyncio.wait_for(self._read_response(conn), self.timeout)
+        except BaseException:
+            conn.close()  # half-read response: never reuse
+            raise
+        if keep_alive:
+            self._idle.append(conn)
+        else:
+            conn.close()
+        return status, data
+
+    async def json(self, method: str, path: str, payload: Any = None,
+                   token: Optional[str] = None) -> Tuple[int, Any]:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        status, data = await self.request(method, path, json.dumps(payload).encode() if payload is not None else b"",
+                                          headers)
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    def close(self) -> None:
+        for c in self._idle:
+            c.close()
+        self._idle.clear()
+
+# ---------------------------------------------------------
+# Server under test
+# ---------------------------------------------------------
+def start_server(port: int, workdir: Path, detector: str, workers: int, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite+aiosqlite:///{workdir / 'loadgen.db'}",
+        "DETECTOR_BACKEND": detector,
+        "ACCOUNT_STORE_DIR": "",
+    })
+    if workers > 1:
+        (workdir / "prom").mkdir(exist_ok=True)
+        env["PROMETHEUS_MULTIPROC_DIR"] = str(workdir / "prom")
+    env.update(extra_env)
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=str(ROOT), env=env)
+
+def wait_ready(url: str, timeout: float, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"server exited with code {proc.returncode} during startup")
+        try:
+            with urllib.request.urlopen(f"{url}/ready", timeout=2) as r:
+                if r.status == 200:
+                    return
+        except (urllib.error.URLError, OSError):
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"server at {url} not ready after {timeout:.0f}s")
+
+# ---------------------------------------------------------
+# Traffic
+# ---------------------------------------------------------
+class Traffic:
+    """Builds and sends one request per route; keeps a pool of known users and tokens."""
+    def __init__(self, client: HttpClient, images: List[bytes], detect_query: str, seed: int):
+        self.client = client
+        self.images = images
+        self.detect_path = "/detect" + (f"?{detect_query}" if detect_query else "")
+        self.rng = random.Random(seed)
+        self.users: List[str] = []
+        self.tokens: List[str] = []
+        self._names = itertools.count()
+        self._run = f"lg{int(time.time())}{os.getpid()}"
+
+    def _new_name(self) -> str:
+        return f"{self._run}_{next(self._names)}"
+
+    async def seed_users(self, n: int, concurrency: int = 8) -> None:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one():
+            async with sem:
+                await self.send("signup")
+        await asyncio.gather(*(one() for _ in range(n)))
+        if not self.tokens:
+            raise SystemExit("could not create any users; is the database reachable?")
+
+    async def send(self, route: str) -> int:
+        c = self.client
+        if route == "signup":
+            name = self._new_name()
+            status, body = await c.json("POST", "/auth/signup", {"name": name, "password": PASSWORD})
+            if status == 200:
+                self.users.append(name)
+                self.tokens.append(body["token"])
+            return status
+        if route == "login":
+            status, body = await c.json("POST", "/auth/login",
+                                        {"name": self.rng.choice(self.users), "password": PASSWORD})
+            if status == 200:
+                self.tokens.append(body["token"])
+            return status
+        if route == "me":
+            status, _ = await c.json("GET", "/me", token=self.rng.choice(self.tokens))
+            return status
+        if route == "detect":
+            body = multipart_body(self.rng.choice(self.images), "image/jpeg", BOUNDARY)
+            status, _ = await c.request("POST", self.detect_path, body,
+                                        {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+            return status
+        raise ValueError(route)
+
+class _Recorder:
+    def __init__(self):
+        self.lat: Dict[str, List[float]] = {r: [] for r in ROUTES}
+        self.status: Dict[str, Dict[str, int]] = {r: {} for r in ROUTES}
+        self.offered: Dict[str, int] = {r: 0 for r in ROUTES}
+        self.dropped: Dict[str, int] = {r: 0 for r in ROUTES}
+
+    def record(self, route: str, status: str, ms: float) -> None:
+        self.lat[route].append(ms)
+        self.status[route][status] = self.status[route].get(status, 0) + 1
+
+async def _timed(traffic: Traffic, route: str, rec: _Recorder) -> None:
+    t0 = time.perf_counter()
+    try:
+        status = str(await traffic.send(route))
+    except asyncio.TimeoutError:
+        status = "timeout"
+    except (OSError, ConnectionError, asyncio.IncompleteReadError):
+        status = "conn_error"
+    rec.record(route, status, (time.perf_counter() - t0) * 1000.0)
+
+def _pick(rng: random.Random, mix: Dict[str, float]) -> str:
+    routes = [r for r in ROUTES if mix.get(r)]
+    return rng.choices(routes, weights=[mix[r] for r in routes])[0]
+
+async def open_loop(traffic: Traffic, mix: Dict[str, float], rate: float, duration: float,
+                    max_inflight: int) -> Tuple[_Recorder, float]:
+    """Poisson arrivals at `rate`/s for `duration` s; one connection per in-flight request."""
+    rec = _Recorder()
+    rng = random.Random(1)
+    pending: set = set()
+    t_start = time.perf_counter()
+    next_at = t_start
+    while True:
+        next_at += rng.expovariate(rate)
+        if next_at - t_start >= duration:
+            break
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        route = _pick(rng, mix)
+        rec.offered[route] += 1
+        if len(pending) >= max_inflight:
+            rec.dropped[route] += 1
+            continue
+        task = asyncio.ensure_future(_timed(traffic, route, rec))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.wait(pending)
+    return rec, time.perf_counter() - t_start
+
+async def closed_loop(traffic: Traffic, mix: Dict[str, float], concurrency: int,
+                      duration: float) -> Tuple[_Recorder, float]:
+    """`concurrency` users each sending their next request as soon as the last one returns."""
+    rec = _Recorder()
+    t_start = time.perf_counter()
+
+    async def user(i: int):
+        rng = random.Random(i)
+        while time.perf_counter() - t_start < duration:
+            route = _pick(rng, mix)
+            rec.offered[route] += 1
+            await _timed(traffic, route, rec)
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    return rec, time.perf_counter() - t_start
+
+# ---------------------------------------------------------
+# Report
+# ---------------------------------------------------------
+def summarize(rec: _Recorder, wall_s: float) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for route in ROUTES:
+        if not rec.offered[route]:
+            continue
+        lat = np.asarray(rec.lat[route], dtype=np.float64)
+        statuses = rec.status[route]
+        ok = sum(n for s, n in statuses.items() if s.startswith("2"))
+        done = int(lat.size)
+        p50, p99 = np.percentile(lat, [50, 99]) if done else (0.0, 0.0)
+        out[route] = {
+            "offered": rec.offered[route],
+            "completed": done,
+            "dropped": rec.dropped[route],
+            "ok": ok,
+            "error_rate": round(1 - ok / done, 4) if done else 1.0,
+            "throughput_rps": round(ok / wall_s, 2) if wall_s > 0 else 0.0,
+            "p50_ms": round(float(p50), 2),
+            "p99_ms": round(float(p99), 2),
+            "status": dict(sorted(statuses.items())),
+        }
+    return out
+
+def saturation(steps: List[Dict[str, Any]], slo_p99_ms: float, max_error_rate: float) -> Dict[str, Any]:
+    """Per route: the highest rate that met the SLO and the first one that didn't."""
+    sat: Dict[str, Any] = {}
+    for route in ROUTES:
+        last_ok, first_bad, reason = None, None, None
+        for step in steps:
+            r = step["routes"].get(route)
+            if not r:
+                continue
+            if r["p99_ms"] > slo_p99_ms:
+                reason = f"p99 {r['p99_ms']} ms > {slo_p99_ms}"
+            elif r["error_rate"] > max_error_rate:
+                reason = f"error rate {r['error_rate']:.2%} > {max_error_rate:.2%}"
+            elif r["ok"] < 0.9 * r["offered"]:
+                reason = f"completed {r['ok']}/{r['offered']} offered"
+            if reason:
+                first_bad = step["load"]
+                break
+            last_ok = {"load": step["load"], "throughput_rps": r["throughput_rps"]}
+        if last_ok or first_bad:
+            sat[route] = {"max_ok": last_ok, "saturated_at": first_bad, "reason": reason}
+    return sat
+
+def markdown(report: Dict[str, Any]) -> str:
+    cfg = report["config"]
+    lines = [
+        f"# Capacity report ({cfg['mode']} loop, mix `{cfg['mix_name']}`, detector `{cfg['detector']}`)",
+        "",
+        f"SLO: p99 <= {cfg['slo_p99_ms']} ms, errors <= {cfg['max_error_rate']:.1%}; "
+        f"{cfg['duration_s']} s per step; images {', '.join(cfg['image_sizes']) or '-'}",
+        "",
+        "| load | route | offered | ok | dropped | err % | rps | p50 ms | p99 ms |",
+        "|---:|---|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for step in report["steps"]:
+        for route, r in step["routes"].items():
+            lines.append(f"| {step['load']} | {route} | {r['offered']} | {r['ok']} | {r['dropped']} | "
+                         f"{r['error_rate'] * 100:.1f} | {r['throughput_rps']} | {r['p50_ms']} | {r['p99_ms']} |")
+    lines += ["", "## Saturation", "", "| route | max load within SLO | rps there | saturated at | why |",
+              "|---|---:|---:|---:|---|"]
+    for route, s in report["saturation"].items():
+        ok = s["max_ok"] or {}
+        lines.append(f"| {route} | {ok.get('load', '-')} | {ok.get('throughput_rps', '-')} | "
+                     f"{s['saturated_at'] if s['saturated_at'] is not None else '-'} | {s['reason'] or '-'} |")
+    return "\n".join(lines) + "\n"
+
+# ---------------------------------------------------------
+# CLI
+# ---------------------------------------------------------
+def _parse_mix(spec: str) -> Dict[str, float]:
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = {}
+    for part in spec.split(","):
+        route, _, w = part.partition("=")
+        if route not in ROUTES:
+            raise SystemExit(f"unknown route {route!r} in --mix; use {ROUTES} or one of {sorted(MIXES)}")
+        mix[route] = float(w)
+    return mix
+
+def _images(sizes: List[str]) -> List[bytes]:
+    out = []
+    for spec in sizes:
+        w, _, h = spec.partition("x")
+        out.append(encode(synthetic_image((int(w), int(h)), seed=int(w)), "JPEG"))
+    return out
+
+async def run(args) -> Dict[str, Any]:
+    mix = _parse_mix(args.mix)
+    images = _images(args.image_sizes)
+    if mix.get("detect") and not images:
+        raise SystemExit("the mix has /detect traffic but --image-sizes is empty")
+
+    # One event loop, so concurrent requests simply take separate idle connections
+    client = HttpClient(args.url, args.timeout)
+    traffic = Traffic(client, images, args.detect_query, seed=0)
+    await traffic.seed_users(args.users)
+
+    steps = []
+    loads = [args.concurrency] if args.concurrency else args.rates
+    for load in loads:
+        if args.concurrency:
+            rec, wall = await closed_loop(traffic, mix, load, args.duration)
+        else:
+            rec, wall = await open_loop(traffic, mix, load, args.duration, args.max_inflight)
+        client.close()  # fresh connections for the next step
+        routes = summarize(rec, wall)
+        steps.append({"load": load, "wall_s": round(wall, 2), "routes": routes})
+        print(f"load {load:>7}: " + "  ".join(
+            f"{r} {s['throughput_rps']}/s p99 {s['p99_ms']}ms err {s['error_rate']:.1%}" for r, s in routes.items()
+        ), file=sys.stderr)
+        if args.cooldown:
+            await asyncio.sleep(args.cooldown)
+
+    return {
+        "config": {
+            "url": args.url, "mode": "closed" if args.concurrency else "open", "mix_name": args.mix, "mix": mix,
+            "detector": args.detector if not args.external else "external", "workers": args.workers,
+            "duration_s": args.duration, "image_sizes": args.image_sizes, "detect_query": args.detect_query,
+            "users": args.users, "slo_p99_ms": args.slo_p99_ms, "max_error_rate": args.max_error_rate,
+        },
+        "steps": steps,
+        "saturation": saturation(steps, args.slo_p99_ms, args.max_error_rate),
+    }
+
+def main():
+    ap = argparse.ArgumentParser(description="BlindSpot API load generator / capacity report")
+    ap.add_argument("--url", help="target an already running server instead of starting one")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers for the spawned server")
+    ap.add_argument("--detector", default="stub", help="DETECTOR_BACKEND for the spawned server")
+    ap.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="extra env for the spawned server")
+    ap.add_argument("--mix", default="mixed", help=f"one of {sorted(MIXES)} or e.g. login=10,me=70,detect=20")
+    ap.add_argument("--rates", nargs="+", type=float, default=[10, 20, 40, 80, 160], help="open-loop req/s steps")
+    ap.add_argument("--concurrency", type=int, default=0, help="closed loop with this many users instead")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per step")
+    ap.add_argument("--cooldown", type=float, default=2.0, help="pause between steps")
+    ap.add_argument("--max-inflight", type=int, default=512)
+    ap.add_argument("--users", type=int, default=20, help="accounts created before the run")
+    ap.add_argument("--image-sizes", nargs="*", default=["640x480", "1280x720", "1920x1080"])
+    ap.add_argument("--detect-query", default="", help="query string for /detect, e.g. mode=fast")
+    ap.add_argument("--timeout", type=float, default=30.0)
+    ap.add_argument("--startup-timeout", type=float, default=180.0)
+    ap.add_argument("--slo-p99-ms", type=float, default=500.0)
+    ap.add_argument("--max-error-rate", type=float, default=0.01)
+    ap.add_argument("--out", type=Path, help="write the JSON report here")
+    ap.add_argument("--markdown", type=Path, help="write a Markdown report here")
+    args = ap.parse_args()
+
+    args.external = bool(args.url)
+    proc = None
+    with tempfile.TemporaryDirectory(prefix="loadgen-") as tmp:
+        if not args.external:
+            args.url = f"http://127.0.0.1:{args.port}"
+            extra = dict(kv.split("=", 1) for kv in args.env)
+            proc = start_server(args.port, Path(tmp), args.detector, args.workers, extra)
+        try:
+            wait_ready(args.url, args.startup_timeout, proc)
+            report = asyncio.run(run(args))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n")
+    if args.markdown:
+        args.markdown.write_text(markdown(report))
+    if not args.out and not args.markdown:
+        print(text)
+
+if __name__ == "__main__":
+    main()
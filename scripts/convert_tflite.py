@@ -0,0 +1,130 @@
+# scripts/convert_tflite.py
+"""
+Converts the bundled SSD MobileNet v2 FPNLite 640x640 SavedModel to TFLite.
+
+    python scripts/convert_tflite.py --quant fp16
+    python scripts/convert_tflite.py --quant int8 --calib-dir samples/ --calib-count 200
+
+The OD API export has a dynamic [1,H,W,3] input; it is re-traced at a fixed
+[1,640,640,3] uint8 shape first so TFLite can plan static buffers.
+
+Conversion is builtins-only by default. The pre/post-processing ops in the
+OD API graph (resize, NMS) are not all TFLite builtins, so that usually fails.
+The recommended route is to re-export from the checkpoint with the OD API's
+`export_tflite_graph_tf2.py` and convert that SavedModel:
+
+    python scripts/convert_tflite.py --saved-model exported/saved_model --quant fp16
+
+Its input already has a static shape (float, [-1, 1]), so it is converted
+as-is, and its NMS becomes the TFLite_Detection_PostProcess custom op that
+`tflite_runtime` ships. `--allow-flex` falls back to SELECT_TF_OPS instead, but
+a Flex model needs full `tf.lite` (TensorFlow itself) to run, which gives up
+most of the memory saving.
+"""
+from __future__ import annotations
+import argparse, sys, tempfile
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+ROOT = Path(__file__).resolve().parents[1]
+MODEL_DIR = ROOT / "app" / "models" / "ssd_mobilenet_v2_fpnlite_640x640_coco17_tpu-8" / "saved_model"
+INPUT_SIZE = 640
+INPUT_MEAN = INPUT_STD = 127.5  # float inputs of export_tflite_graph_tf2.py models are in [-1, 1]
+
+def _input_spec(saved_model: Path) -> tf.TensorSpec:
+    fn = tf.saved_model.load(str(saved_model)).signatures["serving_default"]
+    return next(iter(fn.structured_input_signature[1].values()))
+
+def _fixed_shape_saved_model(src: Path, dst: Path) -> None:
+    model = tf.saved_model.load(str(src))
+    fn = model.signatures["serving_default"]
+    input_name = next(iter(fn.structured_input_signature[1]))
+
+    class Fixed(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        @tf.function(input_signature=[tf.TensorSpec([1, INPUT_SIZE, INPUT_SIZE, 3], tf.uint8, name=input_name)])
+        def serve(self, x):
+            return fn(**{input_name: x})
+
+    m = Fixed()
+    tf.saved_model.save(m, str(dst), signatures={"serving_default": m.serve})
+
+def _representative(calib_dir: Path, count: int, spec: tf.TensorSpec):
+    paths = sorted(p for p in calib_dir.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"})[:count]
+    if not paths:
+        sys.exit(f"no calibration images in {calib_dir}")
+    _, h, w, _ = spec.shape
+    def gen():
+        for p in paths:
+            im = Image.open(p).convert("RGB").resize((w, h), Image.BILINEAR)
+            x = np.asarray(im, dtype=np.uint8)[np.newaxis, ...]
+            if spec.dtype.is_floating:
+                x = ((x.astype(np.float32) - INPUT_MEAN) / INPUT_STD).astype(spec.dtype.as_numpy_dtype)
+            yield [x]
+    return gen
+
+def _convert(saved_model: Path, args, flex: bool, custom_ops: bool = False) -> bytes:
+    conv = tf.lite.TFLiteConverter.from_saved_model(str(saved_model), signature_keys=["serving_default"])
+    conv.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS]
+    # TFLite_Detection_PostProcess is a custom op, but one every TFLite runtime registers
+    conv.allow_custom_ops = custom_ops
+    if flex:
+        conv.target_spec.supported_ops.append(tf.lite.OpsSet.SELECT_TF_OPS)
+    if args.quant != "none":
+        conv.optimizations = [tf.lite.Optimize.DEFAULT]
+    if args.quant == "fp16":
+        conv.target_spec.supported_types = [tf.float16]
+    elif args.quant == "int8":
+        conv.representative_dataset = _representative(args.calib_dir, args.calib_count, _input_spec(saved_model))
+    return conv.convert()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--saved-model", type=Path, default=MODEL_DIR)
+    ap.add_argument("--quant", choices=["fp16", "int8", "dynamic", "none"], default="fp16")
+    ap.add_argument("--calib-dir", type=Path, help="images for full int8 calibration")
+    ap.add_argument("--calib-count", type=int, default=100)
+    ap.add_argument("--out", type=Path)
+    ap.add_argument("--allow-flex", action="store_true",
+                    help="fall back to SELECT_TF_OPS (Flex) if builtins-only conversion fails")
+    args = ap.parse_args()
+    if args.quant == "int8" and not args.calib_dir:
+        sys.exit("--quant int8 needs --calib-dir (use --quant dynamic for weight-only int8)")
+
+    out = args.out or ROOT / "app" / "models" / f"ssd_mobilenet_v2_fpnlite_640x640_{args.quant}.tflite"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A static input shape means an export_tflite_graph_tf2.py export: convert it as-is
+        postprocess = _input_spec(args.saved_model).shape.is_fully_defined()
+        fixed = args.saved_model
+        if not postprocess:
+            fixed = Path(tmp) / "fixed"
+            _fixed_shape_saved_model(args.saved_model, fixed)
+
+        flex = False
+        try:
+            tflite_model = _convert(fixed, args, flex=False, custom_ops=postprocess)
+        except Exception as e:
+            if not args.allow_flex:
+                sys.exit(f"builtins-only conversion failed: {e}\n"
+                         "The graph needs ops outside the TFLite builtins. Re-export it with the OD API's "
+                         "export_tflite_graph_tf2.py (then --saved-model), or pass --allow-flex to embed "
+                         "TF (Flex) ops.")
+            print("WARNING: builtins-only conversion failed; converting with SELECT_TF_OPS (Flex). "
+                  "The model will need full tf.lite, not tflite_runtime, and runs the Flex ops "
+                  "through the TF kernels.", file=sys.stderr)
+            flex = True
+            tflite_model = _convert(fixed, args, flex=True, custom_ops=postprocess)
+
+    out.write_bytes(tflite_model)
+    print(f"wrote {out} ({len(tflite_model) / 1e6:.1f} MB){' with Flex ops' if flex else ''}")
+    print(f"use it with: DETECTOR_BACKEND=tflite TFLITE_MODEL={out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# scripts/export_yolo_onnx.py
+"""
+Exports YOLOv8 weights to ONNX for the yolo-onnx backend (app/detector_onnx.py).
+
+    python scripts/export_yolo_onnx.py --weights yolov8n.pt --imgsz 640
+    python scripts/export_yolo_onnx.py --dynamic          # any input size (modes.py)
+
+Needs ultralytics (and so torch) on the machine doing the export only; the
+serving nodes just need onnxruntime. The raw [1, 84, N] head is exported
+(no NMS in the graph); class names go into the ONNX metadata, where the
+backend picks them up.
+"""
+from __future__ import annotations
+import argparse, shutil
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "app" / "models"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", default="yolov8n.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--opset", type=int, default=17)
+    ap.add_argument("--dynamic", action="store_true", help="dynamic input size (slightly slower graph)")
+    ap.add_argument("--no-simplify", action="store_true")
+    ap.add_argument("--out", type=Path, help="default: app/models/<weights stem>.onnx")
+    args = ap.parse_args()
+
+    from ultralytics import YOLO
+    exported = Path(YOLO(args.weights).export(
+        format="onnx", imgsz=args.imgsz, opset=args.opset, dynamic=args.dynamic,
+        simplify=not args.no_simplify, nms=False,
+    ))
+    out = args.out or OUT_DIR / exported.name
+    out.parent.mkdir(parents=True, exist_ok=True)
+    if exported.resolve() != out.resolve():
+        shutil.move(str(exported), out)
+    print(f"wrote {out} ({out.stat().st_size / 1e6:.1f} MB); serve with DETECTOR_BACKEND=yolo-onnx ONNX_MODEL={out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+# Lets `pytest` (not only `python -m pytest`) import the app package from the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
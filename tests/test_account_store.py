@@ -0,0 +1,99 @@
+# tests/test_account_store.py
+import os
+
+import pytest
+
+from app.account_store import AccountStore, StoreLocked
+
+def _open(tmp_path, **kw):
+    kw.setdefault("fsync", False)
+    return AccountStore(str(tmp_path), **kw)
+
+def test_memory_only_store_has_no_files(tmp_path):
+    store = AccountStore("")
+    acc = store.create("alice", "h1")
+    assert store.get_by_name("alice") is acc
+    assert store.stats()["durable"] is False
+
+def test_recovers_from_log(tmp_path):
+    store = _open(tmp_path)
+    a = store.create("alice", "h1")
+    b = store.create("bob", "h2", contact_number="+100")
+    store.set_contact(a.id, "+200")
+    store._log.close()  # simulate a crash: no close(), so no compaction
+    store._lock_file.close()
+
+    again = _open(tmp_path)
+    assert len(again) == 2
+    assert again.get_by_name("alice").contact_number == "+200"
+    assert again.get_by_id(b.id).name == "bob"
+    assert again.create("carol", "h3").id == b.id + 1
+    again.close()
+
+def test_recovers_from_snapshot_plus_log(tmp_path):
+    store = _open(tmp_path)
+    for i in range(5):
+        store.create(f"u{i}", f"h{i}")
+    store.compact()
+    store.set_contact(store.get_by_name("u3").id, "+333")
+    store.create("late", "h")
+    store.close()
+
+    again = _open(tmp_path)
+    assert len(again) == 6
+    assert again.get_by_name("u3").contact_number == "+333"
+    assert again.get_by_name("u0").password_hash == "h0"
+    assert again.get_by_name("late") is not None
+    assert os.path.exists(os.path.join(tmp_path, "snapshot.bin"))
+    again.close()
+
+def test_torn_tail_is_truncated(tmp_path):
+    store = _open(tmp_path)
+    store.create("alice", "h1")
+    store.create("bob", "h2")
+    path = store._log_path(store._gen)
+    store._log.close()
+    store._lock_file.close()
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 3)  # crash in the middle of bob's record
+
+    again = _open(tmp_path)
+    assert again.get_by_name("alice") is not None
+    assert again.get_by_name("bob") is None
+    assert again.create("bob", "h2").name == "bob"
+    again.close()
+
+    third = _open(tmp_path)
+    assert third.get_by_name("bob").password_hash == "h2"
+    third.close()
+
+def test_corrupt_record_stops_replay(tmp_path):
+    store = _open(tmp_path)
+    store.create("alice", "h1")
+    store.create("bob", "h2")
+    path = store._log_path(store._gen)
+    store._log.close()
+    store._lock_file.close()
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))  # crc mismatch on the last record
+
+    again = _open(tmp_path)
+    assert [again.get_by_name(n) is not None for n in ("alice", "bob")] == [True, False]
+    again.close()
+
+def test_second_open_fails_fast(tmp_path):
+    store = _open(tmp_path)
+    with pytest.raises(StoreLocked):
+        _open(tmp_path)
+    store.close()
+    _open(tmp_path).close()  # released on close
+
+def test_rejects_nul_in_text(tmp_path):
+    store = _open(tmp_path)
+    with pytest.raises(ValueError):
+        store.create("bad\0name", "h")
+    store.close()
@@ -0,0 +1,136 @@
+# tests/test_api.py
+"""HTTP-level tests against the stub backend, with SQLite standing in for MySQL."""
+import io, threading, time, zipfile
+
+import orjson
+import pytest
+from PIL import Image
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+from app import backends, db, executor, hashing, main
+from app.executor import InferenceExecutor
+from app.hashing import HashPool
+
+def _jpeg(size=(320, 240), color=(90, 120, 150)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'api.db'}")
+    for mod, name, value in [
+        (db, "_engine", None), (db, "_async_engine", None),
+        (backends, "DETECTOR_BACKEND", "stub"), (backends, "_slot", None), (backends, "_generation", 0),
+        (main, "DETECTOR_BACKEND", "stub"), (main, "CACHE_ENABLED", False),
+        (executor, "_executor", InferenceExecutor(max_workers=2, max_queue=4)),
+        (hashing, "_pool", HashPool(workers=0, rounds=4)),
+    ]:
+        monkeypatch.setattr(mod, name, value)
+    with TestClient(main.app) as c:
+        deadline = time.monotonic() + 30
+        while c.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        yield c
+
+def _detect(client, raw=None, **params):
+    return client.post("/detect", params=params, files={"file": ("a.jpg", raw or _jpeg(), "image/jpeg")})
+
+def test_health_answers_before_ready(client):
+    assert client.get("/health").json() == {"ok": True}
+    snap = client.get("/ready").json()
+    assert snap["model"] == snap["db"] == "ready"
+
+def test_detect_json_reports_boxes_in_upload_pixels(client):
+    r = _detect(client, _jpeg((640, 480)))
+    assert r.status_code == 200
+    body = r.json()
+    assert [d["class_name"] for d in body["detections"]] == ["person", "car"]
+    assert body["detections"][0]["box"]["x"] == pytest.approx(96.0)
+    assert body["model_version"] == "stub-1"
+
+def test_server_timing_and_metrics(client):
+    r = _detect(client)
+    timing = r.headers["server-timing"]
+    for stage in ("queue", "decode", "infer"):
+        assert f"{stage};dur=" in timing
+    text = client.get("/metrics").text
+    assert 'stage_duration_seconds_count{stage="decode"}' in text
+    assert 'route="/detect"' in text
+
+def test_binary_image_responses(client):
+    r = _detect(client, response_format="jpeg", return_image=True)
+    assert r.headers["content-type"] == "image/jpeg" and r.content[:2] == b"\xff\xd8"
+    meta = orjson.loads(r.headers["x-detections"])
+    assert len(meta["detections"]) == 2
+    r = _detect(client, response_format="multipart", return_image=True)
+    assert r.headers["content-type"].startswith("multipart/mixed; boundary=")
+    assert b"Content-Type: application/json" in r.content and b"\xff\xd8" in r.content
+
+def test_full_executor_returns_503(client, monkeypatch):
+    monkeypatch.setattr(executor, "_executor", InferenceExecutor(max_workers=1, max_queue=0))
+    backends.get_detector().latency_ms = 500
+    first = {}
+    t = threading.Thread(target=lambda: first.update(r=_detect(client, allow_downgrade=False)))
+    t.start()
+    deadline = time.monotonic() + 5
+    while not executor.get_executor().stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    r = _detect(client, allow_downgrade=False)
+    t.join()
+    assert r.status_code == 503 and r.headers["retry-after"] == "1"
+    assert first["r"].status_code == 200
+    assert executor.get_executor().stats()["rejected"] == 1
+
+def _ndjson(r):
+    return [orjson.loads(line) for line in r.content.splitlines()]
+
+def test_batch_streams_one_line_per_image(client):
+    files = [("files", ("a.jpg", _jpeg(), "image/jpeg")),
+             ("files", ("b.txt", b"hello", "text/plain")),
+             ("files", ("c.jpg", b"not a jpeg", "image/jpeg"))]
+    r = client.post("/detect/batch", files=files)
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    *items, done = _ndjson(r)
+    by_name = {i["name"]: i for i in items}
+    assert len(by_name["a.jpg"]["detections"]) == 2
+    assert by_name["b.txt"]["status"] == 415
+    assert by_name["c.jpg"]["status"] == 422
+    assert done["done"] and done["count"] == 3 and done["errors"] == 2
+
+def test_batch_accepts_a_zip_archive(client):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("x/1.jpg", _jpeg())
+        zf.writestr("x/2.jpg", _jpeg((64, 64)))
+        zf.writestr("readme.txt", "skipped")
+    r = client.post("/detect/batch", files={"archive": ("imgs.zip", buf.getvalue(), "application/zip")})
+    *items, done = _ndjson(r)
+    assert sorted(i["name"] for i in items) == ["x/1.jpg", "x/2.jpg"]
+    assert done["count"] == 2 and done["errors"] == 0
+
+def test_modes_only_advertise_cost_that_varies_per_mode(client):
+    modes = client.get("/modes").json()["modes"]
+    assert [m["name"] for m in modes] == ["fast", "balanced", "accurate"]
+    assert all(m["expected_ms"] is None for m in modes)  # the stub ignores input_size
+
+def test_signup_login_and_me(client):
+    r = client.post("/auth/signup", json={"name": "ada", "password": "hunter22"})
+    assert r.status_code == 200, r.text
+    r = client.post("/auth/login", json={"name": "ada", "password": "hunter22"})
+    token = r.json()["token"]
+    me = client.get("/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.status_code == 200 and me.json()["name"] == "ada"
+    assert client.post("/auth/login", json={"name": "ada", "password": "wrong"}).status_code == 401
+
+def test_websocket_streams_detections(client):
+    with client.websocket_connect("/ws/detect") as ws:
+        ws.send_bytes(_jpeg())
+        msg = ws.receive_json()
+        assert msg["seq"] == 1 and len(msg["detections"]) == 2 and msg["reused"] is False
+        ws.send_bytes(_jpeg())                   # same picture: motion gate reuses the result
+        assert ws.receive_json()["reused"] is True
+        ws.send_text("stats")
+        assert ws.receive_json()["stats"]["processed"] == 1
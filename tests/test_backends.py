@@ -0,0 +1,102 @@
+# tests/test_backends.py
+import threading, time
+
+import pytest
+
+from app import backends
+from app.backends import UnsupportedOverride, check_overrides, create_detector, register_backend
+
+class FakeDetector:
+    def __init__(self, model_path=None, labels=None):
+        self.model_path = model_path
+        self.labels = labels
+        self.score_thresh = 0.25
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    monkeypatch.setattr(backends, "_REGISTRY", dict(backends._REGISTRY))
+    monkeypatch.setattr(backends, "_SUPPORTS", dict(backends._SUPPORTS))
+    register_backend("fake", supports={"model_path"})(FakeDetector)
+    return "fake"
+
+def test_registry_creates_the_named_backend(fake_backend):
+    assert "fake" in backends.available_backends()
+    det = create_detector("fake", model_path="/m/1", labels=None)
+    assert isinstance(det, FakeDetector) and det.model_path == "/m/1"
+
+def test_unknown_backend_and_unsupported_overrides_fail_before_loading(fake_backend):
+    with pytest.raises(ValueError, match="Unknown DETECTOR_BACKEND"):
+        check_overrides("nope")
+    with pytest.raises(UnsupportedOverride, match="labels_file"):
+        check_overrides("fake", labels=object())
+    assert check_overrides("fake", model_path="/m", labels=None) == "fake"
+
+# ---------------------------------------------------------
+# Hot reload
+# ---------------------------------------------------------
+@pytest.fixture
+def slot(fake_backend, monkeypatch):
+    monkeypatch.setattr(backends, "DETECTOR_BACKEND", "fake")
+    monkeypatch.setattr(backends, "MODEL_VERSION", "")
+    monkeypatch.setattr(backends, "_slot", None)
+    monkeypatch.setattr(backends, "_generation", 0)
+    monkeypatch.setattr(backends, "_reload_state", {"state": "idle"})
+    monkeypatch.setattr(backends, "_swap_listeners", [])
+    return backends
+
+def _reload_in_thread(**kw):
+    out = {}
+    t = threading.Thread(target=lambda: out.update(backends.reload_detector(**kw)))
+    t.start()
+    return t, out
+
+def test_reload_swaps_then_waits_for_leases_on_the_old_model(slot):
+    old = slot.get_detector()
+    assert slot.model_info().version == "fake-1"
+    with slot.lease_detector() as (det, info):
+        t, out = _reload_in_thread(model_path="/m/2", drain_timeout=5)
+        deadline = time.monotonic() + 5
+        while slot.model_info().generation != 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert slot.get_detector() is not old                 # new calls go to the new model
+        assert slot.reload_status()["state"] == "draining"
+        assert det is old and not old.closed                   # ours keeps running on the old one
+    t.join(5)
+    assert out["drained"] and out["version"] == "fake-2"
+    assert old.closed and slot.get_detector().model_path == "/m/2"
+
+def test_drain_timeout_leaves_the_old_model_open(slot):
+    old = slot.get_detector()
+    with slot.lease_detector():
+        out = slot.reload_detector(drain_timeout=0.05)
+    assert out["drained"] is False and out["still_inflight_on_old"] == 1
+    assert not old.closed
+
+def test_reload_keeps_runtime_thresholds_and_notifies_listeners(slot):
+    slot.set_thresholds(slot.get_detector(), score_thresh=0.6)
+    seen = []
+    slot.add_swap_listener(seen.append)
+    slot.reload_detector(version="canary")
+    assert slot.get_detector().score_thresh == 0.6
+    assert seen == [slot.get_detector()] and slot.model_info().version == "canary"
+
+def test_failed_load_keeps_serving_the_old_model(slot, monkeypatch):
+    old = slot.get_detector()
+
+    def broken(**kw):
+        raise RuntimeError("corrupt weights")
+
+    monkeypatch.setitem(slot._REGISTRY, "fake", broken)
+    with pytest.raises(RuntimeError):
+        slot.reload_detector()
+    assert slot.get_detector() is old and slot.reload_status()["state"] == "failed"
+
+def test_one_reload_at_a_time(slot):
+    slot.get_detector()
+    with slot._reload_lock:
+        with pytest.raises(slot.ReloadInProgress):
+            slot.reload_detector()
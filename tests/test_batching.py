@@ -0,0 +1,60 @@
+# tests/test_batching.py
+import threading
+
+import pytest
+from PIL import Image
+
+from app.batching import BatchScheduler
+
+class FakeBatchDetector:
+    """infer_batch that records batch sizes and echoes each image's size back as a detection."""
+    def __init__(self, release: threading.Event = None):
+        self.sizes = []
+        self.release = release
+
+    def infer_batch(self, images, sizes):
+        if self.release is not None:
+            self.release.wait(5)
+        self.sizes.append(len(images))
+        dets = [[{"class_id": 1, "class_name": "person", "conf": 0.9,
+                  "box": {"x": 0.0, "y": 0.0, "w": float(W), "h": float(H)}}] for W, H in sizes]
+        return dets, 12.5
+
+def test_concurrent_requests_share_one_model_call():
+    release = threading.Event()
+    det = FakeBatchDetector(release)
+    sched = BatchScheduler(det, max_batch_size=4, max_wait_ms=200)
+    futs = [sched.submit(Image.new("RGB", (10 * (i + 1), 10)), orig_size=(100 * (i + 1), 100)) for i in range(4)]
+    release.set()
+    results = [f.result(timeout=5) for f in futs]
+    assert det.sizes == [4]
+    assert [dets[0]["box"]["w"] for dets, _ in results] == [100.0, 200.0, 300.0, 400.0]
+    stats = sched.stats()
+    assert stats["batches"] == 1 and stats["batch_size_hist"] == {4: 1} and stats["avg_batch_size"] == 4.0
+
+def test_batches_are_capped_at_max_size():
+    release = threading.Event()
+    det = FakeBatchDetector(release)
+    sched = BatchScheduler(det, max_batch_size=2, max_wait_ms=200)
+    futs = [sched.submit(Image.new("RGB", (8, 8))) for _ in range(5)]
+    release.set()
+    for f in futs:
+        f.result(timeout=5)
+    assert sum(det.sizes) == 5 and max(det.sizes) <= 2
+
+def test_infer_matches_the_detector_contract():
+    sched = BatchScheduler(FakeBatchDetector(), max_batch_size=8, max_wait_ms=0)
+    dets, jpeg, elapsed_ms = sched.infer(Image.new("RGB", (64, 48)), return_image=True, orig_size=(640, 480))
+    assert dets[0]["box"]["w"] == 640.0 and elapsed_ms == 12.5
+    assert jpeg[:2] == b"\xff\xd8"
+
+def test_model_errors_fail_every_request_in_the_batch():
+    class Broken:
+        def infer_batch(self, images, sizes):
+            raise RuntimeError("model exploded")
+
+    sched = BatchScheduler(Broken(), max_batch_size=2, max_wait_ms=50)
+    futs = [sched.submit(Image.new("RGB", (8, 8))) for _ in range(2)]
+    for f in futs:
+        with pytest.raises(RuntimeError, match="exploded"):
+            f.result(timeout=5)
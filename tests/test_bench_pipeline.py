@@ -0,0 +1,33 @@
+# tests/test_bench_pipeline.py
+import numpy as np
+
+from app.postprocess import format_detections
+from bench.bench_pipeline import compare, encode, multipart_body, parse_multipart, run_one, spread, synthetic_image
+
+def test_multipart_round_trip():
+    raw = encode(synthetic_image((64, 48)), "PNG")
+    assert parse_multipart(multipart_body(raw, "image/png")) == raw
+
+def test_run_one_times_every_stage():
+    stages = {
+        "preprocess": lambda pil: pil,
+        "infer_fn": lambda x: (np.array([[0.1, 0.1, 0.5, 0.5]]), np.array([0.9]), np.array([1])),
+        "postprocess": lambda out, pil, orig_size: format_detections(*out, *orig_size),
+    }
+    r = run_one(stages, "image/jpeg", encode(synthetic_image((320, 240)), "JPEG"), iters=3, warmup=1)
+    for stage in ("upload_parse", "decode", "infer_fn", "annotate", "jpeg_encode", "base64", "total"):
+        assert r[stage]["p50"] >= 0
+    assert r["total"]["p50"] >= r["decode"]["p50"] and r["throughput_rps"] > 0
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    def report(p50):
+        return {"results": {"ssd": {"img": {"infer_fn": {"p50": p50}, "throughput_rps": 1.0}}}}
+
+    assert compare(report(10.5), report(10.0), 0.10) == []
+    (line,) = compare(report(12.0), report(10.0), 0.10)
+    assert line.startswith("ssd/img/infer_fn") and "+20%" in line
+    assert compare(report(12.0), {"results": {}}, 0.10) == []
+
+def test_spread():
+    images = {"a": {"infer_fn": {"p50": 10.0}}, "b": {"infer_fn": {"p50": 25.0}}}
+    assert spread(images) == {"min_p50": 10.0, "max_p50": 25.0, "spread": 2.5}
@@ -0,0 +1,77 @@
+# tests/test_compact.py
+import numpy as np
+import pytest
+
+from app import compact
+from app.postprocess import COCO_LABELS, LABEL_TABLE, _label_table, detection_columns, format_detections
+
+BOXES = np.array([[0.10, 0.15, 0.80, 0.45], [0.50, 0.55, 0.90, 0.95]], dtype=np.float32)
+SCORES = np.array([0.91234, 0.64], dtype=np.float32)
+CLASSES = np.array([1, 3], dtype=np.int32)
+
+@pytest.mark.parametrize("query, accept, expected", [
+    (None, None, None),
+    (None, "application/json", None),
+    ("json", "application/msgpack", "json"),
+    (None, compact.COMPACT_JSON, "json"),
+    (None, compact.COMPACT_MSGPACK, "msgpack"),
+    (None, "application/x-msgpack, */*", "msgpack"),
+])
+def test_negotiate(query, accept, expected):
+    assert compact.negotiate(query, accept) == expected
+
+def test_label_table_version_is_content_hash():
+    v1, names = compact.label_table(LABEL_TABLE)
+    assert names == [str(n) for n in COCO_LABELS]  # unnamed placeholder ids trimmed
+    assert compact.label_table(_label_table(COCO_LABELS)) == (v1, names)
+    v2, _ = compact.label_table(_label_table(COCO_LABELS[:-1] + ["hairdryer"]))
+    assert v2 != v1
+
+def test_columns_and_dicts_encode_the_same():
+    dets = format_detections(BOXES, SCORES, CLASSES, 640, 480)
+    cols = detection_columns(BOXES, SCORES, CLASSES, 640, 480)
+    from_dicts, v1 = compact.build(dets, LABEL_TABLE, None)
+    from_cols, v2 = compact.build(cols, LABEL_TABLE, None)
+    assert from_dicts == from_cols and v1 == v2
+
+def test_payload_layout():
+    cols = detection_columns(BOXES, SCORES, CLASSES, 640, 480)
+    body, version = compact.build(cols, LABEL_TABLE, None, model_version="ssd-1")
+    assert body["format"] == compact.FORMAT_NAME
+    assert body["n"] == 2
+    assert body["class_ids"] == [1, 3]
+    assert body["conf"] == [912, 640] and body["conf_scale"] == compact.CONF_SCALE
+    assert body["boxes"] == [96, 48, 192, 336, 352, 240, 256, 192]  # x,y,w,h per detection
+    assert body["labels_version"] == version
+    assert body["labels"][1] == "person"
+    assert body["model_version"] == "ssd-1"
+
+def test_labels_omitted_when_client_has_them():
+    cols = detection_columns(BOXES, SCORES, CLASSES, 640, 480)
+    _, version = compact.build(cols, LABEL_TABLE, None)
+    body, _ = compact.build(cols, LABEL_TABLE, version)
+    assert "labels" not in body and body["labels_version"] == version
+
+def test_empty_result():
+    body, _ = compact.build([], LABEL_TABLE, None)
+    assert body["n"] == 0 and body["class_ids"] == body["conf"] == body["boxes"] == []
+
+def test_names_that_disagree_with_the_table_are_sent_unversioned():
+    dets = format_detections(BOXES, SCORES, CLASSES, 640, 480, labels=_label_table(["??", "walker", "b", "auto"]))
+    body, version = compact.build(dets, LABEL_TABLE, None)
+    assert version == "" and body["labels_version"] is None
+    assert body["labels"] == {"1": "walker", "3": "auto"}
+
+def test_ids_outside_the_table_are_sent_unversioned():
+    cols = detection_columns(BOXES, SCORES, np.array([1, 200]), 640, 480)
+    body, version = compact.build(cols, LABEL_TABLE, None)
+    assert version == ""
+    assert body["labels"] == {"1": "person", "200": "200"}
+
+def test_msgpack_roundtrip():
+    msgpack = pytest.importorskip("msgpack")
+    body, _ = compact.build(detection_columns(BOXES, SCORES, CLASSES, 640, 480), LABEL_TABLE, None,
+                            image=b"\xff\xd8jpeg")
+    decoded = msgpack.unpackb(compact.encode_msgpack(body), raw=False)
+    assert decoded == body
+    assert isinstance(decoded["image"], bytes)
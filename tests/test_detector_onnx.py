@@ -0,0 +1,56 @@
+# tests/test_detector_onnx.py
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.detector_onnx import YoloOnnxDetector, letterbox, nms
+from app.postprocess import COCO_LABELS, _label_table
+
+def test_letterbox_keeps_aspect_and_centers():
+    x, scale, pad = letterbox(Image.new("RGB", (200, 100), (255, 0, 0)), 64)
+    assert x.shape == (1, 3, 64, 64) and x.dtype == np.float32
+    assert scale == pytest.approx(0.32) and pad == (0, 16)
+    assert x[0, 0, 16:48, :].min() == pytest.approx(1.0)          # image rows, red channel
+    assert x[0, 0, :16, :].max() == pytest.approx(114 / 255)      # padding
+
+def test_nms_suppresses_overlaps_best_first():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [20, 20, 30, 30], [0, 0, 10, 9]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.5, 0.4], dtype=np.float32)
+    assert nms(boxes, scores, 0.5, 300).tolist() == [1, 2]
+    assert nms(boxes, scores, 0.5, 1).tolist() == [1]
+    assert nms(boxes, scores, 0.99, 300).tolist() == [1, 0, 2, 3]
+
+def _detector(conf=0.25, iou=0.45):
+    det = YoloOnnxDetector.__new__(YoloOnnxDetector)
+    det.conf, det.iou, det.max_det = conf, iou, 300
+    det.labels = _label_table(COCO_LABELS[1:])
+    return det
+
+def _head(rows):
+    """[(cx, cy, w, h, class, score)] -> raw [4+C, N] head with 3 classes."""
+    pred = np.zeros((len(rows), 7), dtype=np.float32)
+    for i, (cx, cy, w, h, c, s) in enumerate(rows):
+        pred[i, :4] = cx, cy, w, h
+        pred[i, 4 + c] = s
+    return pred.T
+
+def test_decode_undoes_the_letterbox():
+    # 200x100 image letterboxed into 64: scale 0.32, pad_y 16
+    head = _head([(32, 32, 32, 16, 2, 0.9)])
+    boxes, scores, classes = _detector()._decode(head, 0.32, (0, 16), 200, 100)
+    # 32x16 net px -> 100x50 image px centered at (100, 50)
+    np.testing.assert_allclose(boxes, [[0.25, 0.25, 0.75, 0.75]], atol=1e-6)
+    assert scores.tolist() == pytest.approx([0.9]) and classes.tolist() == [2]
+
+def test_decode_nms_is_class_aware_and_thresholded():
+    head = _head([(32, 32, 20, 20, 0, 0.9), (33, 33, 20, 20, 0, 0.8),   # same class: suppressed
+                  (33, 33, 20, 20, 1, 0.7),                              # other class: kept
+                  (10, 10, 4, 4, 2, 0.1)])                               # below conf
+    boxes, scores, classes = _detector()._decode(head, 1.0, (0, 0), 64, 64)
+    assert classes.tolist() == [0, 1] and scores.tolist() == pytest.approx([0.9, 0.7])
+    empty = _detector(conf=0.95)._decode(head, 1.0, (0, 0), 64, 64)
+    assert [a.shape for a in empty] == [(0, 4), (0,), (0,)]
+
+def test_zero_based_ids_use_the_coco80_table():
+    det = _detector()
+    assert det.labels[0] == "person" and det.labels[2] == "car"
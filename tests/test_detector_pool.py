@@ -0,0 +1,59 @@
+# tests/test_detector_pool.py
+import os, signal, time
+
+import pytest
+from PIL import Image
+
+from app import detector_pool
+from app.detector_pool import DetectorPool
+
+@pytest.fixture
+def make_pool():
+    pools = []
+
+    def make(**kw):
+        kw.setdefault("workers", 1)
+        kw.setdefault("backend", "stub")
+        pool = DetectorPool(**kw)
+        pools.append(pool)
+        pool.wait_ready(60)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+def _wait_for(cond, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def test_infer_round_trips_through_shared_memory(make_pool):
+    pool = make_pool(max_side=64)
+    dets, jpeg, elapsed_ms = pool.infer(Image.new("RGB", (640, 480)), return_image=True)
+    assert [d["class_name"] for d in dets] == ["person", "car"]
+    assert dets[0]["box"]["x"] == pytest.approx(96.0)  # scaled to the original size, not the 64px slot
+    assert jpeg[:2] == b"\xff\xd8" and elapsed_ms > 0
+
+def test_detections_use_the_workers_label_table(make_pool, monkeypatch, tmp_path):
+    labels = tmp_path / "labels.txt"
+    labels.write_text("walker\nbike\nauto\n")
+    monkeypatch.setenv("LABELS_FILE", str(labels))  # only the spawned worker reads it
+    pool = make_pool()
+    dets, _, _ = pool.infer(Image.new("RGB", (64, 48)))
+    assert [d["class_name"] for d in dets] == ["walker", "auto"]
+    assert pool.labels[1] == "walker"
+
+def test_monitor_replaces_a_crashed_worker(make_pool, monkeypatch):
+    monkeypatch.setattr(detector_pool, "POOL_HEALTH_INTERVAL", 0.05)
+    pool = make_pool()
+    old_pid = pool.health()["workers"][0]["pid"]
+    os.kill(old_pid, signal.SIGKILL)
+    assert _wait_for(lambda: pool.restarts == 1)
+    pool.wait_ready(60)
+    assert pool.health()["workers"][0]["pid"] != old_pid
+    dets, _, _ = pool.infer(Image.new("RGB", (64, 48)))
+    assert len(dets) == 2
@@ -0,0 +1,56 @@
+# tests/test_detector_ssd.py
+import numpy as np
+import pytest
+from PIL import Image
+
+tf = pytest.importorskip("tensorflow")
+
+from app.detector_ssd import SSDDetector
+from app.postprocess import LABEL_TABLE
+
+def _bucketed(buckets=(320, 480, 640)):
+    """SSDDetector without a SavedModel; `_serve_fn` returns one box covering the fed image."""
+    det = SSDDetector.__new__(SSDDetector)
+    det.buckets, det.score_thresh, det.labels, det.xla = sorted(buckets), 0.25, LABEL_TABLE, False
+    det.seen = []
+
+    def serve(x):
+        det.seen.append(tuple(x.shape))
+        return {"detection_boxes": tf.constant(det.canvas_box[np.newaxis, np.newaxis], tf.float32),
+                "detection_scores": tf.constant([[0.9]]),
+                "detection_classes": tf.constant([[1.0]]),
+                "num_detections": tf.constant([1.0])}
+    det._serve_fn = serve
+    return det
+
+def test_smallest_bucket_that_fits():
+    det = _bucketed()
+    assert [det._bucket_for(*s) for s in [(300, 200), (320, 100), (400, 300), (1000, 800)]] == [320, 320, 480, 640]
+
+def test_letterbox_puts_the_image_top_left():
+    det = _bucketed()
+    canvas, unpad = det._to_bucket(Image.new("RGB", (400, 300), (255, 255, 255)))
+    arr = canvas.numpy()
+    assert arr.shape == (1, 480, 480, 3)
+    assert arr[0, :300, :400].min() == 255 and arr[0, 300:].max() == 0 and arr[0, :, 400:].max() == 0
+    assert unpad == pytest.approx((480 / 300, 480 / 400))
+
+def test_oversized_images_are_downscaled_into_the_largest_bucket():
+    canvas, unpad = _bucketed()._to_bucket(Image.new("RGB", (1280, 960)))
+    assert canvas.shape == (1, 640, 640, 3)
+    assert unpad == pytest.approx((640 / 480, 1.0))
+
+def test_boxes_are_unpadded_back_to_the_image():
+    det = _bucketed()
+    det.canvas_box = np.array([150 / 480, 100 / 480, 300 / 480, 400 / 480], np.float32)  # canvas-normalized
+    dets, _, _ = det.infer(Image.new("RGB", (400, 300)), orig_size=(800, 600))
+    assert det.seen == [(1, 480, 480, 3)]
+    assert dets[0]["box"] == pytest.approx({"x": 200.0, "y": 300.0, "w": 600.0, "h": 300.0})
+    boxes, _, _ = det.detect_arrays(np.zeros((300, 400, 3), np.uint8))
+    np.testing.assert_allclose(boxes, [[0.5, 0.25, 1.0, 1.0]], rtol=1e-6)
+
+def test_boxes_in_the_padding_are_clipped():
+    det = _bucketed()
+    det.canvas_box = np.array([0.5, 0.5, 0.9, 0.9], np.float32)
+    boxes, _, _ = det.detect_arrays(np.zeros((240, 320, 3), np.uint8))  # fills the 320 bucket's top 3/4
+    np.testing.assert_allclose(boxes, [[0.5 * 320 / 240, 0.5, 1.0, 0.9]], rtol=1e-6)
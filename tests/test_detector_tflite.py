@@ -0,0 +1,75 @@
+# tests/test_detector_tflite.py
+import argparse, importlib.util
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+tf = pytest.importorskip("tensorflow")
+
+from app.detector_tflite import TFLiteSSDDetector
+
+ROOT = Path(__file__).resolve().parents[1]
+
+def _convert_script():
+    spec = importlib.util.spec_from_file_location("convert_tflite", ROOT / "scripts" / "convert_tflite.py")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def _postprocess_saved_model(path: Path, reverse: bool) -> None:
+    """Tiny stand-in for an export_tflite_graph_tf2.py export: two anchors, two classes.
+    Anchor 0 scores 0.8 * mean(input) for class 0, so it is 0.8 only if the input was normalized."""
+    attrs = {"max_detections": "i: 10", "max_classes_per_detection": "i: 1", "detections_per_class": "i: 10",
+             "use_regular_nms": "b: false", "nms_score_threshold": "f: 0.1", "nms_iou_threshold": "f: 0.5",
+             "y_scale": "f: 10.0", "x_scale": "f: 10.0", "h_scale": "f: 5.0", "w_scale": "f: 5.0",
+             "num_classes": "i: 2"}
+    implements = " ".join(['name: "TFLite_Detection_PostProcess"'] +
+                          [f'attr {{ key: "{k}" value {{ {v} }} }}' for k, v in attrs.items()])
+
+    @tf.function(experimental_implements=implements)
+    def postprocess(box_encodings, class_predictions, anchors):
+        return tf.constant(0.0), tf.constant(0.0), tf.constant(0.0), tf.constant(0.0)
+
+    anchors = tf.constant([[0.25, 0.25, 0.5, 0.5], [0.75, 0.75, 0.5, 0.5]], tf.float32)  # yc, xc, h, w
+
+    class Export(tf.Module):
+        @tf.function(input_signature=[tf.TensorSpec([1, 8, 8, 3], tf.float32, name="input")])
+        def serve(self, x):
+            s = tf.reduce_mean(x)
+            encodings = tf.zeros([1, 2, 4]) + 0.0 * s
+            scores = tf.reshape(tf.stack([0.0, 0.8 * s, 0.0, 0.0, 0.0, 0.6 + 0.0 * s]), [1, 2, 3])
+            out = postprocess(encodings, scores, anchors)
+            return out[::-1] if reverse else out
+
+    m = Export()
+    tf.saved_model.save(m, str(path), signatures={"serving_default": m.serve})
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_runs_a_converted_postprocess_model(tmp_path, reverse):
+    conv = _convert_script()
+    _postprocess_saved_model(tmp_path / "export", reverse)
+    assert conv._input_spec(tmp_path / "export").shape.is_fully_defined()
+    model = tmp_path / "model.tflite"
+    model.write_bytes(conv._convert(tmp_path / "export", argparse.Namespace(quant="none"),
+                                    flex=False, custom_ops=True))
+
+    det = TFLiteSSDDetector(score_thresh=0.25, model_path=model, num_threads=1)
+    assert (det.input_h, det.input_w) == (8, 8)
+    boxes, scores, classes = det.detect_arrays(np.full((8, 8, 3), 255, dtype=np.uint8))
+    np.testing.assert_allclose(scores, [0.8, 0.6], rtol=1e-5)
+    np.testing.assert_allclose(boxes, [[0, 0, 0.5, 0.5], [0.5, 0.5, 1, 1]], atol=1e-5)
+    assert classes.tolist() == [1, 2]  # 0-based PostProcess ids -> 1-based label table
+
+    dets, _, _ = det.infer(Image.new("RGB", (80, 60), (255, 255, 255)))
+    assert [d["class_name"] for d in dets] == ["person", "bicycle"]
+    assert dets[1]["box"] == pytest.approx({"x": 40.0, "y": 30.0, "w": 40.0, "h": 30.0})
+
+def test_quantized_input_is_normalized_then_quantized():
+    det = TFLiteSSDDetector.__new__(TFLiteSSDDetector)
+    det.input_dtype, det._input_scale, det._input_zero = np.int8, 1 / 128, 0
+    x = det._prepare(np.array([[[0, 64, 255]]], dtype=np.uint8))
+    assert x.dtype == np.int8 and x.tolist() == [[[[-128, -64, 127]]]]
+    det.input_dtype, det._input_scale = np.uint8, 0.0
+    assert det._prepare(np.array([[[0, 128, 255]]], dtype=np.uint8)).tolist() == [[[[0, 128, 255]]]]
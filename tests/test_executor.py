@@ -0,0 +1,68 @@
+# tests/test_executor.py
+import asyncio, threading, time
+
+import pytest
+
+from app.executor import InferenceExecutor, Overloaded
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return cond()
+
+def test_runs_off_the_event_loop():
+    ex = InferenceExecutor(max_workers=1, max_queue=0)
+
+    async def go():
+        return await ex.run(threading.current_thread)
+
+    assert asyncio.run(go()) is not threading.main_thread()
+    assert ex.stats()["running"] == 0
+
+def test_sheds_load_once_workers_and_queue_are_full():
+    ex = InferenceExecutor(max_workers=1, max_queue=1)
+    gate = threading.Event()
+
+    async def go():
+        jobs = [asyncio.ensure_future(ex.run(gate.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert ex.stats()["running"] == 1 and ex.queue_depth() == 1
+        with pytest.raises(Overloaded) as err:
+            await ex.run(gate.wait)
+        assert err.value.retry_after >= 1
+        gate.set()
+        return await asyncio.gather(*jobs)
+
+    assert asyncio.run(go()) == [True, True]
+    assert ex.stats()["rejected"] == 1 and ex.queue_depth() == 0
+
+def test_errors_propagate_and_free_the_slot():
+    ex = InferenceExecutor(max_workers=1, max_queue=0)
+
+    def boom():
+        raise ValueError("bad image")
+
+    async def go():
+        with pytest.raises(ValueError):
+            await ex.run(boom)
+        return await ex.run(lambda: 42)
+
+    assert asyncio.run(go()) == 42
+
+def test_cancelled_request_keeps_its_slot_until_the_thread_finishes():
+    ex = InferenceExecutor(max_workers=1, max_queue=0)
+    gate = threading.Event()
+
+    async def go():
+        task = asyncio.ensure_future(ex.run(gate.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        with pytest.raises(Overloaded):
+            await ex.run(gate.wait)
+
+    asyncio.run(go())
+    gate.set()
+    assert _wait_for(lambda: ex.stats()["running"] == 0)
@@ -0,0 +1,63 @@
+# tests/test_hashing.py
+import asyncio, threading, time
+
+import pytest
+
+from app.executor import Overloaded
+from app.hashing import HashPool, hash_rounds, needs_rehash
+
+@pytest.fixture
+def thread_pool():
+    pool = HashPool(workers=0, max_queue=0, rounds=4)
+    yield pool
+    pool.shutdown()
+
+def test_hash_and_verify(thread_pool):
+    async def go():
+        hashed = await thread_pool.hash("hunter2")
+        return hashed, await thread_pool.verify("hunter2", hashed), await thread_pool.verify("nope", hashed)
+
+    hashed, ok, bad = asyncio.run(go())
+    assert ok and not bad
+    assert hash_rounds(hashed) == 4
+    assert needs_rehash(hashed, rounds=12) and not needs_rehash(hashed, rounds=4)
+
+def test_malformed_hash_fails_verification(thread_pool):
+    assert asyncio.run(thread_pool.verify("x", "not-a-bcrypt-hash")) is False
+    assert hash_rounds("plain") is None and not needs_rehash("plain")
+
+def test_rejects_beyond_workers_plus_queue(thread_pool):
+    gate = threading.Event()
+
+    async def go():
+        first = asyncio.ensure_future(thread_pool._run(gate.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await thread_pool.verify("x", "y")
+        gate.set()
+        await first
+
+    asyncio.run(go())
+    assert thread_pool.stats()["rejected"] == 1
+    assert thread_pool.stats()["running"] == 0
+
+def test_cancelled_call_holds_its_slot_until_bcrypt_finishes(thread_pool):
+    gate = threading.Event()
+
+    async def go():
+        task = asyncio.ensure_future(thread_pool._run(gate.wait))
+        await asyncio.sleep(0.01)
+        task.cancel()  # the client went away; the thread is still running
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert thread_pool.stats()["running"] == 1
+        with pytest.raises(Overloaded):
+            await thread_pool.verify("x", "y")
+
+    asyncio.run(go())
+    gate.set()
+    deadline = time.monotonic() + 5
+    while thread_pool.stats()["running"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert thread_pool.stats()["running"] == 0
+    assert thread_pool.stats()["completed"] == 1
@@ -0,0 +1,47 @@
+# tests/test_loadgen.py
+import pytest
+
+from bench.loadgen import MIXES, _parse_mix, _Recorder, markdown, saturation, summarize
+
+def _step(load, p99, ok=100, offered=100, error_rate=0.0):
+    return {"load": load, "routes": {"detect": {"p99_ms": p99, "error_rate": error_rate, "ok": ok,
+                                                 "offered": offered, "throughput_rps": ok / 10}}}
+
+def test_summarize_counts_only_2xx_as_ok():
+    rec = _Recorder()
+    rec.offered["detect"] = 5
+    rec.dropped["detect"] = 1
+    for status, ms in [("200", 10.0), ("200", 20.0), ("503", 5.0), ("timeout", 1000.0)]:
+        rec.record("detect", status, ms)
+    r = summarize(rec, wall_s=2.0)["detect"]
+    assert (r["offered"], r["completed"], r["dropped"], r["ok"]) == (5, 4, 1, 2)
+    assert r["error_rate"] == 0.5 and r["throughput_rps"] == 1.0
+    assert r["status"] == {"200": 2, "503": 1, "timeout": 1}
+    assert "login" not in summarize(rec, 2.0)  # routes with no traffic are left out
+
+@pytest.mark.parametrize("bad_step, reason", [
+    (_step(40, 900.0), "p99"),
+    (_step(40, 100.0, error_rate=0.2), "error rate"),
+    (_step(40, 100.0, ok=50), "completed 50/100"),
+])
+def test_saturation_is_the_first_step_over_the_slo(bad_step, reason):
+    steps = [_step(10, 100.0), _step(20, 200.0), bad_step, _step(80, 100.0)]
+    sat = saturation(steps, slo_p99_ms=500.0, max_error_rate=0.01)["detect"]
+    assert sat["max_ok"] == {"load": 20, "throughput_rps": 10.0}
+    assert sat["saturated_at"] == 40 and sat["reason"].startswith(reason)
+
+def test_mix_parsing():
+    assert _parse_mix("mixed") is MIXES["mixed"]
+    assert _parse_mix("me=3,detect=1") == {"me": 3.0, "detect": 1.0}
+    with pytest.raises(SystemExit):
+        _parse_mix("upload=1")
+
+def test_markdown_report():
+    report = {"config": {"mode": "open", "mix_name": "detect", "detector": "stub", "slo_p99_ms": 500.0,
+                         "max_error_rate": 0.01, "duration_s": 10, "image_sizes": ["640x480"]},
+              "steps": [{"load": 10, "routes": {"detect": {"offered": 100, "ok": 100, "dropped": 0, "error_rate": 0.0,
+                                                           "throughput_rps": 10.0, "p50_ms": 40.0, "p99_ms": 100.0}}}],
+              "saturation": {"detect": {"max_ok": {"load": 10, "throughput_rps": 10.0},
+                                        "saturated_at": None, "reason": None}}}
+    text = markdown(report)
+    assert "| 10 | detect | 100 | 100 | 0 | 0.0 | 10.0 | 40.0 | 100.0 |" in text and "| detect | 10 | 10.0 | - | - |" in text
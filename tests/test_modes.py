@@ -0,0 +1,43 @@
+# tests/test_modes.py
+from dataclasses import replace
+
+import numpy as np
+import pytest
+
+from app import modes
+from app.modes import MODES, apply_profile, apply_profile_columns, describe, downgrade, get_mode
+from app.postprocess import Columns
+
+def _det(conf, cls=1):
+    return {"class_id": cls, "class_name": "person", "conf": conf, "box": {"x": 0.0, "y": 0.0, "w": 1.0, "h": 1.0}}
+
+def test_downgrade_steps_with_queue_fill(monkeypatch):
+    monkeypatch.setattr(modes, "DETECT_AUTO_DOWNGRADE", True)
+    accurate = MODES["accurate"]
+    assert downgrade(accurate, 0.1) is accurate
+    assert downgrade(accurate, modes.DETECT_DOWNGRADE_LOW).name == "balanced"
+    assert downgrade(accurate, modes.DETECT_DOWNGRADE_HIGH).name == "fast"
+    assert downgrade(MODES["fast"], 1.0).name == "fast"
+    monkeypatch.setattr(modes, "DETECT_AUTO_DOWNGRADE", False)
+    assert downgrade(accurate, 1.0) is accurate
+
+def test_apply_profile_thresholds_and_caps():
+    profile = replace(MODES["fast"], max_det=2, score_thresh=0.5)
+    kept = apply_profile([_det(0.6), _det(0.4), _det(0.9), _det(0.7)], profile)
+    assert [d["conf"] for d in kept] == [0.9, 0.7]
+
+def test_columns_match_the_dict_version():
+    profile = replace(MODES["balanced"], max_det=3, score_thresh=0.3)
+    conf = np.array([0.5, 0.2, 0.9, 0.5, 0.7], dtype=np.float32)
+    cols = Columns(np.arange(5, dtype=np.int32), conf, np.zeros((5, 4), dtype=np.float32))
+    dets = [{**_det(float(c)), "class_id": i} for i, c in enumerate(conf)]
+    out = apply_profile_columns(cols, profile)
+    assert out.class_ids.tolist() == [d["class_id"] for d in apply_profile(dets, profile)] == [2, 4, 0]
+
+def test_describe_reports_cost_only_per_mode(monkeypatch):
+    monkeypatch.setattr(modes, "_cost_ms", {})
+    modes.observe("fast", 10.0)
+    modes.observe("fast", 20.0)
+    d = describe(get_mode("fast"))
+    assert d["expected_ms"] == pytest.approx(11.0) and "cost_hint_ms" not in d
+    assert describe(get_mode("fast"), per_mode_cost=False)["expected_ms"] is None
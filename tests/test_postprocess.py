@@ -0,0 +1,47 @@
+# tests/test_postprocess.py
+import numpy as np
+import pytest
+
+from app.postprocess import LABEL_TABLE, format_detections, load_labels, rescale_detections
+
+def _reference(boxes, scores, classes, W, H):
+    """The per-box loop format_detections replaced."""
+    out = []
+    for (ymin, xmin, ymax, xmax), s, c in zip(boxes, scores, classes):
+        out.append({"class_id": int(c), "class_name": LABEL_TABLE[int(c)], "conf": round(float(s), 4),
+                    "box": {"x": xmin * W, "y": ymin * H, "w": (xmax - xmin) * W, "h": (ymax - ymin) * H}})
+    return out
+
+def test_matches_the_scalar_reference():
+    rng = np.random.default_rng(0)
+    tl = rng.uniform(0, 0.5, (20, 2))
+    boxes = np.hstack([tl, tl + rng.uniform(0.1, 0.5, (20, 2))]).astype(np.float32)
+    scores = rng.uniform(0.25, 1, 20).astype(np.float32)
+    classes = rng.integers(1, 91, 20).astype(np.float32)
+    got = format_detections(boxes, scores, classes, 640, 480)
+    want = _reference(boxes.astype(np.float64), scores, classes, 640, 480)
+    assert [d["class_name"] for d in got] == [d["class_name"] for d in want]
+    assert [d["conf"] for d in got] == [d["conf"] for d in want]
+    for g, w in zip(got, want):
+        assert g["box"] == pytest.approx(w["box"])
+        assert type(g["class_id"]) is int and type(g["conf"]) is float
+
+def test_unknown_class_ids_are_named_by_number():
+    labels = np.array(["??", "a", "b"], dtype=object)
+    dets = format_detections(np.zeros((2, 4)), np.array([0.9, 0.8]), np.array([2, 7]), 10, 10, labels=labels)
+    assert [d["class_name"] for d in dets] == ["b", "7"]
+
+def test_empty_input():
+    assert format_detections(np.zeros((0, 4)), np.zeros(0), np.zeros(0), 10, 10) == []
+
+def test_rescale_detections():
+    d = {"class_id": 1, "class_name": "person", "conf": 0.5, "box": {"x": 10.0, "y": 20.0, "w": 30.0, "h": 40.0}}
+    (r,) = rescale_detections([d], (100, 200), (200, 100))
+    assert r["box"] == {"x": 20.0, "y": 10.0, "w": 60.0, "h": 20.0}
+    assert rescale_detections([d], (5, 5), (5, 5))[0] is d
+
+def test_load_labels_is_one_based(tmp_path):
+    path = tmp_path / "labels.txt"
+    path.write_text("cat\ndog\n\n")
+    table = load_labels(str(path))
+    assert table[1] == "cat" and table[2] == "dog" and table[3] == "3"
@@ -0,0 +1,43 @@
+# tests/test_preprocess.py
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.preprocess import decode_for_model, decode_for_output, to_uint8_array
+
+def _encode(im: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format=fmt)
+    return buf.getvalue()
+
+def test_large_jpeg_is_decoded_at_reduced_size():
+    raw = _encode(Image.new("RGB", (2560, 1920), (10, 20, 30)), "JPEG")
+    im, orig = decode_for_model(raw, target=640)
+    assert orig == (2560, 1920)
+    assert im.size == (1280, 960)            # DCT-domain 1/2: 1/4 would drop below 640 on the short side
+    assert im.mode == "RGB"
+
+def test_small_target_allows_deeper_reduction():
+    raw = _encode(Image.new("RGB", (2560, 1920)), "JPEG")
+    im, _ = decode_for_model(raw, target=320)
+    assert im.size == (640, 480)             # 1/4; 1/8 would be 240 on the short side
+
+def test_non_jpeg_decodes_at_full_size_as_rgb():
+    raw = _encode(Image.new("RGBA", (300, 200), (1, 2, 3, 4)), "PNG")
+    im, orig = decode_for_model(raw)
+    assert orig == im.size == (300, 200) and im.mode == "RGB"
+
+def test_output_decode_is_capped_at_max_side():
+    raw = _encode(Image.new("RGB", (2000, 1000)), "JPEG")
+    im, orig = decode_for_output(raw, max_side=500)
+    assert orig == (2000, 1000) and max(im.size) == 500
+    full, orig = decode_for_output(raw, 0)
+    assert full.size == orig == (2000, 1000)
+
+def test_uint8_array_is_hwc():
+    im = Image.new("RGB", (4, 2), (7, 8, 9))
+    arr = to_uint8_array(im)
+    assert arr.shape == (2, 4, 3) and arr.dtype == np.uint8
+    assert arr[1, 3].tolist() == [7, 8, 9]
+    assert to_uint8_array(Image.new("L", (4, 2), 5)).shape == (2, 4, 3)
@@ -0,0 +1,108 @@
+# tests/test_principal_cache.py
+import asyncio, time
+
+from app.principal_cache import Principal, PrincipalCache
+
+class Loader:
+    def __init__(self):
+        self.calls = 0
+        self.names = {1: "ada", 2: "bob"}
+
+    def __call__(self, uid):
+        self.calls += 1
+        name = self.names.get(uid)
+        return Principal(uid, name) if name else None
+
+def test_token_is_decoded_once_until_it_expires():
+    cache = PrincipalCache(ttl_s=60)
+    decoded = []
+
+    def decode(token):
+        decoded.append(token)
+        return 7, time.time() + 0.05  # exp sooner than the TTL wins
+
+    assert cache.uid_for_token("t", decode) == 7
+    assert cache.uid_for_token("t", decode) == 7
+    assert decoded == ["t"]
+    time.sleep(0.06)
+    cache.uid_for_token("t", decode)
+    assert decoded == ["t", "t"]
+
+def test_principal_is_cached_per_realm():
+    cache, load = PrincipalCache(), Loader()
+    assert cache.principal("sql", 1, load).name == "ada"
+    assert cache.principal("sql", 1, load).name == "ada"
+    cache.principal("store", 1, load)                    # independent numbering
+    assert load.calls == 2
+    assert cache.stats()["user_hits"] == 1
+
+def test_invalidate_user_drops_every_realm():
+    cache, load = PrincipalCache(), Loader()
+    cache.principal("sql", 1, load)
+    cache.principal("store", 1, load)
+    load.names[1] = "ada lovelace"
+    cache.invalidate_user(1)
+    assert cache.principal("sql", 1, load).name == "ada lovelace"
+    assert cache.principal("store", 1, load).name == "ada lovelace"
+    assert cache.stats()["invalidations"] == 1
+
+def test_load_racing_an_invalidation_is_not_cached():
+    cache = PrincipalCache()
+    load = Loader()
+
+    def stale_load(uid):
+        value = load(uid)
+        cache.invalidate_user(uid)  # account changed while we were reading it
+        return value
+
+    cache.principal("sql", 1, stale_load)
+    cache.principal("sql", 1, load)
+    assert load.calls == 2
+
+def test_unknown_users_are_not_cached_and_lru_evicts():
+    cache, load = PrincipalCache(max_entries=1), Loader()
+    assert cache.principal("sql", 9, load) is None
+    assert cache.principal("sql", 9, load) is None
+    cache.principal("sql", 1, load)
+    cache.principal("sql", 2, load)
+    assert cache.stats()["users"] == 1 and cache.evictions == 1
+    assert load.calls == 4
+
+def test_async_loader_and_disabled_cache():
+    cache, load = PrincipalCache(), Loader()
+
+    async def aload(uid):
+        return load(uid)
+
+    assert asyncio.run(cache.principal_async("sql", 2, aload)).name == "bob"
+    assert asyncio.run(cache.principal_async("sql", 2, aload)).name == "bob"
+    assert load.calls == 1
+    off = PrincipalCache(enabled=False)
+    off.principal("sql", 2, load)
+    off.principal("sql", 2, load)
+    assert load.calls == 3
+
+def test_orm_updates_invalidate_the_account(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app import principal_cache
+    from app.db import Base
+    from app.models import Account
+
+    cache = PrincipalCache()
+    monkeypatch.setattr(principal_cache, "_cache", cache)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        acct = Account(fld_Name="ada", fld_Password="x")
+        db.add(acct)
+        db.commit()
+        load = lambda uid: Principal(uid, db.get(Account, uid).fld_Name)  # noqa: E731
+        assert cache.principal("sql", acct.fld_ID, load).name == "ada"
+        acct.fld_Name = "ada2"
+        db.commit()
+        assert cache.principal("sql", acct.fld_ID, load).name == "ada2"
+        db.delete(acct)
+        db.commit()
+    assert cache.stats()["invalidations"] == 2
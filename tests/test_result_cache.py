@@ -0,0 +1,157 @@
+# tests/test_result_cache.py
+import io, threading, time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app import result_cache
+from app.postprocess import detection_columns, rescale_columns
+from app.result_cache import ResultCache, clear_result_caches, content_key, dhash, get_result_cache
+
+def _jpeg(seed: int = 0, size=(96, 64), quality: int = 90) -> bytes:
+    # Coarse random blocks: any size of the same picture keeps (nearly) the same dHash
+    rng = np.random.default_rng(seed)
+    blocks = Image.fromarray(rng.integers(0, 256, (8, 9, 3), dtype=np.uint8)).resize((180, 160), Image.NEAREST)
+    im = blocks.resize(size, Image.BILINEAR)
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+def _decode(raw):
+    im = Image.open(io.BytesIO(raw)).convert("RGB")
+    return lambda: (im, im.size)
+
+def _det(x=10.0):
+    return [{"class_id": 1, "class_name": "person", "conf": 0.9, "box": {"x": x, "y": 5.0, "w": 20.0, "h": 30.0}}]
+
+class _Compute:
+    def __init__(self, dets=None):
+        self.calls = 0
+        self.dets = dets if dets is not None else _det()
+
+    def __call__(self, pil):
+        self.calls += 1
+        return self.dets, 12.5
+
+def test_exact_hit_skips_decode_and_compute():
+    cache, compute = ResultCache(), _Compute()
+    raw = _jpeg()
+    assert cache.get_or_compute(raw, _decode(raw), compute)[2] == "miss"
+    decode_calls = []
+    dets, ms, status = cache.get_or_compute(raw, lambda: decode_calls.append(1), compute)
+    assert (status, ms, compute.calls, decode_calls) == ("hit", 12.5, 1, [])
+    assert dets == _det()
+
+def test_key_is_content_hash():
+    assert content_key(b"abc") == content_key(b"abc")
+    assert content_key(b"abc") != content_key(b"abd")
+    assert len(content_key(b"abc")) == 32
+
+def test_near_hit_on_reencoded_upload_rescales_boxes():
+    cache, compute = ResultCache(max_hamming=4), _Compute()
+    raw = _jpeg(quality=90)
+    cache.get_or_compute(raw, _decode(raw), compute)
+
+    # Same picture at twice the size and another quality: different bytes, same dHash
+    big = _jpeg(size=(192, 128), quality=70)
+    assert content_key(big) != content_key(raw)
+    dets, _, status = cache.get_or_compute(big, _decode(big), compute)
+    assert status == "near" and compute.calls == 1
+    assert dets[0]["box"] == {"x": 20.0, "y": 10.0, "w": 40.0, "h": 60.0}
+
+def test_different_image_misses():
+    cache, compute = ResultCache(max_hamming=4), _Compute()
+    for seed in (1, 2):
+        raw = _jpeg(seed)
+        assert cache.get_or_compute(raw, _decode(raw), compute)[2] == "miss"
+    assert compute.calls == 2
+
+def test_near_hits_disabled_with_zero_hamming():
+    cache, compute = ResultCache(max_hamming=0), _Compute()
+    for q in (90, 70):
+        raw = _jpeg(quality=q)
+        assert cache.get_or_compute(raw, _decode(raw), compute)[2] == "miss"
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    cache, compute = ResultCache(ttl_s=30, max_hamming=0), _Compute()
+    raw = _jpeg()
+    cache.get_or_compute(raw, _decode(raw), compute)
+    now[0] += 29
+    assert cache.get_or_compute(raw, _decode(raw), compute)[2] == "hit"
+    now[0] += 2
+    assert cache.get_or_compute(raw, _decode(raw), compute)[2] == "miss"
+    assert cache.stats()["expired"] == 1
+
+def test_lru_eviction():
+    cache, compute = ResultCache(max_entries=2, max_hamming=0), _Compute()
+    raws = [_jpeg(s) for s in range(3)]
+    for raw in raws[:2]:
+        cache.get_or_compute(raw, _decode(raw), compute)
+    cache.get_or_compute(raws[0], _decode(raws[0]), compute)  # touch: raws[1] is now oldest
+    cache.get_or_compute(raws[2], _decode(raws[2]), compute)
+    assert cache.stats()["evictions"] == 1
+    assert cache.get_or_compute(raws[0], _decode(raws[0]), compute)[2] == "hit"
+    assert cache.get_or_compute(raws[1], _decode(raws[1]), compute)[2] == "miss"
+
+def test_concurrent_identical_uploads_share_one_compute():
+    cache, raw = ResultCache(), _jpeg()
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow(pil):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return _det(), 1.0
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute(raw, _decode(raw), slow)))
+    owner.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute(raw, _decode(raw), slow)))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["shared"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    owner.join(5)
+    waiter.join(5)
+    assert len(calls) == 1
+    assert sorted(r[2] for r in results) == ["miss", "shared"]
+
+def test_compute_error_is_not_cached():
+    cache, raw = ResultCache(), _jpeg()
+
+    def boom(pil):
+        raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute(raw, _decode(raw), boom)
+    assert cache.get_or_compute(raw, _decode(raw), _Compute())[2] == "miss"
+
+def test_columns_cache_rescales_near_hits():
+    cols = detection_columns(np.array([[0.1, 0.1, 0.5, 0.5]]), np.array([0.8]), np.array([1]), 96, 64)
+    cache = ResultCache(rescale=rescale_columns)
+    raw, big = _jpeg(), _jpeg(size=(192, 128), quality=70)
+    cache.get_or_compute(raw, _decode(raw), _Compute(cols))
+    got, _, status = cache.get_or_compute(big, _decode(big), _Compute(cols))
+    assert status == "near"
+    np.testing.assert_allclose(got.xywh, cols.xywh * 2)
+
+def test_namespaces_are_separate_and_cleared():
+    clear_result_caches()
+    a, b = get_result_cache("fast@v1"), get_result_cache("fast@v2")
+    assert a is not b and get_result_cache("fast@v1") is a
+    raw = _jpeg()
+    a.get_or_compute(raw, _decode(raw), _Compute())
+    assert b.get_or_compute(raw, _decode(raw), _Compute())[2] == "miss"
+    clear_result_caches()
+    assert get_result_cache("fast@v1") is not a
+    assert a.stats()["entries"] == 0
+
+def test_dhash_is_stable_under_scaling():
+    im = Image.open(io.BytesIO(_jpeg()))
+    assert (dhash(im) ^ dhash(im.resize((192, 128)))).bit_count() <= 4
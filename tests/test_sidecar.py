@@ -0,0 +1,111 @@
+# tests/test_sidecar.py
+import os, socket, struct, tempfile, threading
+
+import numpy as np
+import pytest
+
+from app import sidecar
+from app.detector_stub import StubDetector
+from app.postprocess import LABEL_TABLE, _label_table
+from app.sidecar import (
+    MAGIC, OP_DETECT, OP_PING, STATUS_ERROR, STATUS_OK, RemoteDetector, SidecarError, SidecarServer,
+    _REQ, _RESP, decode_labels, encode_labels,
+)
+
+@pytest.fixture
+def server():
+    det = StubDetector(latency_ms=0)
+    det.labels = _label_table(["??", "walker", "bike", "auto"])
+    path = os.path.join(tempfile.mkdtemp(), "infer.sock")  # short: AF_UNIX paths max out near 100 bytes
+    srv = SidecarServer(path, det)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield path
+    srv.shutdown()
+    srv.server_close()
+
+def _raw(path, op, payload=b"", h=0, w=0, req_id=7):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(5)
+        s.connect(path)
+        s.sendall(_REQ.pack(MAGIC, op, req_id, h, w, len(payload)) + payload)
+        head = sidecar._recv_exact(s, _RESP.size)
+        magic, status, rid, n, elapsed_ms, length = _RESP.unpack(head)
+        body = bytes(sidecar._recv_exact(s, length)) if length else b""
+    return magic, status, rid, n, body
+
+def test_header_layout():
+    # Little-endian, no padding, as documented in app/sidecar.py
+    assert _REQ.size == 4 + 1 + 4 + 2 + 2 + 4
+    assert _RESP.size == 4 + 1 + 4 + 4 + 4 + 4
+    assert _REQ.pack(MAGIC, OP_DETECT, 1, 2, 3, 18) == b"BSI1\x01" + struct.pack("<IHHI", 1, 2, 3, 18)
+
+def test_label_table_roundtrip():
+    n, body = encode_labels(LABEL_TABLE)
+    table = decode_labels(n, body)
+    assert table.tolist()[:n] == LABEL_TABLE.tolist()[:n]
+    assert table[200] == "200"
+    assert decode_labels(0, b"") is None
+
+def test_detect_response_payload(server):
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    magic, status, rid, n, body = _raw(server, OP_DETECT, frame.tobytes(), 48, 64)
+    assert (magic, status, rid, n) == (MAGIC, STATUS_OK, 7, 2)
+    arr = np.frombuffer(body, dtype="<f4")
+    assert arr.size == 6 * n
+    boxes, scores, classes = arr[:8].reshape(2, 4), arr[8:10], arr[10:12]
+    np.testing.assert_allclose(boxes[0], [0.10, 0.15, 0.80, 0.45], rtol=1e-6)
+    np.testing.assert_allclose(scores, [0.91, 0.64], rtol=1e-6)
+    assert classes.tolist() == [1.0, 3.0]
+
+def test_ping_carries_the_label_table(server):
+    _, status, _, n, body = _raw(server, OP_PING)
+    assert status == STATUS_OK
+    assert body.decode("utf-8").split("\n") == ["??", "walker", "bike", "auto"] and n == 4
+
+def test_bad_payload_length_is_an_error_status(server):
+    _, status, rid, n, body = _raw(server, OP_DETECT, b"\0" * 10, 48, 64)
+    assert (status, rid, n) == (STATUS_ERROR, 7, 0)
+    assert b"expected 48x64x3" in body
+
+def test_client_uses_sidecar_labels(server):
+    from PIL import Image
+    remote = RemoteDetector([server], connect_wait=5)
+    dets, _, _ = remote.infer(Image.new("RGB", (64, 48)), orig_size=(640, 480))
+    assert [d["class_name"] for d in dets] == ["walker", "auto"]
+    assert dets[0]["box"]["x"] == pytest.approx(96.0)
+
+def test_error_status_keeps_the_connection(server):
+    remote = RemoteDetector([server], connect_wait=5)
+    ep = remote.endpoints[0]
+    with pytest.raises(SidecarError):
+        ep.call(OP_DETECT, 1, np.zeros((4, 4, 3), dtype=np.uint16))  # twice the bytes h*w*3 promises
+    assert ep.errors == 0
+    assert remote.detect_arrays(np.zeros((8, 8, 3), dtype=np.uint8))[1].tolist() == pytest.approx([0.91, 0.64])
+    assert ep.inflight == 0 and ep._idle.qsize() == 1
+
+def _bare_remote(endpoints):
+    remote = RemoteDetector.__new__(RemoteDetector)
+    remote.endpoints, remote.labels = endpoints, LABEL_TABLE
+    remote._ids = iter(range(1, 100))
+    return remote
+
+class _FakeEndpoint:
+    def __init__(self, exc=None):
+        self.exc, self.calls, self.inflight = exc, 0, 0
+
+    def call(self, op, req_id, frame):
+        self.calls += 1
+        if self.exc:
+            raise self.exc
+        return 0, 1.0, b""
+
+def test_refused_connection_is_retried_elsewhere():
+    dead, alive = _FakeEndpoint(ConnectionRefusedError()), _FakeEndpoint()
+    assert _bare_remote([dead, alive])._call(OP_DETECT, None) == (0, 1.0, b"")
+    assert (dead.calls, alive.calls) == (1, 1)
+
+def test_read_timeout_is_not_retried():
+    slow, other = _FakeEndpoint(socket.timeout("timed out")), _FakeEndpoint()
+    with pytest.raises(socket.timeout):
+        _bare_remote([slow, other])._call(OP_DETECT, None)
+    assert (slow.calls, other.calls) == (1, 0)
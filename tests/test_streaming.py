@@ -0,0 +1,62 @@
+# tests/test_streaming.py
+import asyncio, io
+from contextlib import contextmanager
+
+from PIL import Image
+
+from app.streaming import StreamSession
+
+class CountingDetector:
+    def __init__(self):
+        self.calls = 0
+
+    def infer(self, pil, return_image=False, orig_size=None):
+        self.calls += 1
+        W, H = orig_size or pil.size
+        return [{"class_id": 1, "class_name": "person", "conf": 0.9,
+                 "box": {"x": 0.1 * W, "y": 0.1 * H, "w": 0.2 * W, "h": 0.2 * H}}], None, 5.0
+
+def _jpeg(color, size=(64, 48)) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+def _session(det, **kw):
+    @contextmanager
+    def serving():
+        yield det, "v1"
+    return StreamSession(serving, **kw)
+
+def test_only_the_newest_frame_is_kept():
+    s = _session(CountingDetector())
+
+    async def go():
+        for color in ("red", "green", "blue"):
+            s.offer(_jpeg(color))
+        return await s.next_frame()
+
+    seq, frame = asyncio.run(go())
+    assert seq == 3 and frame == _jpeg("blue")
+    assert s.received == 3 and s.dropped == 2
+
+def test_still_frames_reuse_the_last_result():
+    det = CountingDetector()
+    s = _session(det, motion_thresh=3.0)
+    first = s.process(1, _jpeg((100, 100, 100)))
+    same = s.process(2, _jpeg((101, 100, 100)))
+    moved = s.process(3, _jpeg((200, 50, 50)))
+    assert [first["reused"], same["reused"], moved["reused"]] == [False, True, False]
+    assert same["detections"] == first["detections"]
+    assert det.calls == 2 and s.skipped == 1
+    assert s.model_version == "v1"
+
+def test_tracked_frames_skip_decode_and_detection():
+    det = CountingDetector()
+    s = _session(det, motion_thresh=0.0, track=True)
+    key = s.process(1, _jpeg("red"))
+    assert key["keyframe"] and key["detections"][0]["track_id"] == 1
+    tracked = s.process(2, b"not even a jpeg")   # not decoded between keyframes
+    assert tracked["keyframe"] is False
+    assert tracked["detections"][0]["track_id"] == 1
+    assert det.calls == 1 and s.tracked == 1
+    assert s.stats()["tracked"] == 1
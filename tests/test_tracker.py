@@ -0,0 +1,90 @@
+# tests/test_tracker.py
+import numpy as np
+
+from app.tracker import IoUTracker, KeyframePolicy, iou_matrix
+
+def _det(x, y, w=20.0, h=20.0, cls=1, name="person", conf=0.9):
+    return {"class_id": cls, "class_name": name, "conf": conf, "box": {"x": x, "y": y, "w": w, "h": h}}
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10], [100, 100, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 10, 10]], dtype=np.float32)
+    iou = iou_matrix(a, b)
+    np.testing.assert_allclose(iou, [[1.0, 50 / 150], [0.0, 0.0]], rtol=1e-6)
+    assert iou_matrix(a, np.zeros((0, 4), np.float32)).shape == (2, 0)
+
+def test_ids_persist_across_keyframes():
+    t = IoUTracker()
+    first = t.update([_det(0, 0), _det(100, 100)])
+    second = t.update([_det(102, 101), _det(2, 1)])  # order swapped, small moves
+    ids = {d["box"]["x"]: d["track_id"] for d in first}
+    assert second[0]["track_id"] == ids[100.0]
+    assert second[1]["track_id"] == ids[0.0]
+
+def test_different_class_never_matches():
+    t = IoUTracker()
+    (a,) = t.update([_det(0, 0, cls=1)])
+    (b,) = t.update([_det(0, 0, cls=3, name="car")])
+    assert a["track_id"] != b["track_id"]
+
+def test_low_overlap_starts_a_new_track():
+    t = IoUTracker(iou_thresh=0.3)
+    (a,) = t.update([_det(0, 0)])
+    (b,) = t.update([_det(15, 15)])  # IoU 25/775
+    assert a["track_id"] != b["track_id"]
+
+def test_greedy_matching_prefers_the_best_overlap():
+    t = IoUTracker()
+    (a,) = t.update([_det(0, 0)])
+    out = t.update([_det(8, 0), _det(1, 0)])
+    assert out[1]["track_id"] == a["track_id"]
+    assert out[0]["track_id"] != a["track_id"]
+
+def test_predict_moves_by_velocity_and_decays_conf():
+    t = IoUTracker(decay=0.5)
+    t.update([_det(0, 0)])
+    t.predict(2)
+    t.update([_det(6, 0)])  # 3 frames later: 2 px/frame measured, blended with the initial 0
+    (p,) = t.predict(1)
+    assert p["box"]["x"] == 7.0 and p["box"]["y"] == 0.0
+    assert p["conf"] == round(0.9 * 0.5, 4)
+
+def test_keyframe_matches_where_tracks_were_observed():
+    t = IoUTracker()
+    (a,) = t.update([_det(0, 0)])
+    t.predict(1)
+    t.update([_det(6, 0)])                    # 3 px/frame measured, velocity 1.5
+    for _ in range(4):
+        t.predict(1)                           # predicted x = 12
+    (b,) = t.update([_det(8, 0)])             # object actually stopped near 8
+    assert b["track_id"] == a["track_id"]
+
+def test_velocity_counts_skipped_frames():
+    t = IoUTracker()
+    t.update([_det(0, 0)])
+    t.update([_det(8, 0)], steps=4)           # frames dropped between keyframes
+    (p,) = t.predict(1)
+    assert p["box"]["x"] == 9.0               # 0.5 * 0 + 0.5 * 8/4
+
+def test_unmatched_tracks_survive_max_missed_keyframes():
+    t = IoUTracker(max_missed=1)
+    (a,) = t.update([_det(0, 0)])
+    t.update([])
+    assert t.detections() == []               # not reported while missed
+    (b,) = t.update([_det(1, 0)])             # detector blinked once: same track
+    assert b["track_id"] == a["track_id"]
+    t.update([])
+    t.update([])                              # missed twice: dropped
+    (c,) = t.update([_det(1, 0)])
+    assert c["track_id"] != a["track_id"]
+
+def test_keyframe_policy():
+    t = IoUTracker(decay=0.5)
+    policy = KeyframePolicy(every=3, min_conf=0.3)
+    assert policy.is_keyframe(1, t)
+    t.update([_det(0, 0)])
+    policy.mark(1)
+    assert not policy.is_keyframe(2, t)
+    assert policy.is_keyframe(4, t)           # interval
+    t.predict(2)                              # trust 0.25 < min_conf
+    assert policy.is_keyframe(3, t)